@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+API HTTP/JSON local sobre um DataStore, para bots e scripts (asyncio, só stdlib):
+
+    python -m api_server [--port 8765] [--host 127.0.0.1] [--data-dir PASTA]
+
+    GET   /health                       estado + contadores de pedidos/lotes/gravações
+    GET   /wallets
+    GET   /trades?wallet=&from=&to=&symbol=&status=&direction=&result=&tags=&q=&query=&limit=
+                                        (q: pesquisa na razão; tags: "a,b", todas;
+                                         query: linguagem de consulta de query.py)
+    GET   /trades/<id>
+    GET   /stats[?wallet=]              global ou de uma carteira
+    GET   /stats?<filtros de /trades>[&by=tag]   KPIs da seleção (e por valor de uma faceta)
+    POST  /trades                       {wallet, symbol, direction, entry_price, stop_loss,
+                                         take_profit, position_size, reason, tags?}
+    PATCH /trades/<id>                  {entry_price?, stop_loss?, take_profit?, position_size?, tags?}
+    POST  /trades/<id>/close            {price, reason: "TP"|"SL"|"Manual"}
+
+- Um só DataStore de longa duração.
+- Escritas: cada pedido entra numa fila e um único escritor aplica tudo o que
+  estiver em fila num ds.batch() numa thread (uma gravação de trades.json por
+  lote, não por pedido). Enquanto um lote grava, os pedidos seguintes juntam-se
+  ao próximo: o lote cresce com a carga. A resposta só sai com o lote gravado;
+  se a gravação falhar, o lote inteiro falha e é desfeito em memória
+  (ds.batch(rollback=True)). Cada lote reescreve todo o trades.json: o
+  débito de escrita é pedidos por lote / tempo dessa gravação (~0,5 s com
+  10k trades; ver README).
+- Leituras: só o último estado gravado (WriteQueue.committed), numa thread de
+  leitura (reconstruir índices não para o loop). Sem lote a meio (ds.idle())
+  usam os índices e ds.artifacts; com um lote a gravar, os índices já o têm,
+  por isso filtram trade a trade o snapshot gravado.
+- HTTP/1.1 com keep-alive. Sem autenticação: escuta em 127.0.0.1 por omissão.
+- Também recebe as alterações feitas pelas GUIs/outros processos (o DataStore
+  faz merge por versão ao gravar; GET recarrega o que mudou no disco).
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs
+
+import reports
+import query
+from facets import FACETS
+from models import Trade, new_trade_id, normalize_tags
+from storage import DataStore
+
+DEFAULT_PORT = 8765
+BATCH_MAX = 500            # pedidos de escrita por lote
+BATCH_WINDOW = 0.0         # espera extra (s) por mais pedidos antes de gravar; 0 = só o que já está em fila
+MAX_BODY = 1_000_000
+RELOAD_INTERVAL = 1.0      # de quanto em quanto tempo (s) os GET verificam escritas de outros processos
+
+REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _trade_dict(t: Trade) -> dict:
+    return asdict(t)
+
+
+def _number(body: dict, key: str, required: bool = True) -> Optional[float]:
+    v = body.get(key)
+    if v is None:
+        if required:
+            raise ApiError(400, f"campo obrigatório: {key}")
+        return None
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{key} deve ser numérico")
+    if v <= 0:
+        raise ApiError(400, f"{key} deve ser > 0")
+    return v
+
+
+def _wallet(ds, ref):
+    """Carteira por id ou nome (case-insensitive) de ds ou de um snapshot; None se ref vazio."""
+    if not ref:
+        return None
+    w = ds.wallets.get(ref)
+    if w:
+        return w
+    for w in ds.wallets.values():
+        if w.name.lower() == str(ref).lower():
+            return w
+    raise ApiError(404, f"carteira não encontrada: {ref}")
+
+
+# ---------- operações de escrita (correm dentro de ds.batch(), na thread do escritor) ----------
+def op_create(ds, body: dict) -> dict:
+    w = _wallet(ds, body.get("wallet") or body.get("wallet_id"))
+    if w is None:
+        raise ApiError(400, "campo obrigatório: wallet")
+    symbol = str(body.get("symbol") or "").strip().upper()
+    if not symbol:
+        raise ApiError(400, "campo obrigatório: symbol")
+    direction = str(body.get("direction") or "Long").capitalize()
+    if direction not in ("Long", "Short"):
+        raise ApiError(400, "direction deve ser Long ou Short")
+    entry, sl, size = _number(body, "entry_price"), _number(body, "stop_loss"), _number(body, "position_size")
+    tp = _number(body, "take_profit", required=False) or entry
+    reason = str(body.get("reason") or "").strip()
+    if not reason:
+        raise ApiError(400, "campo obrigatório: reason")
+
+    balance = ds.wallet_balance(w.id)
+    risk_amount = abs(entry - sl) * size
+    tid = str(body.get("id") or "") or new_trade_id(ds.trades)
+    if tid in ds.trades:
+        raise ApiError(400, f"id já existe: {tid}")
+    t = Trade(
+        id=tid, wallet_id=w.id, symbol=symbol, direction=direction,
+        entry_price=round(entry, 2), stop_loss=round(sl, 2), take_profit=round(tp, 2),
+        position_size=size, position_value=round(entry * size, 2), reason=reason,
+        created_at=str(body.get("created_at") or datetime.now().isoformat(timespec="seconds")),
+        risk_amount=risk_amount, risk_pct_of_balance=(risk_amount / balance * 100.0) if balance > 0 else 0.0,
+        status="Open", exit_price=None, closed_at=None, pnl_abs=None, pnl_pct=None, result=None, close_reason=None,
+        tags=normalize_tags(body.get("tags")),
+    )
+    if symbol not in ds.symbols:
+        ds.add_symbol(symbol)
+    ds.add_trade(t)
+    return _trade_dict(t)
+
+
+def op_update(ds, tid: str, body: dict) -> dict:
+    t = ds.trades.get(tid)
+    if t is None:
+        raise ApiError(404, f"trade não encontrado: {tid}")
+    new = t
+    # tags podem mudar depois de fechado (ex.: marcar o erro cometido); preços não
+    if "tags" not in body or any(k in body for k in ("entry_price", "stop_loss", "take_profit", "position_size")):
+        if t.status == "Closed":
+            raise ApiError(400, "trade já fechado")
+        new = ds.edit_trade(
+            tid,
+            _number(body, "entry_price", required=False) or t.entry_price,
+            _number(body, "stop_loss", required=False) or t.stop_loss,
+            _number(body, "take_profit", required=False) or t.take_profit,
+            _number(body, "position_size", required=False) or t.position_size,
+        )
+    if "tags" in body:
+        new = ds.set_tags(tid, body.get("tags")) or new
+    return _trade_dict(new)
+
+
+def op_close(ds, tid: str, body: dict) -> dict:
+    t = ds.trades.get(tid)
+    if t is None:
+        raise ApiError(404, f"trade não encontrado: {tid}")
+    if t.status == "Closed":
+        raise ApiError(400, "trade já fechado")
+    reason = str(body.get("reason") or "Manual")
+    if reason not in ("TP", "SL", "Manual"):
+        raise ApiError(400, "reason deve ser TP, SL ou Manual")
+    price = _number(body, "price", required=False)
+    if price is None:
+        price = {"TP": t.take_profit, "SL": t.stop_loss}.get(reason)
+        if price is None:
+            raise ApiError(400, "campo obrigatório: price")
+    return _trade_dict(ds.close_trade(tid, price, reason))
+
+
+class WriteQueue:
+    """Fila de escritas coalescidas: um escritor, um ds.batch() por lote."""
+
+    def __init__(self, ds: DataStore, max_batch: int = BATCH_MAX, window: float = BATCH_WINDOW):
+        self.ds = ds
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tradeiros-api-writer")
+        self.batches = 0
+        self.writes = 0
+        self.committed = ds.snapshot()  # último estado gravado: é o que os GET servem
+
+    async def submit(self, fn, *args):
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((fn, args, fut))
+        return await fut
+
+    def _apply(self, items) -> list:
+        out = []
+        with self.ds.batch(rollback=True):
+            for fn, args, _ in items:
+                try:
+                    out.append((True, fn(self.ds, *args)))
+                except Exception as e:
+                    out.append((False, e))
+        self.committed = self.ds.snapshot()
+        return out
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            if self.window:
+                await asyncio.sleep(self.window)
+            while len(items) < self.max_batch and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self._executor, self._apply, items)
+            except Exception as e:  # falha a gravar: todos os pedidos do lote falham (e foram desfeitos)
+                results = [(False, e)] * len(items)
+            self.batches += 1
+            self.writes += len(items)
+            for (_, _, fut), (ok, value) in zip(items, results):
+                if fut.done():
+                    continue
+                if ok:
+                    fut.set_result(value)
+                else:
+                    fut.set_exception(value)
+
+
+class ApiServer:
+    def __init__(self, ds: DataStore, max_batch: int = BATCH_MAX, window: float = BATCH_WINDOW):
+        self.ds = ds
+        self.writes = WriteQueue(ds, max_batch, window)
+        self.requests = 0
+        self._last_reload = 0.0
+        self._server = None
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tradeiros-api-reader")
+
+    # ---------- leituras (thread de leitura) ----------
+    async def read(self, fn, *args):
+        """fn(snapshot gravado, idle, *args) na thread de leitura (ver _consistent)."""
+        return await asyncio.get_running_loop().run_in_executor(self._reader, self._consistent, fn, args)
+
+    def _consistent(self, fn, args):
+        # idle: nenhum lote a meio, o estado publicado é o gravado e os índices podem ser usados
+        with self.ds.idle() as idle:
+            if idle:
+                now = time.monotonic()
+                if now - self._last_reload >= RELOAD_INTERVAL:
+                    # o que outro processo gravou (no máximo a cada RELOAD_INTERVAL)
+                    self._last_reload = now
+                    changed = self.ds.changed_on_disk()
+                    if changed:
+                        self.ds.reload(changed)
+                self.writes.committed = self.ds.snapshot()
+            return fn(self.writes.committed, idle, *args)
+
+    def _select(self, snap, idle: bool, q: dict):
+        """(carteira, trades filtrados) pelos parâmetros de /trades (bitmaps de facets.py se idle)."""
+        w = _wallet(snap, q.get("wallet"))
+        try:
+            compiled = query.compile(q.get("query"), snap.wallets)
+        except query.QueryError as e:
+            raise ApiError(400, f"query inválida: {e}")
+        filters = dict(
+            wallet_id=(w.id if w else None), date_from=q.get("from"), date_to=q.get("to"),
+            symbol=q.get("symbol"), status=q.get("status"), direction=q.get("direction"),
+            result=q.get("result"), tags=q.get("tags"), reason=q.get("q"), query=compiled,
+        )
+        if idle:
+            rows = reports.filter_trades(None, index=self.ds.reason_index, facets=self.ds.facets,
+                                         columns=self.ds.columns, **filters)
+        else:
+            # lote a gravar: os índices já o incluem; trade a trade sobre o snapshot gravado
+            rows = reports.filter_trades(self.ds.history_trades(snap, filters["wallet_id"], q.get("from"), q.get("to")),
+                                         **filters)
+        return w, rows
+
+    def get_trades(self, snap, idle: bool, q: dict):
+        _, rows = self._select(snap, idle, q)
+        limit = q.get("limit")
+        if limit:
+            try:
+                rows = rows[-int(limit):]
+            except ValueError:
+                raise ApiError(400, "limit deve ser inteiro")
+        return [_trade_dict(t) for t in rows]
+
+    def get_stats(self, snap, idle: bool, q: dict):
+        """
+        KPIs guardados em ds.artifacts por parâmetros e versão dos dados (global;
+        só da carteira no resumo dela). Com um lote a gravar, a versão já o conta:
+        calcula-se do snapshot gravado sem passar pela cache.
+        """
+        if not idle:
+            return self._stats(snap, idle, q)
+        w = None if set(q) - {"wallet"} else _wallet(snap, q.get("wallet"))
+        version = self.ds.data_version(w.id if w else None)
+        params = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in q.items()))
+        return self.ds.artifacts.get("api_stats", params, version, lambda: self._stats(snap, idle, q))
+
+    def _stats(self, snap, idle: bool, q: dict):
+        if set(q) - {"wallet"}:
+            w, rows = self._select(snap, idle, q)
+            by = q.get("by")
+            if by and by not in FACETS:
+                raise ApiError(400, f"by deve ser um de: {', '.join(FACETS)}")
+            return {"wallet": w.name if w else None, "selection": True,
+                    **reports.selection_stats(rows, snap.wallets, w.id if w else None, by)}
+        w = _wallet(snap, q.get("wallet"))
+        if w:
+            return {"wallet": w.name, **reports.wallet_stats(w, snap.trades, snap.archived)}
+        return {"wallet": None, **reports.global_stats(snap.wallets, snap.trades, snap.archived)}
+
+    def get_wallets(self, snap, idle: bool):
+        return [dict(asdict(w), current_balance=self.ds.wallet_balance(w.id, snap)) for w in snap.wallets.values()]
+
+    def get_trade(self, snap, idle: bool, tid: str):
+        t = snap.trades.get(tid)
+        if t is None:
+            raise ApiError(404, f"trade não encontrado: {tid}")
+        return _trade_dict(t)
+
+    # ---------- encaminhamento ----------
+    async def dispatch(self, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        data = {}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise ApiError(400, "JSON inválido")
+            if not isinstance(data, dict):
+                raise ApiError(400, "o corpo deve ser um objeto JSON")
+
+        if parts == ["health"] and method == "GET":
+            snap = self.writes.committed
+            return 200, {"ok": True, "version": snap.version, "trades": len(snap.trades),
+                         "requests": self.requests, "write_batches": self.writes.batches,
+                         "write_requests": self.writes.writes}
+        if parts == ["wallets"] and method == "GET":
+            return 200, await self.read(self.get_wallets)
+        if parts == ["stats"] and method == "GET":
+            return 200, await self.read(self.get_stats, q)
+        if parts[:1] == ["trades"]:
+            if len(parts) == 1:
+                if method == "GET":
+                    return 200, await self.read(self.get_trades, q)
+                if method == "POST":
+                    return 201, await self.writes.submit(op_create, data)
+            elif len(parts) == 2:
+                if method == "GET":
+                    return 200, await self.read(self.get_trade, parts[1])
+                if method == "PATCH":
+                    return 200, await self.writes.submit(op_update, parts[1], data)
+            elif len(parts) == 3 and parts[2] == "close" and method == "POST":
+                return 200, await self.writes.submit(op_close, parts[1], data)
+            else:
+                raise ApiError(404, "caminho desconhecido")
+            raise ApiError(405, f"método {method} não suportado em {url.path}")
+        raise ApiError(404, "caminho desconhecido")
+
+    # ---------- HTTP ----------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line or not line.strip():
+                    break
+                method, target, version = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length") or 0)
+                self.requests += 1
+                if length > MAX_BODY:
+                    status, payload = 413, {"error": "corpo demasiado grande"}
+                    keep = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.dispatch(method.upper(), target, body)
+                    except ApiError as e:
+                        status, payload = e.status, {"error": str(e)}
+                    except Exception as e:
+                        status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                    keep = (version.strip().upper() == "HTTP/1.1"
+                            and headers.get("connection", "").lower() != "close")
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        self._writer_task = asyncio.get_running_loop().create_task(self.writes.run())
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+
+async def serve(ds: DataStore, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                max_batch: int = BATCH_MAX, window: float = BATCH_WINDOW, ready=None):
+    api = ApiServer(ds, max_batch, window)
+    server = await api.start(host, port)
+    if ready:
+        ready(api)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m api_server", description="Tradeiros — API JSON local")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 = porta livre (indicada no arranque)")
+    ap.add_argument("--data-dir", help="pasta de dados (omissão: a da app / TRADEIROS_DATA_DIR)")
+    ap.add_argument("--batch-max", type=int, default=BATCH_MAX)
+    ap.add_argument("--batch-window", type=float, default=BATCH_WINDOW, help="segundos a esperar por mais escritas")
+    args = ap.parse_args(argv)
+
+    ds = DataStore(args.data_dir)
+
+    def ready(api):
+        print(f"Tradeiros API em http://{args.host}:{api.port}", flush=True)
+
+    try:
+        asyncio.run(serve(ds, args.host, args.port, args.batch_max, args.batch_window, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Arquivo frio dos trades fechados antigos.
+
+    ds.archive_closed(older_than_days=365)      # ou: python -m tradeiros archive --days 365
+
+- trades.json é reescrito a cada alteração; os trades fechados há mais de N
+  dias (setting "archive_after_days") saem de lá para
+  archive/trades-AAAA-MM.ndjson.gz, um ficheiro por mês de fecho, só de
+  acréscimo: cada arquivamento junta um membro gzip novo (o gzip lê membros
+  concatenados como um só ficheiro).
+- archive.json (ao lado dos outros ficheiros de dados) é o índice: por mês,
+  o ficheiro, os bytes válidos, nº de trades, datas de criação mín/máx e um
+  resumo por carteira (fechados, winners, losers, break-even, PnL). Saldos e
+  estatísticas somam estes resumos sem descomprimir nada.
+- Consultas de histórico leem só os meses que podem ter resultados
+  (carteira/datas); os trades lidos ficam em cache enquanto o ficheiro do mês
+  não crescer.
+- Recuperação: um acréscimo interrompido antes de o índice ser gravado é
+  cortado (o ficheiro volta aos bytes do índice); os ids ainda por tirar do
+  trades.json ficam em "pending" no índice e o DataStore termina o trabalho
+  ao carregar.
+"""
+import os
+import gzip
+import json
+import threading
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from models import Trade, migrate_trade_dict
+import metrics
+
+INDEX_FILE = "archive.json"
+ARCHIVE_DIR = "archive"
+SETTING = "archive_after_days"
+DEFAULT_DAYS = 365
+
+SUMMARY_KEYS = ("closed", "winners", "losers", "breakeven", "pnl_total")
+
+
+# ---------- resumos ----------
+def empty_summary() -> dict:
+    return {"closed": 0, "winners": 0, "losers": 0, "breakeven": 0, "pnl_total": 0.0}
+
+
+def add_trade(s: dict, t: Trade) -> dict:
+    p = t.pnl_abs or 0.0
+    s["closed"] += 1
+    s["pnl_total"] += p
+    if p > 0:
+        s["winners"] += 1
+    elif p < 0:
+        s["losers"] += 1
+    else:
+        s["breakeven"] += 1
+    return s
+
+
+def add_summary(s: dict, other: Mapping) -> dict:
+    for k in SUMMARY_KEYS:
+        s[k] += other.get(k, 0)
+    return s
+
+
+def summarize(trades: Iterable[Trade]) -> Dict[str, dict]:
+    """{wallet_id: resumo} de trades fechados."""
+    out: Dict[str, dict] = {}
+    for t in trades:
+        add_trade(out.setdefault(t.wallet_id, empty_summary()), t)
+    return out
+
+
+def wallet_summaries(index: Mapping) -> Dict[str, dict]:
+    """Totais por carteira de todos os meses do índice."""
+    out: Dict[str, dict] = {}
+    for entry in index.get("periods", {}).values():
+        for wid, s in entry.get("wallets", {}).items():
+            add_summary(out.setdefault(wid, empty_summary()), s)
+    return out
+
+
+# ---------- índice ----------
+def period_of(t: Trade) -> Optional[str]:
+    """'AAAA-MM' do fecho (ou da criação, se não houver data de fecho)."""
+    iso = t.closed_at or t.created_at or ""
+    if len(iso) >= 7 and iso[4] == "-":
+        return iso[:7]
+    return None
+
+
+def normalize_index(raw) -> dict:
+    raw = raw if isinstance(raw, dict) else {}
+    periods = raw.get("periods")
+    pending = raw.get("pending")
+    return {
+        "periods": periods if isinstance(periods, dict) else {},
+        "pending": [str(x) for x in pending] if isinstance(pending, list) else [],
+    }
+
+
+def period_file(archive_dir: str, period: str) -> str:
+    return os.path.join(archive_dir, f"trades-{period}.ndjson.gz")
+
+
+def may_match(entry: Mapping, wallet_id: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None) -> bool:
+    """False se o mês de certeza não tem trades da carteira/intervalo de criação ('YYYY-MM-DD')."""
+    if wallet_id is not None and wallet_id not in entry.get("wallets", {}):
+        return False
+    lo, hi = (entry.get("created_min") or "")[:10], (entry.get("created_max") or "")[:10]
+    if date_from and hi and hi < date_from:
+        return False
+    if date_to and lo and lo > date_to:
+        return False
+    return True
+
+
+# ---------- ficheiros ----------
+def append_period(archive_dir: str, index: dict, period: str, trades: List[Trade]) -> None:
+    """
+    Acrescenta trades ao ficheiro do mês (um membro gzip novo) e atualiza a
+    entrada do índice em memória; quem chama grava o índice depois.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    entry = index["periods"].setdefault(period, {
+        "file": os.path.basename(period_file(archive_dir, period)), "bytes": 0, "count": 0,
+        "created_min": None, "created_max": None, "wallets": {},
+    })
+    path = os.path.join(archive_dir, entry["file"])
+    lines = "".join(json.dumps(dict(vars(t)), ensure_ascii=False) + "\n" for t in trades)
+    with open(path, "ab") as raw:
+        raw.truncate(entry["bytes"])  # resto de um acréscimo interrompido antes de gravar o índice
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+            gz.write(lines.encode("utf-8"))
+        raw.flush()
+        try:
+            os.fsync(raw.fileno())
+        except Exception:
+            pass
+        entry["bytes"] = os.fstat(raw.fileno()).st_size
+    entry["count"] += len(trades)
+    created = [t.created_at for t in trades if t.created_at]
+    if created:
+        entry["created_min"] = min([c for c in (entry["created_min"], min(created)) if c])
+        entry["created_max"] = max([c for c in (entry["created_max"], max(created)) if c])
+    for wid, s in summarize(trades).items():
+        add_summary(entry["wallets"].setdefault(wid, empty_summary()), s)
+
+
+def read_period(path: str, size: Optional[int] = None) -> List[Trade]:
+    """Trades de um ficheiro de mês (até `size` bytes; um membro final estragado é ignorado)."""
+    out = []
+    try:
+        with open(path, "rb") as raw:
+            data = raw.read(size) if size is not None else raw.read()
+    except OSError:
+        return out
+    try:
+        text = gzip.decompress(data).decode("utf-8")
+    except Exception:
+        text = _decompress_members(data)
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            out.append(Trade(**migrate_trade_dict(json.loads(line), {})))
+        except Exception:
+            pass
+    return out
+
+
+def iter_period(path: str, size: Optional[int] = None) -> Iterator[Trade]:
+    """
+    Como read_period, mas um trade de cada vez (o texto do mês nunca fica
+    todo em memória, só os bytes comprimidos); para quando um membro não
+    descomprime.
+    """
+    import io
+    try:
+        with open(path, "rb") as raw:
+            data = raw.read(size) if size is not None else raw.read()
+    except OSError:
+        return
+    try:
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as gz:
+            for line in gz:
+                if not line.strip():
+                    continue
+                try:
+                    yield Trade(**migrate_trade_dict(json.loads(line), {}))
+                except Exception:
+                    pass
+    except (OSError, EOFError):
+        return
+
+
+def _decompress_members(data: bytes) -> str:
+    """Membro a membro, parando no primeiro que não descomprime."""
+    import zlib
+    parts = []
+    while data:
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            chunk = d.decompress(data)
+        except zlib.error:
+            break
+        if not d.eof:
+            break
+        parts.append(chunk)
+        data = d.unused_data
+    return b"".join(parts).decode("utf-8", errors="ignore")
+
+
+class ArchiveReader:
+    """Lê meses do arquivo com cache por mês (válida enquanto os bytes do índice não mudarem)."""
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[int, List[Trade]]] = {}
+
+    def period(self, period: str, entry: Mapping) -> List[Trade]:
+        size = int(entry.get("bytes") or 0)
+        with self._lock:
+            hit = self._cache.get(period)
+        metrics.cache_result("archive_period", bool(hit and hit[0] == size))
+        if hit and hit[0] == size:
+            return hit[1]
+        trades = read_period(os.path.join(self.archive_dir, entry["file"]), size)
+        with self._lock:
+            self._cache[period] = (size, trades)
+        return trades
+
+    def trades(self, index: Mapping, wallet_id: Optional[str] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Trade]:
+        """Trades arquivados dos meses que podem ter resultados (filtrar depois com reports.filter_trades)."""
+        out = []
+        for period in sorted(index.get("periods", {})):
+            entry = index["periods"][period]
+            if not may_match(entry, wallet_id, date_from, date_to):
+                continue
+            ts = self.period(period, entry)
+            out.extend(ts if wallet_id is None else (t for t in ts if t.wallet_id == wallet_id))
+        return out
+
+    def ids(self, index: Mapping, periods: Iterable[str]) -> set:
+        out = set()
+        for p in periods:
+            entry = index.get("periods", {}).get(p)
+            if entry:
+                out.update(t.id for t in self.period(p, entry))
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
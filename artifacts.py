@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de artefactos derivados dos dados (bytes de exportações, dicts de KPIs,
+imagens de gráficos...), chaveada por (artefacto, parâmetros, versão dos dados).
+
+    ver = ds.data_version(wallet_id)                  # ler ANTES do snapshot usado
+    png = ds.artifacts.get("wallet_charts", (wallet_id,), ver, lambda: render(ds.snapshot()))
+
+- A versão vem de DataStore.data_version (global, ou só de uma carteira); só
+  sobe. Lida antes do snapshot, um artefacto nunca fica guardado com uma
+  versão mais nova do que os dados de que saiu.
+- Uma entrada por (artefacto, parâmetros): a versão nova substitui a antiga
+  (que já não pode ser pedida), sem esperar pela expulsão.
+- LRU limitada em bytes (bytes/str pelo tamanho, o resto por
+  memreport.deep_size); valores acima de um quarto do limite não ficam
+  guardados. Limite em MB por TRADEIROS_CACHE_MB (omissão: 64; 0 desliga).
+- Acertos/falhas em metrics.cache_result(<artefacto>, ...). Dois pedidos iguais
+  ao mesmo tempo constroem ambos (sem lock durante a construção).
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+import metrics
+
+ENV_VAR = "TRADEIROS_CACHE_MB"
+DEFAULT_MB = 64
+
+
+def _size(value) -> int:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value) * 2
+    from memreport import deep_size
+    return deep_size(value)
+
+
+def _limit_from_env() -> int:
+    try:
+        return int(float(os.getenv(ENV_VAR, DEFAULT_MB)) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_MB * 1024 * 1024
+
+
+class ArtifactCache:
+    """LRU (artefacto, parâmetros) -> (versão, valor, bytes), limitada em bytes."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = _limit_from_env() if max_bytes is None else max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, object, int]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, artifact: str, params: Hashable, version: int, build: Callable[[], object]):
+        """Valor guardado para (artefacto, parâmetros) nesta versão; senão build(), guardado e devolvido."""
+        key = (artifact, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                metrics.cache_result(artifact, True)
+                return entry[1]
+        metrics.cache_result(artifact, False)
+        value = build()
+        self.put(artifact, params, version, value)
+        return value
+
+    def put(self, artifact: str, params: Hashable, version: int, value) -> None:
+        size = _size(value)
+        key = (artifact, params)
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                if old[0] > version:
+                    return  # outro pedido já guardou dados mais novos
+                self._bytes -= self._entries.pop(key)[2]
+            if size > self.max_bytes // 4:
+                return
+            self._entries[key] = (version, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, n) = self._entries.popitem(last=False)
+                self._bytes -= n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
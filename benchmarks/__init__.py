@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks do Tradeiros.
+
+Correr a partir da raiz do projeto:
+    python -m benchmarks                 # todas as suites
+    python -m benchmarks --only importtime --out bench.json
+"""
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Ponto de entrada:
+    python -m benchmarks [--only SUITE ...] [--out FICHEIRO]
+                         [--sizes N ...] [--repeat N]
+                         [--baseline FICHEIRO [--threshold 0.2]] [--save-baseline FICHEIRO]
+"""
+
+import sys
+import json
+import argparse
+import platform
+from datetime import datetime
+
+from benchmarks import importtime, stress_writers, first_window, scenarios, memory, api_load, baseline
+
+# nome -> (runner(args), format_report)
+SUITES = {
+    "importtime": (lambda a: importtime.run(repeat=a.repeat), importtime.format_report),
+    "stress": (lambda a: stress_writers.run(), stress_writers.format_report),
+    "firstwindow": (lambda a: first_window.run(repeat=a.repeat), first_window.format_report),
+    "scenarios": (lambda a: scenarios.run(sizes=a.sizes, repeat=a.repeat, seed=a.seed), scenarios.format_report),
+    "memory": (lambda a: memory.run(sizes=a.sizes, seed=a.seed), memory.format_report),
+    "api": (lambda a: api_load.run(duration=a.duration, seed=a.seed), api_load.format_report),
+}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks do Tradeiros")
+    ap.add_argument("--only", nargs="*", choices=sorted(SUITES), help="correr só estas suites")
+    ap.add_argument("--out", help="ficheiro JSON para os resultados")
+    ap.add_argument("--sizes", nargs="*", type=int, default=list(scenarios.DEFAULT_SIZES),
+                    help="tamanhos dos diários sintéticos (scenarios, memory), ex.: 1000 10000 1000000")
+    ap.add_argument("--repeat", type=int, default=3, help="repetições por medição")
+    ap.add_argument("--seed", type=int, default=42, help="semente do gerador")
+    ap.add_argument("--duration", type=float, default=5.0, help="segundos de carga (api)")
+    ap.add_argument("--baseline", help="comparar com este JSON; sai com 1 se houver regressões")
+    ap.add_argument("--threshold", type=float, default=0.2, help="regressão = mais lento que a baseline por esta fração")
+    ap.add_argument("--save-baseline", help="gravar os resultados como baseline neste ficheiro")
+    args = ap.parse_args(argv)
+
+    results = {}
+    for name in (args.only or list(SUITES)):
+        run, fmt = SUITES[name]
+        res = run(args)
+        results[name] = res
+        print(f"== {name} ==")
+        print(fmt(res))
+
+    payload = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    for path in filter(None, {args.out, args.save_baseline}):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {path}")
+    failed = [n for n, r in results.items() if isinstance(r, dict) and r.get("ok") is False]
+    if args.baseline:
+        rows = baseline.compare(payload, baseline.load(args.baseline), args.threshold)
+        print(f"== baseline ({args.baseline}) ==")
+        print(baseline.format_comparison(rows))
+        if any(r["regression"] for r in rows):
+            failed.append("baseline")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
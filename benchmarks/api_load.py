@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de carga da API local (api_server): servidor num processo próprio,
+preso a um core (sched_setaffinity, se existir), sobre um diário sintético;
+N ligações keep-alive concorrentes durante D segundos com uma mistura de
+criar / alterar / fechar trades e consultar histórico / estatísticas.
+
+No fim confirma no disco que todos os trades criados e fechados lá estão.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import tempfile
+import statistics
+import subprocess
+
+from benchmarks.generator import write_journal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (peso, operação)
+MIX = [(40, "create"), (15, "close"), (5, "update"), (20, "stats"), (20, "history")]
+
+
+class _Conn:
+    """Cliente HTTP/1.1 mínimo com keep-alive."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split(b" ", 2)[1])
+        length = 0
+        while True:
+            h = await self.reader.readline()
+            if h in (b"\r\n", b""):
+                break
+            k, _, v = h.partition(b":")
+            if k.strip().lower() == b"content-length":
+                length = int(v)
+        payload = json.loads(await self.reader.readexactly(length)) if length else None
+        return status, payload
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+async def _client(conn: _Conn, rnd: random.Random, deadline: float, wallets, state: dict):
+    ops, weights = zip(*[(o, w) for w, o in MIX])
+    await conn.open()
+    try:
+        while time.perf_counter() < deadline:
+            op = rnd.choices(ops, weights)[0]
+            open_ids = state["open"]
+            if op in ("close", "update") and not open_ids:
+                op = "create"
+            t0 = time.perf_counter()
+            if op == "create":
+                entry = round(rnd.uniform(90, 110), 2)
+                status, body = await conn.request("POST", "/trades", {
+                    "wallet": rnd.choice(wallets), "symbol": "BTCUSDT", "direction": "Long",
+                    "entry_price": entry, "stop_loss": round(entry * 0.98, 2),
+                    "take_profit": round(entry * 1.04, 2), "position_size": 1.0, "reason": "carga API"})
+                if status == 201:
+                    open_ids.append(body["id"])
+                    state["created"].add(body["id"])
+            elif op == "close":
+                tid = open_ids.pop(rnd.randrange(len(open_ids)))
+                status, _ = await conn.request("POST", f"/trades/{tid}/close", {"reason": "TP"})
+                if status == 200:
+                    state["closed"].add(tid)
+            elif op == "update":
+                tid = rnd.choice(open_ids)
+                status, _ = await conn.request("PATCH", f"/trades/{tid}", {"position_size": 2.0})
+            elif op == "stats":
+                status, _ = await conn.request("GET", "/stats")
+            else:
+                status, _ = await conn.request("GET", f"/trades?wallet={rnd.choice(wallets)}&limit=50")
+            ms = (time.perf_counter() - t0) * 1000.0
+            state["lat"].setdefault(op, []).append(ms)
+            if status >= 400:
+                state["errors"] += 1
+    finally:
+        conn.close()
+
+
+async def _load(port: int, wallets, connections: int, duration: float, seed: int) -> dict:
+    state = {"open": [], "created": set(), "closed": set(), "lat": {}, "errors": 0}
+    deadline = time.perf_counter() + duration
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        _client(_Conn("127.0.0.1", port), random.Random(seed + i), deadline, wallets, state)
+        for i in range(connections)
+    ])
+    elapsed = time.perf_counter() - t0
+    health_conn = _Conn("127.0.0.1", port)
+    await health_conn.open()
+    _, health = await health_conn.request("GET", "/health")
+    health_conn.close()
+    state["elapsed"] = elapsed
+    state["health"] = health
+    return state
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(len(xs) * p))], 2) if xs else None
+
+
+def _pin(cpu: int):
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError:
+            pass
+
+
+def run(n_trades: int = 10000, connections: int = 32, duration: float = 5.0, seed: int = 42) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="tradeiros_api_")
+    proc = None
+    affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    try:
+        write_journal(data_dir, n_trades, seed=seed)
+        with open(os.path.join(data_dir, "wallets.json"), encoding="utf-8") as f:
+            wallets = [w["id"] for w in json.load(f)]
+        env = dict(os.environ)
+        env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        env.pop("TRADEIROS_DATA_DIR", None)
+        ncpu = os.cpu_count() or 1
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "api_server", "--port", "0", "--data-dir", data_dir],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            preexec_fn=(lambda: _pin(0)) if hasattr(os, "sched_setaffinity") else None,
+        )
+        line = proc.stdout.readline()
+        if "http://" not in line:
+            return {"ok": False, "error": (line + proc.stderr.read())[-2000:]}
+        port = int(line.strip().rsplit(":", 1)[1])
+        if ncpu > 1:
+            _pin(1)  # o cliente não disputa o core do servidor
+        st = asyncio.run(_load(port, wallets, connections, duration, seed))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+        if affinity:
+            os.sched_setaffinity(0, affinity)
+
+    try:
+        from storage import DataStore
+        ds = DataStore(data_dir)
+        missing = [tid for tid in st["created"] if tid not in ds.trades]
+        not_closed = [tid for tid in st["closed"] if tid in ds.trades and ds.trades[tid].status != "Closed"]
+        on_disk = len(ds.trades)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    all_lat = [x for xs in st["lat"].values() for x in xs]
+    total = len(all_lat)
+    writes = st["health"].get("write_requests", 0)
+    batches = st["health"].get("write_batches", 0) or 1
+    return {
+        "ok": st["errors"] == 0 and not missing and not not_closed and on_disk == n_trades + len(st["created"]),
+        "trades": n_trades,
+        "connections": connections,
+        "duration_s": round(st["elapsed"], 2),
+        "server_cpus": 1 if hasattr(os, "sched_setaffinity") else None,
+        "requests": total,
+        "rps": round(total / st["elapsed"], 1),
+        "write_rps": round(writes / st["elapsed"], 1),
+        "avg_batch": round(writes / batches, 1),
+        "file_writes": batches,
+        "errors": st["errors"],
+        "lost_trades": len(missing),
+        "lost_closes": len(not_closed),
+        "p50_ms": _pct(all_lat, 0.50),
+        "p99_ms": _pct(all_lat, 0.99),
+        "by_op": {op: {"n": len(xs), "p50_ms": _pct(xs, 0.5), "p99_ms": _pct(xs, 0.99),
+                       "mean_ms": round(statistics.mean(xs), 2)} for op, xs in sorted(st["lat"].items())},
+    }
+
+
+def format_report(r: dict) -> str:
+    if "error" in r:
+        return f"ERRO: {r['error'].strip().splitlines()[-1] if r['error'].strip() else '?'}"
+    status = "OK" if r["ok"] else "FALHOU"
+    lines = [
+        f"{status}: {r['requests']} pedidos em {r['duration_s']}s com {r['connections']} ligações sobre "
+        f"{r['trades']} trades -> {r['rps']} pedidos/s (escritas {r['write_rps']}/s, "
+        f"{r['avg_batch']} por gravação, {r['file_writes']} gravações), "
+        f"p50 {r['p50_ms']} ms, p99 {r['p99_ms']} ms, erros {r['errors']}, perdidos {r['lost_trades']}/{r['lost_closes']}",
+    ]
+    for op, o in r["by_op"].items():
+        lines.append(f"  {op:<8s} {o['n']:>7d}  p50 {o['p50_ms']:>8} ms  p99 {o['p99_ms']:>8} ms")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_report(run()))
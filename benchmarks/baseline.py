@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Comparação de resultados com uma baseline gravada (o JSON de --out/--save-baseline).
+
+Métricas comparadas (todas "mais baixo é melhor"):
+- scenarios: median_ms de cada caso;
+- importtime: total_ms de cada módulo;
+- firstwindow: first_window_ms de eager/lazy;
+- memory: retained_bytes e peak_bytes de cada tamanho;
+- api: latências p50/p99 da carga sobre a API local.
+Um caso é regressão quando fica mais de `threshold` (fração) acima da baseline.
+"""
+
+import json
+from typing import Dict, List
+
+# diferenças abaixo disto são ruído, qualquer que seja a percentagem
+MIN_DELTA_MS = 1.0
+MIN_DELTA_BYTES = 64 * 1024
+
+
+def _is_bytes(key: str) -> bool:
+    return key.startswith("memory:")
+
+
+def flatten(results: dict) -> Dict[str, float]:
+    """{"suite:caso": valor} a partir de payload["results"]."""
+    out = {}
+    for key, c in (results.get("scenarios") or {}).get("cases", {}).items():
+        if "median_ms" in c:
+            out[f"scenarios:{key}"] = c["median_ms"]
+    for mod, r in (results.get("importtime") or {}).items():
+        if isinstance(r, dict) and "total_ms" in r:
+            out[f"importtime:{mod}"] = r["total_ms"]
+    fw = results.get("firstwindow") or {}
+    for mode in ("eager", "lazy"):
+        if isinstance(fw.get(mode), dict) and "first_window_ms" in fw[mode]:
+            out[f"firstwindow:{mode}"] = fw[mode]["first_window_ms"]
+    api = results.get("api") or {}
+    for m in ("p50_ms", "p99_ms"):
+        if api.get(m) is not None:
+            out[f"api:{m}"] = api[m]
+    for key, c in (results.get("memory") or {}).get("cases", {}).items():
+        for m in ("retained_bytes", "peak_bytes"):
+            if m in c:
+                out[f"memory:{key}:{m}"] = c[m]
+    return out
+
+
+def load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> List[dict]:
+    """Linhas {key, baseline, current, delta_pct, regression} para os casos comuns."""
+    cur = flatten(current.get("results", current))
+    base = flatten(baseline.get("results", baseline))
+    rows = []
+    for key in sorted(set(cur) & set(base)):
+        b, c = base[key], cur[key]
+        delta = ((c - b) / b * 100.0) if b > 0 else 0.0
+        rows.append({
+            "key": key, "baseline": b, "current": c, "delta_pct": round(delta, 1),
+            "regression": c - b > (MIN_DELTA_BYTES if _is_bytes(key) else MIN_DELTA_MS) and delta > threshold * 100.0,
+        })
+    return rows
+
+
+def format_comparison(rows: List[dict]) -> str:
+    if not rows:
+        return "Sem casos em comum com a baseline."
+    lines = []
+    for r in rows:
+        flag = "  << REGRESSÃO" if r["regression"] else ""
+        if _is_bytes(r["key"]):
+            vals = f"{r['baseline'] / 1024:10.1f} -> {r['current'] / 1024:10.1f} KB"
+        else:
+            vals = f"{r['baseline']:10.2f} -> {r['current']:10.2f} ms"
+        lines.append(f"{r['key']:44s} {vals}  {r['delta_pct']:+6.1f}%{flag}")
+    n = sum(r["regression"] for r in rows)
+    lines.append(f"{len(rows)} casos comparados, {n} regressões")
+    return "\n".join(lines)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Tempo até à primeira janela da app Qt, com abas construídas à cabeça
+("eager": todas as abas + refresh_all antes do show) ou preguiçosas
+("lazy": ui.lazy.LazyTab, só a aba inicial é criada).
+
+Cada medição corre num processo novo (imports a frio) sobre uma pasta de
+dados temporária com N trades; sem DISPLAY usa a plataforma Qt "offscreen".
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TAB_SPECS = [
+    ("Novo Trade", "tab_new", "ui.tab_new", "TabNew"),
+    ("Atualizar", "tab_update", "ui.tab_update", "TabUpdate"),
+    ("Histórico", "tab_history", "ui.tab_history", "TabHistory"),
+    ("Estatísticas", "tab_stats", "ui.tab_stats", "TabStats"),
+    ("Gráficos", "tab_charts", "ui.tab_charts", "TabCharts"),
+    ("Manutenção", "tab_admin", "ui.tab_admin", "TabAdmin"),
+]
+
+
+def seed_data_dir(data_dir: str, n_trades: int, seed: int = 7) -> None:
+    """Diário sintético com n_trades (benchmarks.generator), escrito diretamente em JSON."""
+    from benchmarks.generator import write_journal
+    write_journal(data_dir, n_trades, seed=seed)
+
+
+# ---------- processo filho ----------
+def _child(mode: str, data_dir: str) -> dict:
+    import time
+    t0 = time.perf_counter()
+    import importlib
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QLabel
+    from storage import DataStore
+    from ui.lazy import add_lazy_tabs, built_tabs
+
+    qa = QApplication.instance() or QApplication([])
+    t_imports = time.perf_counter()
+    ds = DataStore(data_dir)
+    t_data = time.perf_counter()
+
+    class _App:
+        def __init__(self):
+            self.ds = ds
+            self.logo_label = QLabel()
+
+        def current_wallet(self):
+            return next(iter(self.ds.wallets.values()), None)
+
+        def refresh_all(self):
+            for tab in built_tabs(tabs):
+                for m in ("refresh_table", "refresh", "populate_update_trade_combo"):
+                    if hasattr(tab, m):
+                        getattr(tab, m)()
+
+        def manage_symbols_dialog(self):
+            pass
+
+    app = _App()
+    win = QMainWindow()
+    tabs = QTabWidget()
+    win.setCentralWidget(tabs)
+    win.resize(1200, 800)
+
+    def factory(module, cls):
+        return lambda a: getattr(importlib.import_module(module), cls)(a)
+
+    specs = [(title, attr, factory(mod, cls)) for title, attr, mod, cls in TAB_SPECS]
+    if mode == "lazy":
+        add_lazy_tabs(tabs, app, specs)
+    else:
+        for title, attr, fac in specs:
+            w = fac(app)
+            setattr(app, attr, w)
+            tabs.addTab(w, title)
+        app.refresh_all()
+    t_built = time.perf_counter()
+
+    win.show()
+    shown = {}
+    QTimer.singleShot(0, lambda: (shown.setdefault("t", time.perf_counter()), qa.quit()))
+    qa.exec_()
+    # trabalho em segundo plano ainda pendente (ex.: estatísticas no QThreadPool)
+    from PyQt5.QtCore import QThreadPool
+    QThreadPool.globalInstance().waitForDone(30000)
+    qa.processEvents()
+    t_settled = time.perf_counter()
+
+    ms = lambda a, b: round((b - a) * 1000.0, 2)
+    return {
+        "mode": mode,
+        "imports_ms": ms(t0, t_imports),
+        "load_data_ms": ms(t_imports, t_data),
+        "build_tabs_ms": ms(t_data, t_built),
+        "first_window_ms": ms(t0, shown["t"]),
+        "settled_ms": ms(t0, t_settled),
+        "tabs_built": len(built_tabs(tabs)),
+    }
+
+
+def measure(mode: str, data_dir: str, repeat: int = 3) -> dict:
+    env = dict(os.environ)
+    if not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["TRADEIROS_WATCH"] = "0"  # só add_lazy_tabs liga o watcher: comparar só a construção das abas
+    best, err = None, ""
+    for _ in range(max(1, repeat)):
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.first_window", "--child", mode, data_dir],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        try:
+            res = json.loads(proc.stdout.strip().splitlines()[-1])
+        except Exception:
+            err = (proc.stderr or proc.stdout)[-2000:]
+            continue
+        if best is None or res["first_window_ms"] < best["first_window_ms"]:
+            best = res
+    return best or {"mode": mode, "error": err}
+
+
+def run(n_trades: int = 5000, repeat: int = 3) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="tradeiros_firstwin_")
+    try:
+        seed_data_dir(data_dir, n_trades)
+        eager = measure("eager", data_dir, repeat)
+        lazy = measure("lazy", data_dir, repeat)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    ok = "error" not in eager and "error" not in lazy
+    out = {"ok": ok, "trades": n_trades, "eager": eager, "lazy": lazy}
+    if ok:
+        out["speedup"] = round(eager["first_window_ms"] / max(lazy["first_window_ms"], 1e-6), 2)
+    return out
+
+
+def format_report(res: dict) -> str:
+    lines = [f"{res['trades']} trades"]
+    for mode in ("eager", "lazy"):
+        r = res[mode]
+        if "error" in r:
+            lines.append(f"{mode:6s} ERRO: {r['error'].strip().splitlines()[-1] if r['error'].strip() else '?'}")
+            continue
+        lines.append(
+            f"{mode:6s} primeira janela {r['first_window_ms']:9.1f} ms  "
+            f"(imports {r['imports_ms']:.0f} · dados {r['load_data_ms']:.0f} · abas {r['build_tabs_ms']:.0f})  "
+            f"estável {r['settled_ms']:.0f} ms  abas criadas {r['tabs_built']}"
+        )
+    if "speedup" in res:
+        lines.append(f"lazy vs eager: {res['speedup']}x")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "--child":
+        print(json.dumps(_child(sys.argv[2], sys.argv[3])))
+    else:
+        print(format_report(run()))
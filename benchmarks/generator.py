@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Gerador determinístico de diários sintéticos (mesmo esquema JSON da app).
+
+    python -m benchmarks.generator PASTA --trades 100000 [--wallets 12] [--seed 42]
+
+- Mesma semente + mesmos parâmetros = ficheiros idênticos.
+- Várias carteiras (tamanhos desiguais), ~30 paridades com popularidade
+  desigual, Long/Short, ~85% fechados (TP/SL/Manual), datas crescentes,
+  0–3 tags por trade (setup, timeframe, sessão, erro).
+- trades.json é escrito em streaming: 1M de trades não precisa da lista em memória.
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from models import Wallet, pnl_value
+
+SYMBOLS = [
+    ("BTCUSDT", 60000.0), ("ETHUSDT", 3000.0), ("SOLUSDT", 150.0), ("XRPUSDT", 0.6),
+    ("BNBUSDT", 550.0), ("ADAUSDT", 0.45), ("DOGEUSDT", 0.12), ("AVAXUSDT", 35.0),
+    ("DOTUSDT", 7.0), ("LINKUSDT", 15.0), ("MATICUSDT", 0.7), ("LTCUSDT", 80.0),
+    ("ATOMUSDT", 9.0), ("NEARUSDT", 5.0), ("APTUSDT", 9.0), ("ARBUSDT", 1.1),
+    ("OPUSDT", 2.2), ("INJUSDT", 25.0), ("SUIUSDT", 1.0), ("TIAUSDT", 10.0),
+    ("FILUSDT", 5.5), ("ETCUSDT", 25.0), ("UNIUSDT", 8.0), ("AAVEUSDT", 95.0),
+    ("TRXUSDT", 0.12), ("XLMUSDT", 0.11), ("PEPEUSDT", 0.00001), ("SHIBUSDT", 0.00002),
+    ("EURUSD", 1.08), ("XAUUSD", 2300.0),
+]
+
+TAGS = [
+    "setup:breakout", "setup:pullback", "setup:reversão", "tf:M15", "tf:H1", "tf:H4", "tf:D1",
+    "sessão:Ásia", "sessão:Londres", "sessão:NY", "erro:FOMO", "erro:sem plano", "erro:SL movido",
+]
+
+REASONS = [
+    "Rompimento de resistência com volume",
+    "Pullback à média de 20 no diário",
+    "Divergência de RSI no H4",
+    "Reteste de suporte após notícia",
+    "Padrão de bandeira, entrada na confirmação",
+    "Fundo duplo no H1, stop abaixo do pavio",
+    "Acumulação lateral, aposta no breakout",
+    "Tendência forte, entrada a favor após correção",
+    "Scalp na abertura de Nova Iorque",
+    "Falso rompimento, entrada contra",
+    "Confluência Fibonacci 61,8% + zona de liquidez",
+    "Gap de preço por preencher",
+]
+
+START = datetime(2021, 1, 4, 9, 0, 0)
+
+
+def default_wallets(n_trades: int) -> int:
+    """Nº de carteiras que cresce devagar com o diário (2 para 1k, ~20 para 1M)."""
+    return max(2, min(50, int(round(2 * math.log10(max(n_trades, 10)) - 4 + n_trades / 100000))))
+
+
+def make_wallets(n: int, rnd: random.Random) -> List[Wallet]:
+    out = []
+    for i in range(n):
+        out.append(Wallet(
+            id=f"wallet-{i:03d}", name=f"Carteira {i + 1}",
+            initial_balance=float(rnd.choice([1000, 2500, 5000, 10000, 25000, 100000])),
+            risk_percent=float(rnd.choice([0.5, 1.0, 1.0, 2.0])),
+            created_at=(START - timedelta(days=30 - i)).isoformat(timespec="seconds"),
+        ))
+    return out
+
+
+def iter_trades(n_trades: int, wallets: List[Wallet], rnd: random.Random,
+                closed_ratio: float = 0.85) -> Iterator[dict]:
+    """Trades (dicts no esquema de trades.json) por ordem de criação."""
+    # carteiras e paridades com pesos desiguais (lei de potência)
+    w_weights = [1.0 / (i + 1) ** 0.8 for i in range(len(wallets))]
+    s_weights = [1.0 / (i + 1) ** 1.1 for i in range(len(SYMBOLS))]
+    balances = {w.id: w.initial_balance for w in wallets}
+    # intervalo médio entre trades: o diário cobre ~3 anos qualquer que seja o tamanho
+    step = max(1.0, 3 * 365 * 24 * 3600 / max(n_trades, 1))
+    now = START
+    for i in range(n_trades):
+        w = rnd.choices(wallets, w_weights)[0]
+        sym, base = rnd.choices(SYMBOLS, s_weights)[0]
+        now = now + timedelta(seconds=int(rnd.expovariate(1.0 / step)) + 1)
+        direction = "Long" if rnd.random() < 0.6 else "Short"
+        entry = round(base * rnd.uniform(0.7, 1.3), 8 if base < 1 else 2)
+        dist = entry * rnd.uniform(0.004, 0.03)
+        sign = 1 if direction == "Long" else -1
+        sl = round(entry - sign * dist, 8 if base < 1 else 2)
+        tp = round(entry + sign * dist * rnd.choice([1.0, 1.5, 2.0, 3.0]), 8 if base < 1 else 2)
+        bal = balances[w.id]
+        risk_amount = max(bal, 1.0) * w.risk_percent / 100.0
+        size = round(risk_amount / abs(entry - sl), 6) if entry != sl else 0.0
+        risk_amount = abs(entry - sl) * size
+        t = dict(
+            id=f"T{i:07d}", wallet_id=w.id, symbol=sym, direction=direction,
+            entry_price=entry, stop_loss=sl, take_profit=tp,
+            position_size=size, position_value=round(entry * size, 2),
+            reason=rnd.choice(REASONS), created_at=now.isoformat(timespec="seconds"),
+            risk_amount=risk_amount,
+            risk_pct_of_balance=(risk_amount / bal * 100.0) if bal > 0 else 0.0,
+            status="Open", exit_price=None, closed_at=None, pnl_abs=None, pnl_pct=None,
+            result=None, close_reason=None, tags=rnd.sample(TAGS, rnd.randint(0, 3)),
+        )
+        # os mais recentes ficam mais vezes abertos
+        if rnd.random() < closed_ratio * (0.3 if i > n_trades * 0.98 else 1.0):
+            r = rnd.random()
+            if r < 0.4:
+                exit_price, reason = tp, "TP"
+            elif r < 0.8:
+                exit_price, reason = sl, "SL"
+            else:
+                exit_price, reason = round(entry * rnd.uniform(0.98, 1.02), 8 if base < 1 else 2), "Manual"
+            pnl = pnl_value(direction, entry, exit_price, size)
+            closed = now + timedelta(seconds=int(rnd.uniform(60, step * 3)))
+            t.update(
+                status="Closed", exit_price=exit_price, closed_at=closed.isoformat(timespec="seconds"),
+                pnl_abs=pnl, pnl_pct=(pnl / bal * 100.0) if bal > 0 else None,
+                result="Gain" if pnl > 0 else ("Loss" if pnl < 0 else "Break-even"),
+                close_reason=reason,
+            )
+            balances[w.id] = bal + pnl
+        yield t
+
+
+def generate(n_trades: int, n_wallets: Optional[int] = None, seed: int = 42) -> Tuple[List[Wallet], Iterator[dict]]:
+    rnd = random.Random(seed)
+    wallets = make_wallets(n_wallets or default_wallets(n_trades), rnd)
+    return wallets, iter_trades(n_trades, wallets, rnd)
+
+
+def write_journal(data_dir: str, n_trades: int, n_wallets: Optional[int] = None, seed: int = 42) -> dict:
+    """Escreve wallets.json, trades.json e symbols.json em data_dir. Devolve um resumo."""
+    os.makedirs(data_dir, exist_ok=True)
+    wallets, trades = generate(n_trades, n_wallets, seed)
+    with open(os.path.join(data_dir, "wallets.json"), "w", encoding="utf-8") as f:
+        json.dump([asdict(w) for w in wallets], f, ensure_ascii=False, indent=2)
+    closed = 0
+    with open(os.path.join(data_dir, "trades.json"), "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, t in enumerate(trades):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(t, ensure_ascii=False))
+            closed += t["status"] == "Closed"
+        f.write("]\n")
+    with open(os.path.join(data_dir, "symbols.json"), "w", encoding="utf-8") as f:
+        json.dump(sorted(s for s, _ in SYMBOLS), f, ensure_ascii=False, indent=2)
+    return {"trades": n_trades, "closed": closed, "wallets": len(wallets), "seed": seed,
+            "bytes": os.path.getsize(os.path.join(data_dir, "trades.json"))}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.generator", description="Gera um diário sintético")
+    ap.add_argument("data_dir")
+    ap.add_argument("--trades", type=int, default=10000)
+    ap.add_argument("--wallets", type=int)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+    print(json.dumps(write_journal(args.data_dir, args.trades, args.wallets, args.seed)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
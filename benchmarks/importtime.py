@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Relatório de tempos de import (resumo de `python -X importtime`).
+
+Cada módulo é importado num processo novo; do stderr extraímos o tempo
+cumulativo do módulo-alvo, os pacotes de topo mais caros e se alguma
+dependência pesada (pandas, matplotlib, openpyxl, ...) foi carregada.
+
+"streamlit_app" não se importa (corre a app): mede-se o primeiro render do
+script com streamlit.testing.v1.AppTest, num processo novo com uma pasta de
+dados vazia. O tempo é o da corrida do script (sem o import do próprio
+streamlit) e os pesados são os carregados por ela.
+"""
+
+import os
+import sys
+import json
+import subprocess
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# módulos que arrancam com a app (streamlit_app: primeiro render, ver measure_streamlit)
+DEFAULT_MODULES = [
+    "streamlit_app",
+    "models",
+    "storage",
+    "reports",
+    "tradeiros",
+    "ui.tab_new",
+    "ui.tab_update",
+    "ui.tab_history",
+    "ui.tab_stats",
+    "ui.tab_charts",
+    "ui.tab_admin",
+]
+
+HEAVY_PACKAGES = ["pandas", "numpy", "matplotlib", "openpyxl", "streamlit", "pyarrow"]
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """Converte as linhas 'import time: self | cumulative | name' em dicts."""
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cum_us = int(parts[1].strip())
+        except ValueError:
+            continue  # cabeçalho
+        raw = parts[2].rstrip()
+        name = raw.strip()
+        depth = (len(raw) - len(raw.lstrip(" ")) - 1) // 2
+        out.append({"name": name, "self_us": self_us, "cumulative_us": cum_us, "depth": depth})
+    return out
+
+
+def measure_import(module: str, repeat: int = 3, top: int = 8) -> dict:
+    """Importa `module` num processo limpo `repeat` vezes e fica com a melhor corrida."""
+    best = None
+    err = ""
+    for _ in range(max(1, repeat)):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=ROOT, env=dict(os.environ),
+        )
+        if proc.returncode != 0:
+            err = (proc.stderr.strip().splitlines() or ["erro desconhecido"])[-1]
+            break
+        rows = parse_importtime(proc.stderr)
+        target = next((r for r in rows if r["name"] == module), None)
+        total = target["cumulative_us"] if target else sum(r["self_us"] for r in rows)
+        if best is None or total < best[0]:
+            best = (total, rows)
+
+    if best is None:
+        return {"module": module, "ok": False, "error": err}
+
+    total, rows = best
+    by_pkg: Dict[str, int] = {}
+    for r in rows:
+        root = r["name"].split(".")[0]
+        by_pkg[root] = by_pkg.get(root, 0) + r["self_us"]
+    loaded = {r["name"].split(".")[0] for r in rows}
+    return {
+        "module": module,
+        "ok": True,
+        "total_ms": round(total / 1000.0, 2),
+        "modules_imported": len(rows),
+        "heavy_loaded": [p for p in HEAVY_PACKAGES if p in loaded],
+        "top_packages_ms": {
+            k: round(v / 1000.0, 2)
+            for k, v in sorted(by_pkg.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        },
+    }
+
+
+_STREAMLIT_RUN = """
+import sys, time, json, tempfile
+import streamlit
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+t0 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+ms = (time.perf_counter() - t0) * 1000.0
+print(json.dumps({"ms": ms, "error": str(at.exception[0].value) if at.exception else None,
+                  "loaded": sorted({m.split(".")[0] for m in set(sys.modules) - before}),
+                  "count": len(set(sys.modules) - before)}))
+"""
+
+
+def measure_streamlit(repeat: int = 3) -> dict:
+    """Primeiro render de streamlit_app.py (AppTest, processo novo, dados vazios); fica a melhor corrida."""
+    import shutil
+    import tempfile
+    best, err = None, ""
+    for _ in range(max(1, repeat)):
+        data_dir = tempfile.mkdtemp(prefix="tradeiros_st_")
+        env = dict(os.environ, TRADEIROS_DATA_DIR=data_dir, TRADEIROS_WATCH="0")
+        try:
+            proc = subprocess.run(
+                [sys.executable, "-c", _STREAMLIT_RUN, os.path.join(ROOT, "streamlit_app.py")],
+                capture_output=True, text=True, cwd=ROOT, env=env,
+            )
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        try:
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            err = (proc.stderr.strip().splitlines() or ["erro desconhecido"])[-1]
+            break
+        if r["error"]:
+            err = r["error"]
+            break
+        if best is None or r["ms"] < best["ms"]:
+            best = r
+
+    if best is None:
+        return {"module": "streamlit_app", "ok": False, "error": err}
+    return {
+        "module": "streamlit_app",
+        "ok": True,
+        "total_ms": round(best["ms"], 2),
+        "modules_imported": best["count"],
+        "heavy_loaded": [p for p in HEAVY_PACKAGES if p in best["loaded"]],
+        "top_packages_ms": {},
+    }
+
+
+def run(modules: List[str] = None, repeat: int = 3) -> dict:
+    return {m: (measure_streamlit(repeat=repeat) if m == "streamlit_app" else measure_import(m, repeat=repeat))
+            for m in (modules or DEFAULT_MODULES)}
+
+
+def format_report(results: dict) -> str:
+    lines = [f"{'módulo':<18} {'total ms':>9}  pesados carregados"]
+    for mod, r in results.items():
+        if not r.get("ok"):
+            lines.append(f"{mod:<18} {'—':>9}  ERRO: {r.get('error', '')}")
+            continue
+        heavy = ", ".join(r["heavy_loaded"]) or "—"
+        lines.append(f"{mod:<18} {r['total_ms']:>9.2f}  {heavy}")
+    return "\n".join(lines)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Memória ocupada pelos dados carregados, por tamanho de diário sintético:
+tracemalloc durante DataStore(...) (retido e pico) e tamanho profundo do
+snapshot (memreport.datastore_report). Cada tamanho corre num processo novo
+para que o pico não herde alocações de medições anteriores.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+from benchmarks.generator import write_journal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def _child(data_dir: str) -> dict:
+    import memreport
+    ds, load = memreport.traced_load(data_dir, limit=5)
+    d = memreport.datastore_report(ds)
+    return {
+        "retained_bytes": load["retained_bytes"],
+        "peak_bytes": load["peak_bytes"],
+        "bytes_per_trade": load["bytes_per_trade"],
+        "snapshot_bytes": d["total_bytes"],
+        "top": load["top"],
+    }
+
+
+def measure(data_dir: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.memory", "--child", data_dir],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except Exception:
+        return {"error": (proc.stderr or proc.stdout)[-2000:]}
+
+
+def run(sizes=DEFAULT_SIZES, seed: int = 42) -> dict:
+    cases = {}
+    for n in sizes:
+        data_dir = tempfile.mkdtemp(prefix=f"tradeiros_mem_{n}_")
+        try:
+            write_journal(data_dir, n, seed=seed)
+            cases[f"load@{n}"] = dict(n=n, **measure(data_dir))
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return {"ok": all("error" not in c for c in cases.values()), "cases": cases}
+
+
+def format_report(res: dict) -> str:
+    from memreport import format_bytes
+    lines = []
+    for key, c in res["cases"].items():
+        if "error" in c:
+            err = c["error"].strip().splitlines()
+            lines.append(f"{key:14s} ERRO: {err[-1] if err else '?'}")
+            continue
+        lines.append(f"{key:14s} retido {format_bytes(c['retained_bytes']):>10s}  pico {format_bytes(c['peak_bytes']):>10s}  "
+                     f"snapshot {format_bytes(c['snapshot_bytes']):>10s}  {c['bytes_per_trade']:.0f} B/trade")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "--child":
+        print(json.dumps(_child(sys.argv[2])))
+    else:
+        print(format_report(run()))
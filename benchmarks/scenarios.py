@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Cenários cronometrados sobre diários sintéticos (benchmarks.generator) de
+vários tamanhos: carregar/gravar, saldos, curva de capital, estatísticas,
+filtros do histórico, pesquisa na razão e exportação (Excel, NDJSON).
+
+Cada caso fica em results["cases"]["<cenário>@<n>"] = {n, median_ms, min_ms, runs};
+o mesmo nome identifica o caso em baselines de outras máquinas/versões.
+"""
+
+import io
+import time
+import shutil
+import tempfile
+import statistics
+from typing import Callable, Dict, Iterable, List
+
+from benchmarks.generator import write_journal
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+EXCEL_MAX_ROWS = 20000    # acima disto o openpyxl domina (minutos) e não diz nada de novo
+
+
+def _time(fn: Callable[[], object], repeat: int) -> dict:
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {"median_ms": round(statistics.median(times), 3), "min_ms": round(min(times), 3), "runs": len(times)}
+
+
+def _closed(ds, wallet_id):
+    keys, cols = ds.columns.closed_series(wallet_id, ("pnl_abs", "risk_amount"))
+    return keys, cols["pnl_abs"], cols["risk_amount"]
+
+
+def _scenarios(ds) -> List[tuple]:
+    """(nome, função, repetições relativas) sobre um DataStore já carregado."""
+    from models import wallet_current_balance, equity_curve
+    from reports import (compute_stats, wallet_stats, global_stats, filter_trades, trade_rows, write_excel,
+                         EXPORT_COLUMNS)
+    from rolling import rolling_metrics
+    import query
+
+    snap = ds.snapshot()
+    wallets, trades = snap.wallets, snap.trades
+    by_wallet: Dict[str, list] = {}
+    for t in trades.values():
+        by_wallet.setdefault(t.wallet_id, []).append(t)
+    big_id = max(by_wallet, key=lambda k: len(by_wallet[k])) if by_wallet else None
+    big = wallets.get(big_id) if big_id else None
+    sym = next(iter(trades.values())).symbol if trades else None
+    q = query.compile("(symbol:BTC*,ETH* dir:Short pnl<0 risk_pct>0.5 closed:2022-01..2023-06) "
+                      "OR (tag:tf:h4 -tag:erro:* rr>=2) OR reason:diverg", wallets)
+
+    def balances():
+        for wid, w in wallets.items():
+            wallet_current_balance(by_wallet.get(wid, []), w.initial_balance)
+
+    def export_excel():
+        rows = trade_rows(trades.values(), wallets)
+        write_excel(io.BytesIO(), rows, wallet_stats(big, trades) if big else {}, global_stats(wallets, trades))
+
+    def columns_load():
+        # vista nova sobre a cache em disco (columns/), como ao abrir a app
+        import columnar
+        columnar.ColumnarView(ds, ds.columns.path).ensure()
+
+    def export_ndjson():
+        import os
+        import transfer
+        path = os.path.join(ds.data_dir, "bench.ndjson.gz")
+        transfer.export_trades(path, ds.iter_history())
+        os.remove(path)
+
+    def heatmaps_all():
+        from heatmaps import weekday_hour, daily_pnl
+        _, cols = ds.columns.closed_series(None, ("pnl_abs", "created_at_s", "closed_at_s"))
+        weekday_hour(cols["created_at_s"], cols["pnl_abs"])
+        daily_pnl(cols["closed_at_s"], cols["pnl_abs"])
+
+    def frame_rows():
+        import pandas as pd
+        pd.DataFrame(trade_rows(trades.values(), wallets), columns=EXPORT_COLUMNS)
+
+    out = [
+        ("load_all", ds.load_all, 1),
+        ("save_trades", ds.save_trades, 1),
+        ("wallet_current_balance", balances, 3),
+        ("equity_curve", lambda: equity_curve(by_wallet.get(big_id, []), big.initial_balance if big else 0.0), 3),
+        ("compute_stats", lambda: compute_stats(trades.values(), 10000.0), 3),
+        ("wallet_stats", lambda: [wallet_stats(w, trades) for w in wallets.values()], 3),
+        ("global_stats", lambda: global_stats(wallets, trades), 3),
+        ("filter_wallet", lambda: filter_trades(trades.values(), wallet_id=big_id), 3),
+        ("filter_combined", lambda: filter_trades(trades.values(), wallet_id=big_id, date_from="2022-01-01",
+                                                   date_to="2023-06-30", symbol=sym, status="Closed"), 3),
+        ("search_build", ds.reason_index.rebuild, 1),
+        ("search_query", lambda: ds.reason_index.search("diverg rsi"), 5),
+        ("filter_reason", lambda: filter_trades(trades.values(), wallet_id=big_id, reason="rompimento",
+                                                index=ds.reason_index), 3),
+        ("facets_build", ds.facets.rebuild, 1),
+        # mesmo filtro combinado, candidatos pela interseção dos bitmaps (facets.py)
+        ("facet_combined", lambda: filter_trades(None, wallet_id=big_id, date_from="2022-01-01", date_to="2023-06-30",
+                                                 symbol=sym, status="Closed", facets=ds.facets), 3),
+        ("facet_tags", lambda: filter_trades(None, tags=["tf:H4", "erro:FOMO"], result="Loss", facets=ds.facets), 3),
+        ("columns_build", ds.columns.rebuild, 1),
+        # consulta complexa (query.py): colunas numpy vs. trade a trade
+        ("query_columns", lambda: filter_trades(None, query=q, columns=ds.columns), 3),
+        ("query_rowwise", lambda: filter_trades(trades.values(), query=q), 1),
+        # cache em colunas mapeada do disco; tabela e curva de capital a partir das colunas
+        ("columns_load", columns_load, 3),
+        ("frame_columns", lambda: ds.columns.frame(trades.values(), wallets), 3),
+        ("frame_rows", frame_rows, 3),
+        ("equity_columns", lambda: ds.columns.closed_pnls(big_id), 3),
+        # métricas móveis (rolling.py) sem a cache de artefactos: colunas + somas cumulativas
+        ("rolling_metrics", lambda: rolling_metrics(*_closed(ds, big_id), window=50), 3),
+        # mapas de calor (heatmaps.py): np.bincount sobre as datas já em segundos
+        ("heatmaps", heatmaps_all, 3),
+        # exportação em fluxo (transfer.py): memória constante, qualquer tamanho
+        ("export_ndjson_gz", export_ndjson, 1),
+    ]
+    if len(trades) <= EXCEL_MAX_ROWS:
+        out.append(("export_excel", export_excel, 1))
+    return out
+
+
+def run(sizes: Iterable[int] = DEFAULT_SIZES, repeat: int = 3, seed: int = 42) -> dict:
+    from storage import DataStore
+    cases, datasets = {}, {}
+    ok = True
+    for n in sizes:
+        data_dir = tempfile.mkdtemp(prefix=f"tradeiros_bench_{n}_")
+        try:
+            datasets[str(n)] = write_journal(data_dir, n, seed=seed)
+            ds = DataStore(data_dir)
+            for name, fn, weight in _scenarios(ds):
+                try:
+                    res = _time(fn, repeat * weight)
+                except Exception as e:
+                    ok = False
+                    res = {"error": f"{type(e).__name__}: {e}"}
+                cases[f"{name}@{n}"] = dict(n=n, **res)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return {"ok": ok, "seed": seed, "repeat": repeat, "datasets": datasets, "cases": cases}
+
+
+def format_report(res: dict) -> str:
+    lines = []
+    for n, d in res["datasets"].items():
+        lines.append(f"n={n}: {d['wallets']} carteiras, {d['closed']} fechados, {d['bytes'] / 1e6:.1f} MB")
+    for key, c in res["cases"].items():
+        if "error" in c:
+            lines.append(f"  {key:32s} ERRO: {c['error']}")
+        else:
+            lines.append(f"  {key:32s} {c['median_ms']:10.2f} ms  (min {c['min_ms']:.2f}, {c['runs']} execuções)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_report(run()))
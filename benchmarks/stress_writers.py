@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Stress de escrita concorrente: N processos, cada um com o seu DataStore sobre a
+mesma pasta de dados, a criar a sua carteira, a adicionar/fechar trades nela e
+a acrescentar paridades. No fim confirma-se que nenhuma atualização se perdeu e
+que cada trade ficou na carteira de quem o criou (todas as escritas passam pelo
+FileLock + merge por versão do storage).
+"""
+
+import time
+import shutil
+import tempfile
+import multiprocessing as mp
+
+from models import Trade
+
+
+def _make_trade(tid: str, wallet_id: str) -> Trade:
+    return Trade(
+        id=tid, wallet_id=wallet_id, symbol="BTCUSDT", direction="Long",
+        entry_price=100.0, stop_loss=90.0, take_profit=120.0, position_size=1.0,
+        position_value=100.0, reason="stress", created_at="2025-01-01T00:00:00",
+        risk_amount=10.0, risk_pct_of_balance=0.1, status="Open", exit_price=None,
+        closed_at=None, pnl_abs=None, pnl_pct=None, result=None, close_reason=None,
+    )
+
+
+def _writer(data_dir: str, writer: int, n_ops: int, start) -> None:
+    from storage import DataStore
+    ds = DataStore(data_dir)
+    start.wait()
+    # carteira própria: os outros processos só a conhecem depois de a lerem do disco
+    wallet_id = ds.add_wallet(f"stress {writer:03d}", 10000.0, 1.0).id
+    for i in range(n_ops):
+        t = _make_trade(f"W{writer:03d}{i:05d}", wallet_id)
+        ds.add_trade(t)
+        if i % 2:
+            ds.close_trade(t.id, 120.0, "TP")
+    ds.add_symbol(f"S{writer:03d}USDT")
+
+
+def run(writers: int = 8, ops: int = 25) -> dict:
+    from storage import DataStore
+    data_dir = tempfile.mkdtemp(prefix="tradeiros_stress_")
+    try:
+        DataStore(data_dir).add_wallet("stress", 10000.0, 1.0)  # a primeira, para onde iria um trade mal migrado
+        ctx = mp.get_context("spawn")
+        start = ctx.Event()
+        procs = [ctx.Process(target=_writer, args=(data_dir, i, ops, start)) for i in range(writers)]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+
+        ds = DataStore(data_dir)
+        expected = {f"W{i:03d}{j:05d}": ("Closed" if j % 2 else "Open") for i in range(writers) for j in range(ops)}
+        missing = [tid for tid in expected if tid not in ds.trades]
+        wrong_status = [tid for tid, stt in expected.items() if tid in ds.trades and ds.trades[tid].status != stt]
+        wallet_of = {w.name: w.id for w in ds.wallets.values()}
+        missing_wallets = [i for i in range(writers) if f"stress {i:03d}" not in wallet_of]
+        wrong_wallet = [tid for tid in expected if tid in ds.trades
+                        and ds.trades[tid].wallet_id != wallet_of.get(f"stress {tid[1:4]}")]
+        missing_syms = [f"S{i:03d}USDT" for i in range(writers) if f"S{i:03d}USDT" not in ds.symbols]
+        writes = writers * (ops + ops // 2 + 2)
+        return {
+            "writers": writers,
+            "ops_per_writer": ops,
+            "ok": not (missing or wrong_status or missing_wallets or wrong_wallet or missing_syms) and all(p.exitcode == 0 for p in procs),
+            "trades_expected": len(expected),
+            "trades_found": len(ds.trades),
+            "lost_trades": len(missing),
+            "lost_updates": len(wrong_status),
+            "lost_wallets": len(missing_wallets),
+            "wrong_wallet": len(wrong_wallet),
+            "lost_symbols": len(missing_syms),
+            "elapsed_s": round(elapsed, 3),
+            "writes_per_s": round(writes / elapsed, 1) if elapsed > 0 else None,
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def format_report(r: dict) -> str:
+    status = "OK" if r["ok"] else "FALHOU"
+    return (f"{status}: {r['writers']} processos x {r['ops_per_writer']} trades -> "
+            f"{r['trades_found']}/{r['trades_expected']} trades, perdidos={r['lost_trades']}, "
+            f"updates perdidos={r['lost_updates']}, carteiras perdidas={r['lost_wallets']}, "
+            f"na carteira errada={r['wrong_wallet']}, paridades perdidas={r['lost_symbols']}, "
+            f"{r['elapsed_s']}s ({r['writes_per_s']} escritas/s)")
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Gráficos matplotlib da app Qt: evolução do saldo, PnL por trade fechado,
+métricas móveis (rolling.py) e mapas de calor por hora/dia (heatmaps.py).
+
+- draw_equity / draw_pnl: redesenho completo (troca de carteira, histórico editado).
+- append_equity / append_pnl: acrescentam um ponto/barra e redesenham só isso
+  por blitting (fundo guardado após o último desenho completo + artistas
+  "animated" da cauda); o custo não cresce com o tamanho do histórico.
+- Os limites dos eixos ganham folga; só quando um ponto novo sai deles (ou a
+  cauda fica grande) é que há um desenho completo, que também a incorpora.
+- draw_rolling / draw_heatmaps: sempre completos (as séries vêm prontas e em
+  cache de rolling.wallet_rolling / heatmaps.wallet_heatmaps; desenhar é o
+  que custa).
+"""
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+
+import perf
+
+TAIL_MAX = 200        # artistas na cauda antes de um redesenho completo
+X_HEADROOM = 1.25     # eixo X cresce em proporção (redesenhos completos amortizados)
+Y_MARGIN = 0.08
+
+GAIN_COLOR = "#4caf50"
+LOSS_COLOR = "#e53935"
+LINE_COLOR = "#42a5f5"
+
+
+class _BlitCanvas(FigureCanvasQTAgg):
+    def __init__(self, parent=None, title="", xlabel="", ylabel=""):
+        self.fig = Figure(figsize=(5, 3), tight_layout=True)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.ax = self.fig.add_subplot(111)
+        self._labels = (title, xlabel, ylabel)
+        self._bg = None
+        self._tail = []  # artistas animated desenhados por blit
+        self._tail_pending = False
+        self.mpl_connect("draw_event", self._on_draw)
+
+    # ---------- estrutura comum ----------
+    def _reset_axes(self):
+        self.ax.clear()
+        title, xlabel, ylabel = self._labels
+        self.ax.set_title(title); self.ax.set_xlabel(xlabel); self.ax.set_ylabel(ylabel)
+        self._tail = []
+        self._tail_pending = False
+        self._bg = None
+
+    def _set_limits(self, n: int, lo: float, hi: float):
+        self.ax.set_xlim(0, max(n * X_HEADROOM, n + 5, 10))
+        span = (hi - lo) or abs(hi) or 1.0
+        self.ax.set_ylim(lo - span * Y_MARGIN, hi + span * Y_MARGIN)
+
+    def _fits(self, x: float, y: float) -> bool:
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    def _on_draw(self, event):
+        # desenho completo (também em resize): novo fundo + cauda por cima
+        self._bg = self.copy_from_bbox(self.ax.bbox)
+        for a in self._tail:
+            self.ax.draw_artist(a)
+
+    def _blit_tail(self, artists):
+        self._tail.extend(artists)
+        if self._bg is None or not self.isVisible():
+            # escondido: um só desenho completo quando voltar a ser mostrado
+            self._tail_pending = True
+            return
+        self.restore_region(self._bg)
+        for a in self._tail:
+            self.ax.draw_artist(a)
+        self.blit(self.ax.bbox)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._tail_pending:
+            self._tail_pending = False
+            self.draw_idle()
+
+
+class EquityCanvas(_BlitCanvas):
+    def __init__(self, parent=None):
+        super().__init__(parent, "Evolução do Saldo", "Trade fechado #", "Saldo")
+        self._ys = []
+        self._initial = 0.0
+        self.draw_equity([], 0.0)
+
+    def draw_equity(self, eq, initial_balance: float):
+        """eq: [(data, saldo)] como models.equity_curve (só o saldo é desenhado)."""
+        self._initial = float(initial_balance or 0.0)
+        self._ys = [float(b) for _, b in eq]
+        self._redraw()
+
+    @perf.timed("charts.equity.redraw")
+    def _redraw(self):
+        self._reset_axes()
+        ys = [self._initial] + self._ys
+        self.ax.axhline(self._initial, color="#888", lw=0.8, ls="--")
+        self.ax.plot(range(len(ys)), ys, color=LINE_COLOR, marker="o" if len(ys) <= 60 else None, ms=3)
+        self._set_limits(len(ys), min(ys), max(ys))
+        self.draw_idle()
+
+    def append_equity(self, balance: float):
+        """Acrescenta o saldo após mais um trade fechado."""
+        prev = self._ys[-1] if self._ys else self._initial
+        self._ys.append(float(balance))
+        x = len(self._ys)
+        if len(self._tail) >= TAIL_MAX or not self._fits(x, balance):
+            self._redraw()
+            return
+        seg, = self.ax.plot([x - 1, x], [prev, balance], color=LINE_COLOR,
+                            marker="o" if x <= 60 else None, ms=3, animated=True)
+        self._blit_tail([seg])
+
+
+class PnLCanvas(_BlitCanvas):
+    def __init__(self, parent=None):
+        super().__init__(parent, "PnL por Trade (fechados)", "Trade fechado #", "PnL")
+        self._pnls = []
+        self.draw_pnl([])
+
+    def draw_pnl(self, pnls):
+        self._pnls = [float(p) for p in pnls]
+        self._redraw()
+
+    @perf.timed("charts.pnl.redraw")
+    def _redraw(self):
+        self._reset_axes()
+        self.ax.axhline(0, color="#888", lw=0.8)
+        if self._pnls:
+            xs = range(1, len(self._pnls) + 1)
+            self.ax.bar(xs, self._pnls, align="center",
+                        color=[GAIN_COLOR if p >= 0 else LOSS_COLOR for p in self._pnls])
+        self._set_limits(len(self._pnls) + 1, min(self._pnls + [0.0]), max(self._pnls + [0.0]))
+        self.draw_idle()
+
+    def append_pnl(self, pnl: float):
+        """Acrescenta a barra de mais um trade fechado."""
+        self._pnls.append(float(pnl))
+        x = len(self._pnls)
+        if len(self._tail) >= TAIL_MAX or not self._fits(x + 1, pnl):
+            self._redraw()
+            return
+        bars = self.ax.bar([x], [pnl], align="center", color=GAIN_COLOR if pnl >= 0 else LOSS_COLOR)
+        for b in bars:
+            b.set_animated(True)
+        self._blit_tail(list(bars))
+
+
+class RollingCanvas(FigureCanvasQTAgg):
+    """Métricas móveis por trade fechado: acerto % e R médio em cima, esperança e PnL de D dias em baixo."""
+
+    def __init__(self, parent=None):
+        self.fig = Figure(figsize=(5, 3), tight_layout=True)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.ax_rate, self.ax_pnl = self.fig.subplots(2, 1, sharex=True)
+        self.ax_r = self.ax_rate.twinx()
+        self.draw_rolling(None)
+
+    @perf.timed("charts.rolling.redraw")
+    def draw_rolling(self, m):
+        """m: dict de rolling.rolling_metrics (None = vazio)."""
+        for ax in (self.ax_rate, self.ax_r, self.ax_pnl):
+            ax.clear()
+        n = len(m["expectancy"]) if m else 0
+        window, days = (m["window"], m["days"]) if m else (0, 0)
+        self.ax_rate.set_title(f"Últimos {window} fechados / {days} dias" if m else "Métricas móveis")
+        self.ax_rate.set_ylabel("Acerto %")
+        self.ax_r.set_ylabel("R médio")
+        self.ax_pnl.set_ylabel("PnL")
+        self.ax_pnl.set_xlabel("Trade fechado #")
+        self.ax_pnl.axhline(0, color="#888", lw=0.8)
+        if n:
+            xs = range(1, n + 1)
+            self.ax_rate.plot(xs, m["winrate_pct"], color=LINE_COLOR, lw=1.2, label="Acerto %")
+            self.ax_rate.set_ylim(0, 100)
+            self.ax_r.plot(xs, m["avg_r"], color="#ab47bc", lw=1.0, label="R médio")
+            self.ax_r.axhline(0, color="#ab47bc", lw=0.6, ls=":")
+            self.ax_pnl.plot(xs, m["expectancy"], color=GAIN_COLOR, lw=1.2, label="Esperança")
+            self.ax_pnl.plot(xs, m["pnl_days"], color="#ff9800", lw=1.0, label=f"PnL {days} dias")
+            self.ax_pnl.legend(loc="upper left", fontsize=7)
+        self.draw_idle()
+
+
+class HeatmapCanvas(FigureCanvasQTAgg):
+    """PnL e acerto por dia da semana × hora de abertura, e calendário do PnL diário."""
+
+    def __init__(self, parent=None):
+        self.fig = Figure(figsize=(5, 6), tight_layout=True)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.draw_heatmaps(None)
+
+    @perf.timed("charts.heatmaps.redraw")
+    def draw_heatmaps(self, h):
+        """h: dict de heatmaps.wallet_heatmaps (None = vazio)."""
+        import heatmaps
+        self.fig.clear()  # as barras de cor são eixos próprios: recomeçar a figura
+        ax_pnl, ax_rate, ax_cal = self.fig.subplots(3, 1)
+        if h is None:
+            h = {"hours": heatmaps.weekday_hour([], []), "days": heatmaps.daily_pnl([], [])}
+        heatmaps.plot_weekday_hour(ax_pnl, h["hours"], "pnl")
+        heatmaps.plot_weekday_hour(ax_rate, h["hours"], "winrate_pct")
+        heatmaps.plot_calendar(ax_cal, h["days"])
+        self.draw_idle()
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Vista em colunas (numpy) dos trades, para avaliar filtros de uma vez sobre
+todas as linhas em vez de trade a trade (ver query.py).
+
+    view = ds.columns
+    ids = view.ids(query.compile("symbol:BTC* pnl<0"))
+
+- Uma linha fixa por trade (do DataStore e do arquivo frio), como em
+  facets.py; trades apagados ficam com alive=False.
+- Texto repetido (carteira, paridade, direção, estado, resultado, razão,
+  tags) fica como categoria: códigos int32 + lista de valores. Um filtro de
+  texto decide uma vez por valor distinto e indexa o resultado pelos códigos.
+- Números em float64 (None -> NaN: nenhuma comparação passa); datas como
+  texto ISO 'YYYY-MM-DDTHH:MM:SS' (comparar texto = comparar datas; inválidas
+  ficam "") e também em segundos int64 (seconds(); agrupar por dia/hora sem
+  ler texto).
+- Construída na primeira consulta e depois mantida pelos eventos do DataStore
+  (a linha do trade alterado é reescrita no lugar, sob o lock). Alterações em
+  bloco marcam-na para reconstruir. numpy só é importado aqui (vem com pandas).
+- Persistida em columns/ ao lado dos dados: um .npy por coluna numa pasta
+  nova a cada gravação, e columns/meta.json com as assinaturas de
+  trades.json/archive.json/wallets.json (versão do lock, mtime, tamanho: ver
+  storage.file_signature), a pasta atual e os valores das categorias. Se as
+  assinaturas coincidirem ao abrir, as colunas são mapeadas em memória
+  (np.load mmap_mode="c": só se lê o que se usa e escrever não toca no
+  ficheiro) em vez de reconstruídas. Grava-se depois de cada reconstrução e à
+  saída do processo, se tiver mudado; pastas antigas apagam-se quando der
+  (no Windows, uma pasta ainda mapeada por outro processo fica para depois).
+- Também serve de entrada à análise sem converter trade a trade: frame()
+  (DataFrame com as colunas do export), closed_pnls()/closed_series()
+  (séries dos gráficos e das métricas móveis).
+"""
+import os
+import atexit
+import shutil
+import threading
+import uuid
+import weakref
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from events import TRADE_EVENTS, CollectionChanged, TradeDeleted, WalletChanged
+from models import Trade
+import metrics
+import perf
+
+CATEGORICAL = ("wallet_id", "symbol", "direction", "status", "result", "close_reason", "reason", "tags")
+NUMERIC = ("entry_price", "stop_loss", "take_profit", "position_size", "position_value",
+           "risk_amount", "risk_pct_of_balance", "exit_price", "pnl_abs", "pnl_pct")
+DATES = ("created_at", "closed_at")
+DATE_LEN = 19  # 'YYYY-MM-DDTHH:MM:SS'
+BAD_SECONDS = -(2 ** 63)  # data vazia/inválida nas colunas de segundos (NaT do numpy)
+CACHE_DIR = "columns"
+META_FILE = "meta.json"
+
+
+def category_value(t: Trade, name: str):
+    """Valor de uma coluna de categoria (tags: tuplo; em falta: "")."""
+    if name == "tags":
+        return tuple(t.tags or ())
+    if name == "status":
+        return t.status or "Open"
+    return getattr(t, name, None) or ""
+
+
+def number_value(t: Trade, name: str) -> float:
+    try:
+        v = getattr(t, name, None)
+        return float("nan") if v is None else float(v)
+    except Exception:
+        return float("nan")
+
+
+def date_value(t: Trade, name: str) -> str:
+    v = getattr(t, name, None) or ""
+    return v[:DATE_LEN] if len(v) >= 10 and v[4] == "-" and v[7] == "-" else ""
+
+
+def seconds_value(date: str) -> int:
+    """Uma data de date_value em segundos desde 1970, como iso_seconds."""
+    import numpy as np
+    try:
+        return int(np.datetime64(date or "NaT", "s").astype(np.int64))
+    except ValueError:
+        return BAD_SECONDS
+
+
+def iso_seconds(dates):
+    """
+    Datas ISO (como nas colunas de datas) -> segundos desde 1970 (int64), de uma
+    vez pelo numpy; vazias ou inválidas ficam BAD_SECONDS.
+    """
+    import numpy as np
+    dates = np.asarray(dates)
+    try:
+        ts = np.where(dates != "", dates, "NaT").astype("datetime64[s]")
+    except ValueError:
+        ts = np.array([seconds_value(d) for d in dates.tolist()], dtype=np.int64)
+    return ts.astype(np.int64)  # NaT -> mínimo de int64 (= BAD_SECONDS)
+
+
+class ColumnarView:
+    """Colunas numpy dos trades de um DataStore (ver docstring do módulo)."""
+
+    def __init__(self, ds, path: Optional[str] = None):
+        self._ds = weakref.ref(ds)
+        self.path = path
+        self._lock = threading.RLock()
+        self._rows: List[Optional[Trade]] = []
+        self._ids: List[str] = []            # id de cada linha ("" = apagada)
+        self._row_of: Dict[str, int] = {}
+        self._cats: Dict[str, tuple] = {}     # nome -> (códigos, valores, índice valor->código)
+        self._nums: Dict[str, object] = {}
+        self._dates: Dict[str, object] = {}
+        self._secs: Dict[str, object] = {}     # as mesmas datas em segundos (int64), para agrupar sem texto
+        self._alive = None
+        self._built = False
+        self._dirty = False              # alterações ainda não gravadas
+        self._pending = False            # linhas do arquivo frio mapeadas do disco, Trade ainda por ler
+        self._disk_ok = True             # False depois de invalidate(): não remapear columns/
+        ds.events.subscribe(self._on_event, *TRADE_EVENTS, CollectionChanged, WalletChanged,
+                            on_error=self.invalidate)
+        if path:
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    # ---------- manutenção ----------
+    def _grow(self, need: int):
+        import numpy as np
+        cap = len(self._alive)
+        if need <= cap:
+            return
+        cap = max(need, cap * 2, 1024)
+
+        def grown(a, fill):
+            out = np.full(cap, fill, dtype=a.dtype)
+            out[:len(a)] = a
+            return out
+        for name, (codes, values, index) in self._cats.items():
+            self._cats[name] = (grown(codes, 0), values, index)
+        self._nums = {k: grown(a, np.nan) for k, a in self._nums.items()}
+        self._dates = {k: grown(a, "") for k, a in self._dates.items()}
+        self._secs = {k: grown(a, BAD_SECONDS) for k, a in self._secs.items()}
+        self._alive = grown(self._alive, False)
+
+    def _code(self, name: str, value) -> int:
+        codes, values, index = self._cats[name]
+        c = index.get(value)
+        if c is None:
+            c = index[value] = len(values)
+            values.append(value)
+        return c
+
+    def _write(self, row: int, t: Trade):
+        for name in CATEGORICAL:
+            self._cats[name][0][row] = self._code(name, category_value(t, name))
+        for name in NUMERIC:
+            self._nums[name][row] = number_value(t, name)
+        for name in DATES:
+            self._dates[name][row] = d = date_value(t, name)
+            self._secs[name][row] = seconds_value(d)
+        self._alive[row] = True
+
+    def _put(self, t: Trade):
+        row = self._row_of.get(t.id)
+        if row is None:
+            row = self._row_of[t.id] = len(self._rows)
+            self._rows.append(t)
+            self._ids.append(t.id)
+            self._grow(row + 1)
+        else:
+            self._rows[row] = t
+        self._write(row, t)
+
+    def _on_event(self, e):
+        with self._lock:
+            if not self._built:
+                return
+            if isinstance(e, CollectionChanged):
+                if e.names & {"trades", "archive"}:
+                    self._built = False
+                return
+            if isinstance(e, WalletChanged):
+                if e.wallet is None:
+                    self._built = False
+                return
+            if isinstance(e, TradeDeleted):
+                row = self._row_of.pop(e.trade.id, None)
+                if row is not None:
+                    self._rows[row] = None
+                    self._ids[row] = ""
+                    self._alive[row] = False
+            else:
+                self._put(getattr(e, "new", None) or e.trade)
+            self._dirty = True
+
+    def _versions(self, ds) -> Dict[str, List[int]]:
+        # assinatura inteira, não só a versão do lock: apanha ficheiros reescritos
+        # sem o FileLock (gerador, backup reposto, edição à mão).
+        # Carteiras também: apagar uma esconde os seus trades arquivados
+        return {"trades": list(ds.known_signature(ds.trades_file)),
+                "archive": list(ds.known_signature(ds.archive_file)),
+                "wallets": list(ds.known_signature(ds.wallets_file))}
+
+    @perf.timed("columnar.build")
+    def rebuild(self):
+        import numpy as np
+        ds = self._ds()
+        if ds is None:
+            return
+        with self._lock:
+            rows = ds.history_trades()
+            cats = {}
+            for name in CATEGORICAL:
+                index: Dict[object, int] = {}
+                codes = np.fromiter((index.setdefault(category_value(t, name), len(index)) for t in rows),
+                                    dtype=np.int32, count=len(rows))
+                cats[name] = (codes, list(index), index)
+            self._cats = cats
+            self._nums = {name: np.fromiter((number_value(t, name) for t in rows), dtype=np.float64, count=len(rows))
+                          for name in NUMERIC}
+            self._dates = {name: np.array([date_value(t, name) for t in rows], dtype=f"<U{DATE_LEN}")
+                           for name in DATES}
+            self._secs = {name: iso_seconds(self._dates[name]) for name in DATES}
+            self._alive = np.ones(len(rows), dtype=bool)
+            self._rows = rows
+            self._ids = [t.id for t in rows]
+            self._row_of = {t.id: i for i, t in enumerate(rows)}
+            self._pending = False
+            self._built = True
+            self._dirty = True
+            self._disk_ok = True
+        self.flush()
+
+    @perf.timed("columnar.load")
+    def _load(self, ds) -> bool:
+        if not self.path:
+            return False
+        import numpy as np
+        from storage import load_json
+        meta = load_json(os.path.join(self.path, META_FILE), None)
+        if not isinstance(meta, dict) or meta.get("versions") != self._versions(ds):
+            return False
+        try:
+            folder = os.path.join(self.path, str(meta["dir"]))
+
+            def col(name):
+                return np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="c")
+            ids, alive = col("id").tolist(), np.array(col("alive"), dtype=bool)
+            cats = {}
+            for name in CATEGORICAL:
+                values = meta["values"][name]
+                if name == "tags":
+                    values = [tuple(v) for v in values]
+                cats[name] = (col(name), values, {v: i for i, v in enumerate(values)})
+            nums = {name: col(name) for name in NUMERIC}
+            dates = {name: col(name) for name in DATES}
+            secs = {name: col(name + "_s") for name in DATES}
+        except Exception:
+            return False
+        # linhas dos trades em memória apontam já para os Trade (têm de estar todos);
+        # as do arquivo frio só se leem quando trades() precisar delas (_resolve)
+        hot = ds.trades
+        rows = [hot.get(tid) if tid else None for tid in ids]
+        if len(alive) != len(rows) or len(hot) != sum(t is not None for t in rows):
+            return False
+        self._cats, self._nums, self._dates, self._secs, self._alive = cats, nums, dates, secs, alive
+        self._rows, self._ids = rows, ids
+        self._row_of = {tid: i for i, tid in enumerate(ids) if tid}
+        self._pending = len(hot) != int(alive.sum())
+        return True
+
+    def _resolve(self):
+        """Lê do arquivo frio os Trade das linhas mapeadas do disco (chamar com o lock)."""
+        if not self._pending:
+            return
+        ds = self._ds()
+        by_id = {t.id: t for t in ds.history_trades()} if ds is not None else {}
+        rows = self._rows
+        for i in self._alive[:len(rows)].nonzero()[0].tolist():
+            if rows[i] is None:
+                rows[i] = by_id.get(self._ids[i])
+                if rows[i] is None:  # a cache não bate com o arquivo
+                    self.rebuild()
+                    return
+        self._pending = False
+
+    def invalidate(self):
+        """
+        Descarta as colunas (ex.: um evento falhou a meio): reconstrói na próxima
+        consulta, sem remapear columns/, que pode ter as assinaturas atuais.
+        """
+        with self._lock:
+            self._built, self._dirty, self._disk_ok = False, False, False
+
+    def ensure(self):
+        """Constrói (ou mapeia do disco) se ainda não estiver pronta."""
+        with self._lock:
+            hit = self._built
+            if not hit:
+                ds = self._ds()
+                loaded = ds is not None and self._disk_ok and self._load(ds)
+                if self.path:
+                    metrics.cache_result("columnar_cache", loaded)
+                if loaded:
+                    self._built, self._dirty = True, False
+                else:
+                    self.rebuild()
+        metrics.cache_result("columnar_view", hit)
+
+    def flush(self):
+        """Grava as colunas (se mudaram desde a última gravação)."""
+        import numpy as np
+        ds = self._ds()
+        if not self.path or ds is None:
+            return
+        with self._lock:
+            if not (self._built and self._dirty):
+                return
+            n = len(self._rows)
+            arrays = {"id": np.array(self._ids, dtype=str),
+                      "alive": np.array(self._alive[:n])}
+            for name, (codes, values, _) in self._cats.items():
+                arrays[name] = np.array(codes[:n])
+            for name, a in list(self._nums.items()) + list(self._dates.items()):
+                arrays[name] = np.array(a[:n])
+            for name, a in self._secs.items():
+                arrays[name + "_s"] = np.array(a[:n])
+            meta = {"versions": self._versions(ds), "dir": uuid.uuid4().hex,
+                    "values": {name: list(values) for name, (_, values, _) in self._cats.items()}}
+            self._dirty = False
+        from storage import save_json
+        try:
+            folder = os.path.join(self.path, meta["dir"])
+            os.makedirs(folder, exist_ok=True)
+            for name, a in arrays.items():
+                np.save(os.path.join(folder, f"{name}.npy"), a)
+            save_json(os.path.join(self.path, META_FILE), meta, indent=None)
+            for entry in os.listdir(self.path):
+                if entry != meta["dir"] and os.path.isdir(os.path.join(self.path, entry)):
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+        except Exception:
+            pass
+
+    # ---------- leitura (para query.Query.mask; chamar com o lock) ----------
+    def category(self, name: str):
+        """(códigos das linhas, lista de valores distintos) de uma coluna de categoria."""
+        codes, values, _ = self._cats[name]
+        return codes[:len(self._rows)], values
+
+    def number(self, name: str):
+        return self._nums[name][:len(self._rows)]
+
+    def date(self, name: str):
+        return self._dates[name][:len(self._rows)]
+
+    def _column(self, name: str):
+        if name in DATES:
+            return self.date(name)
+        if name.endswith("_s") and name[:-2] in DATES:
+            return self.seconds(name[:-2])
+        return self.number(name)
+
+    def seconds(self, name: str):
+        """Coluna de datas em segundos desde 1970 (BAD_SECONDS = vazia/inválida)."""
+        return self._secs[name][:len(self._rows)]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # ---------- consulta ----------
+    def mask(self, q):
+        """Máscara booleana (numpy) das linhas vivas que passam na consulta compilada."""
+        self.ensure()
+        with self._lock:
+            return q.mask(self) & self._alive[:len(self._rows)]
+
+    @perf.timed("columnar.select")
+    def trades(self, q) -> List[Trade]:
+        """Trades que passam na consulta (ordem das linhas)."""
+        import numpy as np
+        self.ensure()
+        with self._lock:
+            self._resolve()
+            rows = self._rows
+            return [rows[i] for i in np.flatnonzero(self.mask(q))]
+
+    def ids(self, q) -> set:
+        """Ids dos trades que passam na consulta (sem ler o arquivo frio)."""
+        import numpy as np
+        self.ensure()
+        with self._lock:
+            ids = self._ids
+            return {ids[i] for i in np.flatnonzero(self.mask(q))}
+
+    # ---------- análise ----------
+    def _rows_of(self, ids: Iterable[str]):
+        """Linhas dos ids dados (ids que a vista não conhece, ex.: já apagados, ficam de fora)."""
+        import numpy as np
+        row_of = self._row_of
+        return np.fromiter((row_of[tid] for tid in ids if tid in row_of), dtype=np.intp)
+
+    def _lut(self, name: str, fn, dtype=object):
+        """fn aplicada a cada valor distinto da categoria, indexável pelos códigos."""
+        import numpy as np
+        codes, values = self.category(name)
+        return np.array([fn(v) for v in values], dtype=dtype), codes
+
+    @perf.timed("columnar.frame")
+    def frame(self, trades: Iterable[Trade], wallets: Mapping):
+        """
+        DataFrame com reports.EXPORT_COLUMNS para os trades dados (nessa ordem),
+        montado por indexação das colunas (como reports.trade_rows, sem um
+        dict por trade). Números em falta ficam NaN.
+        """
+        import numpy as np
+        import pandas as pd
+        from reports import EXPORT_COLUMNS
+        self.ensure()
+        names = {wid: w.name for wid, w in wallets.items()}
+        with self._lock:
+            ids = [t.id for t in trades if t.id in self._row_of]
+            idx = self._rows_of(ids)
+            created = self.date("created_at")[idx]
+
+            def cat(name, fn=lambda v: v):
+                lut, codes = self._lut(name, fn)
+                return lut[codes[idx]]
+
+            def num(name):
+                return self.number(name)[idx]
+            data = {
+                "ID": ids,
+                "Data": np.char.replace(created, "T", " ") if len(created) else created,
+                "Carteira": cat("wallet_id", lambda v: names.get(v, "")),
+                "Paridade": cat("symbol"), "Direção": cat("direction"),
+                "Entrada": num("entry_price"), "SL": num("stop_loss"), "TP": num("take_profit"),
+                "Quantidade": num("position_size"), "ValorPos": num("position_value"),
+                "RiscoUSD": num("risk_amount"), "RiscoPct": num("risk_pct_of_balance"),
+                "Estado": cat("status"), "Saída": num("exit_price"), "PnL": num("pnl_abs"),
+                "PnLPct": num("pnl_pct"), "Resultado": cat("result", lambda v: v or None),
+                "FechadoComo": cat("close_reason", lambda v: v or None), "Razão": cat("reason"),
+                "Tags": cat("tags", ", ".join),
+            }
+        return pd.DataFrame(data, columns=EXPORT_COLUMNS)
+
+    @perf.timed("columnar.closed_pnls")
+    def closed_pnls(self, wallet_id: Optional[str] = None):
+        """
+        (datas, pnls) dos trades fechados com PnL, pela ordem de fecho (data de
+        fecho, ou de criação) como models.equity_curve: o saldo é
+        inicial + np.cumsum(pnls).
+        """
+        keys, cols = self.closed_series(wallet_id)
+        return keys, cols["pnl_abs"]
+
+    def closed_series(self, wallet_id: Optional[str] = None, names: Iterable[str] = ("pnl_abs",)):
+        """
+        (datas, {coluna: valores}) dos mesmos trades e na mesma ordem de
+        closed_pnls; colunas numéricas, de datas (created_at/closed_at) ou das
+        datas em segundos (created_at_s/closed_at_s).
+        """
+        import numpy as np
+        self.ensure()
+        with self._lock:
+            n = len(self._rows)
+            lut, codes = self._lut("status", lambda v: v == "Closed", bool)
+            pnl = self.number("pnl_abs")
+            keep = self._alive[:n] & lut[codes] & ~np.isnan(pnl)
+            if wallet_id is not None:
+                lut, codes = self._lut("wallet_id", lambda v: v == wallet_id, bool)
+                keep &= lut[codes]
+            rows = np.flatnonzero(keep)
+            closed, created = self.date("closed_at")[rows], self.date("created_at")[rows]
+            cols = {name: self._column(name)[rows] for name in names}
+        keys = np.where(closed != "", closed, created)
+        order = np.argsort(keys, kind="stable")
+        return keys[order], {name: v[order] for name, v in cols.items()}
+
+    @property
+    def ready(self) -> bool:
+        return self._built
+
+
+def _flush_at_exit(ref):
+    view = ref()
+    if view is not None:
+        view.flush()
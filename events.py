@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Eventos de alteração do DataStore (sem dependências de UI).
+
+    unsubscribe = ds.events.subscribe(callback, TradeAdded, TradeDeleted)
+
+- O DataStore emite um evento por mutação, já com o snapshot novo publicado e
+  o ficheiro gravado; os callbacks correm na thread de quem alterou os dados.
+- Alterações em bloco (carregar/recarregar do disco, importação, merge com
+  escritas de outro processo, apagar carteira com os seus trades) chegam como
+  CollectionChanged com os nomes das coleções: quem as recebe recalcula tudo.
+- Métodos ligados ficam com referência fraca (como no watcher).
+- Um callback que falha não trava os outros: a exceção vai para o log
+  (logger "tradeiros.events", com traceback) e chama-se o on_error da
+  subscrição, com que os índices se marcam para reconstruir.
+"""
+import inspect
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, Optional
+
+from models import Trade, Wallet
+
+log = logging.getLogger("tradeiros.events")
+
+
+class StoreEvent:
+    """Base dos eventos do DataStore."""
+
+    @property
+    def wallet_id(self) -> Optional[str]:
+        """Carteira afetada (None = várias/desconhecida)."""
+        return None
+
+
+@dataclass(frozen=True)
+class TradeAdded(StoreEvent):
+    trade: Trade
+
+    @property
+    def wallet_id(self):
+        return self.trade.wallet_id
+
+
+@dataclass(frozen=True)
+class TradeEdited(StoreEvent):
+    old: Trade
+    new: Trade
+
+    @property
+    def wallet_id(self):
+        return self.new.wallet_id
+
+
+@dataclass(frozen=True)
+class TradeClosed(StoreEvent):
+    old: Trade
+    new: Trade
+
+    @property
+    def wallet_id(self):
+        return self.new.wallet_id
+
+
+@dataclass(frozen=True)
+class TradeDeleted(StoreEvent):
+    trade: Trade
+
+    @property
+    def wallet_id(self):
+        return self.trade.wallet_id
+
+
+@dataclass(frozen=True)
+class WalletChanged(StoreEvent):
+    """Carteira criada/editada (wallet) ou apagada (wallet=None)."""
+    id: str
+    wallet: Optional[Wallet] = None
+
+    @property
+    def wallet_id(self):
+        return self.id
+
+
+@dataclass(frozen=True)
+class CollectionChanged(StoreEvent):
+    """Mudança em bloco de uma ou mais coleções ("wallets", "trades", "symbols", "settings")."""
+    names: FrozenSet[str]
+
+
+TRADE_EVENTS = (TradeAdded, TradeEdited, TradeClosed, TradeDeleted)
+
+
+def trade_event(old: Optional[Trade], new: Trade) -> StoreEvent:
+    """Classifica a gravação de um trade: novo, fechado ou editado."""
+    if old is None:
+        return TradeAdded(new)
+    if new.status == "Closed" and old.status != "Closed":
+        return TradeClosed(old, new)
+    return TradeEdited(old, new)
+
+
+def _ref(callback):
+    return weakref.WeakMethod(callback) if inspect.ismethod(callback) else (lambda: callback)
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = []  # (ref, tipos, ref de on_error ou None)
+
+    def subscribe(self, callback: Callable[[StoreEvent], None], *types,
+                  on_error: Optional[Callable[[], None]] = None) -> Callable[[], None]:
+        """
+        Regista callback(evento) para os tipos indicados (nenhum = todos).
+        on_error(): chamado se o callback levantar (ex.: marcar um índice para
+        reconstruir). Devolve uma função para cancelar a subscrição.
+        """
+        entry = (_ref(callback), tuple(types) or (StoreEvent,), _ref(on_error) if on_error else None)
+        with self._lock:
+            self._subs.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subs:
+                    self._subs.remove(entry)
+        return unsubscribe
+
+    def emit(self, event: StoreEvent):
+        with self._lock:
+            subs = list(self._subs)
+        for entry in subs:
+            ref, types, on_error = entry
+            if not isinstance(event, types):
+                continue
+            cb = ref()
+            if cb is None:
+                with self._lock:
+                    if entry in self._subs:
+                        self._subs.remove(entry)
+                continue
+            try:
+                cb(event)
+            except Exception:
+                log.exception("subscritor de %s falhou: %r", type(event).__name__, cb)
+                recover = on_error() if on_error is not None else None
+                if recover is not None:
+                    try:
+                        recover()
+                    except Exception:
+                        log.exception("on_error de %r falhou", cb)
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de facetas dos trades: um bitmap por valor de cada faceta, para
+cruzar filtros (carteira, paridade, direção, resultado, estado, tags, mês)
+sem percorrer todos os trades.
+
+    mask = ds.facets.mask(wallet_id=w.id, tags=["setup:breakout"], result="Loss")
+    rows = ds.facets.trades(mask)                        # trades candidatos
+    ds.facets.counts(mask, "tag")                        # {tag: nº} dentro da seleção
+    reports.filter_trades(None, tags=["tf:h4"], facets=ds.facets)
+
+- Cada trade (do DataStore e do arquivo frio) tem uma linha fixa; o bitmap de
+  um valor é um int Python com o bit dessa linha ligado. Uma consulta é
+  AND entre facetas e OR dentro da mesma faceta (várias paridades que
+  contêm o texto, vários meses do intervalo de datas); as tags pedidas têm
+  de estar todas (AND).
+- As datas só chegam ao mês: mask() dá candidatos e reports.filter_trades
+  confirma o dia exato (e a razão) só nessas linhas.
+- Construído na primeira consulta; depois mantido pelos eventos do DataStore
+  (TradeAdded/Edited/Closed/Deleted). Trades apagados deixam a linha vazia
+  (o bit "vivo" é desligado). Alterações em bloco (CollectionChanged de
+  trades/arquivo, apagar carteira) marcam-no para reconstruir.
+- Tags comparadas sem distinguir maiúsculas (casefold); paridades em maiúsculas.
+"""
+import threading
+import weakref
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from events import TRADE_EVENTS, CollectionChanged, TradeDeleted, WalletChanged
+from models import Trade, normalize_tags
+import metrics
+import perf
+
+FACETS = ("wallet", "symbol", "direction", "result", "status", "tag", "month")
+
+
+def facet_values(t: Trade) -> Iterator[Tuple[str, str]]:
+    """Pares (faceta, valor) de um trade, como ficam no índice."""
+    yield "wallet", t.wallet_id
+    yield "symbol", (t.symbol or "").upper()
+    yield "direction", t.direction or ""
+    yield "result", t.result or ""
+    yield "status", t.status or "Open"
+    created = t.created_at or ""
+    yield "month", created[:7] if len(created) >= 10 and created[4] == "-" and created[7] == "-" else ""
+    for tag in t.tags or ():
+        yield "tag", tag.casefold()
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Posições dos bits ligados, por ordem crescente."""
+    s = bin(mask)[:1:-1]  # sem o "0b", do bit 0 para cima
+    i = s.find("1")
+    while i >= 0:
+        yield i
+        i = s.find("1", i + 1)
+
+
+class FacetIndex:
+    """Bitmaps (faceta, valor) -> linhas, ligado a um DataStore."""
+
+    def __init__(self, ds):
+        self._ds = weakref.ref(ds)
+        self._lock = threading.RLock()
+        self._rows: List[Optional[Trade]] = []
+        self._row_of: Dict[str, int] = {}
+        self._bits: Dict[str, Dict[str, int]] = {f: {} for f in FACETS}
+        self._alive = 0
+        self._built = False
+        ds.events.subscribe(self._on_event, *TRADE_EVENTS, CollectionChanged, WalletChanged,
+                            on_error=self.invalidate)
+
+    # ---------- manutenção ----------
+    def _set(self, row: int, t: Trade):
+        bit = 1 << row
+        for facet, value in facet_values(t):
+            values = self._bits[facet]
+            values[value] = values.get(value, 0) | bit
+        self._alive |= bit
+
+    def _clear(self, row: int, t: Trade):
+        bit = 1 << row
+        for facet, value in facet_values(t):
+            values = self._bits[facet]
+            mask = values.get(value, 0) & ~bit
+            if mask:
+                values[value] = mask
+            else:
+                values.pop(value, None)
+        self._alive &= ~bit
+
+    def _put(self, t: Trade):
+        row = self._row_of.get(t.id)
+        if row is None:
+            row = self._row_of[t.id] = len(self._rows)
+            self._rows.append(t)
+        else:
+            old = self._rows[row]
+            if old is not None:
+                self._clear(row, old)
+            self._rows[row] = t
+        self._set(row, t)
+
+    def _on_event(self, e):
+        with self._lock:
+            if not self._built:
+                return
+            if isinstance(e, CollectionChanged):
+                if e.names & {"trades", "archive"}:
+                    self._built = False  # reconstrói na próxima consulta
+                return
+            if isinstance(e, WalletChanged):
+                if e.wallet is None:
+                    self._built = False  # os trades da carteira saem sem eventos próprios
+                return
+            if isinstance(e, TradeDeleted):
+                row = self._row_of.pop(e.trade.id, None)
+                if row is not None and self._rows[row] is not None:
+                    self._clear(row, self._rows[row])
+                    self._rows[row] = None
+            else:
+                self._put(getattr(e, "new", None) or e.trade)
+
+    @perf.timed("facets.build")
+    def rebuild(self):
+        ds = self._ds()
+        if ds is None:
+            return
+        with self._lock:
+            rows = ds.history_trades()
+            # posições por valor e um int por bitmap no fim (OR bit a bit copiaria o int a cada trade)
+            positions: Dict[str, Dict[str, List[int]]] = {f: {} for f in FACETS}
+            for i, t in enumerate(rows):
+                for facet, value in facet_values(t):
+                    positions[facet].setdefault(value, []).append(i)
+            self._rows = rows
+            self._row_of = {t.id: i for i, t in enumerate(rows)}
+            self._bits = {f: {v: _from_positions(p) for v, p in values.items()} for f, values in positions.items()}
+            self._alive = (1 << len(rows)) - 1
+            self._built = True
+
+    def invalidate(self):
+        """Reconstrói na próxima consulta (ex.: um evento falhou a meio)."""
+        with self._lock:
+            self._built = False
+
+    def ensure(self):
+        with self._lock:
+            hit = self._built
+            if not hit:
+                self.rebuild()
+        metrics.cache_result("facet_index", hit)
+
+    # ---------- consulta ----------
+    def mask(self, wallet_id: Optional[str] = None, symbol: Optional[str] = None,
+             status: Optional[str] = None, direction: Optional[str] = None,
+             result: Optional[str] = None, tags: Iterable[str] = (),
+             date_from: Optional[str] = None, date_to: Optional[str] = None) -> int:
+        """Bitmap das linhas que podem passar nos filtros (datas só ao mês; ver filter_trades)."""
+        self.ensure()
+        with self._lock:
+            bits = self._bits
+            picks = []
+            for facet, value in (("wallet", wallet_id), ("status", status),
+                                 ("direction", direction), ("result", result)):
+                if value not in (None, "", "Todos"):
+                    picks.append(bits[facet].get(value, 0))
+            for tag in normalize_tags(tags):
+                picks.append(bits["tag"].get(tag.casefold(), 0))
+            symbol = (symbol or "").strip().upper()
+            if symbol:
+                picks.append(_union(m for v, m in bits["symbol"].items() if symbol in v))
+            if date_from or date_to:
+                lo, hi = (date_from or "")[:7], (date_to or "")[:7]
+                # sem data válida (mês "") não é excluído, como em filter_trades
+                picks.append(_union(m for v, m in bits["month"].items()
+                                    if not v or ((not lo or v >= lo) and (not hi or v <= hi))))
+            # mais seletivos primeiro: o AND encolhe depressa
+            out = self._alive
+            for m in sorted(picks, key=int.bit_count):
+                out &= m
+                if not out:
+                    break
+            return out
+
+    def trades(self, mask: int) -> List[Trade]:
+        """Trades das linhas ligadas em mask (ordem das linhas)."""
+        with self._lock:
+            rows = self._rows
+            return [rows[i] for i in iter_bits(mask & self._alive)]
+
+    @perf.timed("facets.select")
+    def select(self, **filters) -> List[Trade]:
+        """trades(mask(**filters))."""
+        with self._lock:
+            return self.trades(self.mask(**filters))
+
+    def counts(self, mask: int, facet: str) -> Dict[str, int]:
+        """Nº de linhas de mask por valor da faceta (só valores com alguma), do maior para o menor."""
+        self.ensure()
+        with self._lock:
+            out = {v: (m & mask).bit_count() for v, m in self._bits[facet].items()}
+        return dict(sorted(((v, n) for v, n in out.items() if n), key=lambda kv: (-kv[1], kv[0])))
+
+    def groups(self, mask: int, facet: str) -> Dict[str, int]:
+        """mask partida por valor da faceta: {valor: sub-mask} (um trade com várias tags entra em várias)."""
+        self.ensure()
+        with self._lock:
+            return {v: m & mask for v, m in sorted(self._bits[facet].items()) if m & mask}
+
+    def values(self, facet: str) -> List[str]:
+        """Valores conhecidos de uma faceta (ex.: todas as tags em uso), ordenados."""
+        self.ensure()
+        with self._lock:
+            return sorted(self._bits[facet])
+
+    @property
+    def ready(self) -> bool:
+        """True se já está construído (consultar não vai percorrer os trades)."""
+        return self._built
+
+    def __len__(self) -> int:
+        return self._alive.bit_count()
+
+
+def _from_positions(positions: List[int]) -> int:
+    buf = bytearray(positions[-1] // 8 + 1)
+    for i in positions:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _union(masks: Iterable[int]) -> int:
+    out = 0
+    for m in masks:
+        out |= m
+    return out
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Quando se ganha mais: mapas de calor dos trades fechados de uma carteira.
+
+- Dia da semana × hora de abertura (created_at): PnL realizado e taxa de
+  acerto por célula (7 × 24).
+- Calendário: PnL por dia de fecho (closed_at), semanas em colunas.
+
+    h = heatmaps.wallet_heatmaps(ds, wallet_id)
+    h["hours"]["pnl"][0, 9]            # segundas-feiras, 9h-10h
+    plot_weekday_hour(ax, h["hours"], "pnl"); plot_calendar(ax, h["days"])
+
+- As datas vêm das colunas em segundos (ds.columns, created_at_s/closed_at_s)
+  e agrupam-se com np.bincount: dia = segundos // 86400, dia da semana =
+  (dia + 3) % 7 (1970-01-01 foi quinta), hora = resto // 3600. Nenhum trade
+  tem a data lida de texto (datas ISO soltas passam por columnar.iso_seconds,
+  também de uma vez).
+- Horas tal como gravadas (hora local de quem registou, sem fuso).
+- Datas inválidas ficam de fora; células sem trades ficam NaN.
+- wallet_heatmaps guarda o resultado em ds.artifacts por carteira e versão
+  dos dados; plot_* desenham num Axes do matplotlib (Qt e Streamlit).
+"""
+from typing import Dict, Optional
+
+import perf
+
+WEEKDAYS = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
+DAY = 86400
+PNL_CMAP = "RdYlGn"
+
+
+def _as_seconds(dates):
+    import numpy as np
+    from columnar import iso_seconds
+    dates = np.asarray(dates)
+    return dates.astype(np.int64) if dates.dtype.kind in "iu" else iso_seconds(dates)
+
+
+def _split(seconds):
+    """(dia desde 1970, dia da semana 0=segunda, hora) de segundos int64 válidos."""
+    days = seconds // DAY
+    return days, (days + 3) % 7, (seconds - days * DAY) // 3600
+
+
+@perf.timed("heatmaps.weekday_hour")
+def weekday_hour(created, pnls) -> Dict[str, object]:
+    """
+    {"pnl", "trades", "wins", "winrate_pct"}: matrizes 7 × 24 (dia da semana ×
+    hora de created_at, em segundos ou ISO) dos trades fechados dados.
+    """
+    import numpy as np
+    from columnar import BAD_SECONDS
+    secs = _as_seconds(created)
+    pnls = np.asarray(pnls, dtype=np.float64)
+    ok = (secs != BAD_SECONDS) & ~np.isnan(pnls)
+    _, wd, hour = _split(secs[ok])
+    cell = wd * 24 + hour
+    p = pnls[ok]
+    trades = np.bincount(cell, minlength=168).reshape(7, 24)
+    wins = np.bincount(cell, weights=(p > 0).astype(np.float64), minlength=168).reshape(7, 24)
+    pnl = np.bincount(cell, weights=p, minlength=168).reshape(7, 24)
+    empty = trades == 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "pnl": np.where(empty, np.nan, pnl),
+            "trades": trades,
+            "wins": wins.astype(np.int64),
+            "winrate_pct": np.where(empty, np.nan, wins * 100.0 / trades),
+        }
+
+
+@perf.timed("heatmaps.daily")
+def daily_pnl(closed, pnls) -> Dict[str, object]:
+    """
+    {"start", "pnl", "trades"}: PnL e nº de trades por dia de fecho (em
+    segundos ou ISO), de `start` (datetime64[D]) ao último dia com trades;
+    dias sem trades a 0.
+    """
+    import numpy as np
+    from columnar import BAD_SECONDS
+    secs = _as_seconds(closed)
+    pnls = np.asarray(pnls, dtype=np.float64)
+    ok = (secs != BAD_SECONDS) & ~np.isnan(pnls)
+    days = secs[ok] // DAY
+    if not len(days):
+        return {"start": None, "pnl": np.zeros(0), "trades": np.zeros(0, dtype=np.int64)}
+    first = int(days.min())
+    offset = days - first
+    return {
+        "start": np.datetime64(first, "D"),
+        "pnl": np.bincount(offset, weights=pnls[ok]),
+        "trades": np.bincount(offset),
+    }
+
+
+def calendar_grid(daily: Dict[str, object]):
+    """
+    (segundas-feiras de cada semana, matriz 7 × semanas do PnL diário) para o
+    calendário; dias sem trades e fora do intervalo ficam NaN.
+    """
+    import numpy as np
+    n = len(daily["pnl"])
+    if not n:
+        return np.zeros(0, dtype="datetime64[D]"), np.zeros((7, 0))
+    first = int(daily["start"].astype(np.int64))
+    lead = (first + 3) % 7  # dias da semana antes do primeiro dia
+    weeks = (lead + n + 6) // 7
+    grid = np.full(weeks * 7, np.nan)
+    values = np.where(daily["trades"] > 0, daily["pnl"], np.nan)
+    grid[lead:lead + n] = values
+    mondays = np.datetime64(first - lead, "D") + np.arange(weeks) * 7
+    return mondays, grid.reshape(weeks, 7).T
+
+
+def wallet_heatmaps(ds, wallet_id: Optional[str]) -> Dict[str, object]:
+    """{"hours": weekday_hour, "days": daily_pnl} dos fechados da carteira (inclui o arquivo frio), em cache."""
+    version = ds.data_version(wallet_id)  # antes de ler as colunas
+
+    def build():
+        _, cols = ds.columns.closed_series(wallet_id, ("pnl_abs", "created_at_s", "closed_at_s"))
+        return {"hours": weekday_hour(cols["created_at_s"], cols["pnl_abs"]),
+                "days": daily_pnl(cols["closed_at_s"], cols["pnl_abs"])}
+    return ds.artifacts.get("wallet_heatmaps", (wallet_id,), version, build)
+
+
+# ---------- desenho (matplotlib, sem pyplot) ----------
+def _symmetric(values) -> float:
+    import numpy as np
+    finite = values[np.isfinite(values)]
+    return float(np.abs(finite).max()) if len(finite) and np.abs(finite).max() > 0 else 1.0
+
+
+def plot_weekday_hour(ax, hours: Dict[str, object], what: str = "pnl"):
+    """Mapa dia da semana × hora: what="pnl" (escala simétrica em 0) ou "winrate_pct" (0-100)."""
+    values = hours[what]
+    if what == "pnl":
+        lim = _symmetric(values)
+        im = ax.imshow(values, aspect="auto", cmap=PNL_CMAP, vmin=-lim, vmax=lim)
+        ax.set_title("PnL por dia da semana × hora de abertura")
+    else:
+        im = ax.imshow(values, aspect="auto", cmap=PNL_CMAP, vmin=0, vmax=100)
+        ax.set_title("Acerto % por dia da semana × hora de abertura")
+    ax.set_yticks(range(7))
+    ax.set_yticklabels(WEEKDAYS)
+    ax.set_xticks(range(0, 24, 3))
+    ax.set_xlabel("Hora")
+    ax.figure.colorbar(im, ax=ax, fraction=0.046, pad=0.02)
+    return im
+
+
+def plot_calendar(ax, daily: Dict[str, object]):
+    """Calendário do PnL diário (semanas em colunas, segunda em cima)."""
+    import numpy as np
+    mondays, grid = calendar_grid(daily)
+    ax.set_title("PnL por dia de fecho")
+    ax.set_yticks(range(7))
+    ax.set_yticklabels(WEEKDAYS)
+    if not grid.shape[1]:
+        ax.set_xticks([])
+        return None
+    lim = _symmetric(grid)
+    im = ax.imshow(grid, aspect="auto", cmap=PNL_CMAP, vmin=-lim, vmax=lim, interpolation="nearest")
+    # um rótulo por mês (a semana onde o mês começa)
+    months = mondays.astype("datetime64[M]")
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    step = max(1, len(starts) // 12)
+    ax.set_xticks(starts[::step])
+    ax.set_xticklabels([str(m) for m in months[starts[::step]]], rotation=45, ha="right", fontsize=7)
+    ax.figure.colorbar(im, ax=ax, fraction=0.046, pad=0.02)
+    return im
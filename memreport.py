@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Relatório de memória: quanto ocupam os dados do DataStore e o estado das
+sessões Streamlit, e o que o tracemalloc atribui a cada linha de código.
+
+    python -m tradeiros memory [--tracemalloc] [--top 15]
+
+- deep_size(): soma de sys.getsizeof por objeto alcançável, cada objeto
+  contado uma vez (strings partilhadas entre trades só contam na primeira).
+- datastore_report(ds): trades / carteiras / paridades / settings do snapshot atual.
+- session_report(state): bytes por chave de st.session_state.
+- live_objects(): instâncias vivas de Trade/Wallet no processo (todas as
+  sessões e snapshots ainda referenciados), via gc.
+- traced_load(data_dir): carrega um DataStore sob tracemalloc; devolve-o com
+  a memória retida, o pico e as linhas que mais alocaram.
+"""
+import gc
+import sys
+import tracemalloc
+from typing import Dict, Iterable, Mapping, Optional
+
+from models import Trade, Wallet
+
+_ATOMIC = (str, bytes, int, float, bool, type(None), complex)
+
+
+def deep_size(obj, seen: Optional[set] = None) -> int:
+    """Bytes de obj e de tudo o que ele alcança (contentores, dataclasses, __dict__/__slots__)."""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        oid = id(o)
+        if oid in seen:
+            continue
+        seen.add(oid)
+        try:
+            total += sys.getsizeof(o)
+        except TypeError:
+            continue
+        if isinstance(o, _ATOMIC) or isinstance(o, type):
+            continue
+        if isinstance(o, Mapping):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        d = getattr(o, "__dict__", None)
+        if isinstance(d, dict):
+            stack.append(d)
+        for slot in getattr(type(o), "__slots__", ()):
+            if hasattr(o, slot):
+                stack.append(getattr(o, slot))
+    return total
+
+
+def _entry(objs: Iterable, seen: set) -> dict:
+    objs = list(objs)
+    size = sum(deep_size(o, seen) for o in objs)
+    return {"count": len(objs), "bytes": size, "bytes_per_item": round(size / len(objs), 1) if objs else 0.0}
+
+
+def datastore_report(ds) -> dict:
+    """Bytes do snapshot atual por coleção (o que é partilhado entre coleções conta na primeira)."""
+    snap = ds.snapshot()
+    seen = set()
+    out = {
+        "trades": _entry(snap.trades.values(), seen),
+        "wallets": _entry(snap.wallets.values(), seen),
+        "symbols": _entry(snap.symbols, seen),
+        "settings": _entry([ds.settings], seen),
+    }
+    out["total_bytes"] = sum(v["bytes"] for v in out.values())
+    out["version"] = snap.version
+    return out
+
+
+def session_report(state: Mapping, exclude: Iterable[str] = ()) -> dict:
+    """
+    Bytes por chave de um st.session_state (ou dict). O DataStore ("ds") é
+    medido à parte por datastore_report e fica de fora por omissão do total.
+    """
+    exclude = set(exclude)
+    keys = {}
+    for k in list(state):
+        if k in exclude:
+            continue
+        try:
+            keys[str(k)] = deep_size(state[k])
+        except Exception:
+            pass
+    items = sorted(keys.items(), key=lambda kv: kv[1], reverse=True)
+    return {"keys": dict(items), "total_bytes": sum(keys.values())}
+
+
+def streamlit_sessions() -> Dict[str, Mapping]:
+    """{session_id: session_state} de todas as sessões ativas (API interna do Streamlit; {} se falhar)."""
+    try:
+        from streamlit.runtime import get_instance
+        mgr = get_instance()._session_mgr
+        out = {}
+        for info in mgr.list_active_sessions():
+            session = info.session
+            out[session.id] = session.session_state
+        return out
+    except Exception:
+        return {}
+
+
+def live_objects(types=(Trade, Wallet)) -> Dict[str, int]:
+    """Instâncias vivas por tipo no processo inteiro (inclui snapshots antigos ainda referenciados)."""
+    counts = {t.__name__: 0 for t in types}
+    for o in gc.get_objects():
+        if isinstance(o, types):
+            counts[type(o).__name__] += 1
+    return counts
+
+
+def _top_stats(snapshot, limit: int, key: str = "lineno") -> list:
+    out = []
+    for st in snapshot.statistics(key)[:limit]:
+        frame = st.traceback[0]
+        out.append({"where": f"{frame.filename}:{frame.lineno}", "bytes": st.size, "blocks": st.count})
+    return out
+
+
+def tracemalloc_report(limit: int = 15) -> dict:
+    """Estado atual do tracemalloc (só se já estiver a traçar: PYTHONTRACEMALLOC=1 ou tracemalloc.start())."""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    current, peak = tracemalloc.get_traced_memory()
+    return {"tracing": True, "current_bytes": current, "peak_bytes": peak,
+            "top": _top_stats(tracemalloc.take_snapshot(), limit)}
+
+
+def traced_load(data_dir: Optional[str] = None, limit: int = 15):
+    """Carrega um DataStore novo sob tracemalloc. Devolve (ds, {retido, pico, onde foi alocado})."""
+    from storage import DataStore
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        ds = DataStore(data_dir)
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        diff = after.compare_to(before, "lineno")[:limit]
+        top = [{"where": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+                "bytes": d.size_diff, "blocks": d.count_diff} for d in diff]
+        n = len(ds.trades)
+        return ds, {
+            "trades": n,
+            "retained_bytes": current - base,
+            "peak_bytes": peak - base,
+            "bytes_per_trade": round((current - base) / n, 1) if n else 0.0,
+            "top": top,
+        }
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+def process_rss() -> Optional[int]:
+    """Memória residente do processo (bytes) ou None se não houver forma barata de a saber."""
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024  # pico; Linux em KiB
+    except Exception:
+        return None
+
+
+def full_report(ds, session_state: Optional[Mapping] = None, limit: int = 15) -> dict:
+    """Tudo o que se consegue medir sem recarregar dados (usado pelas abas Manutenção)."""
+    out = {
+        "datastore": datastore_report(ds),
+        "live_objects": live_objects(),
+        "max_rss_bytes": process_rss(),
+        "tracemalloc": tracemalloc_report(limit),
+    }
+    if session_state is not None:
+        out["session"] = session_report(session_state, exclude=("ds",))
+    sessions = streamlit_sessions()
+    if sessions:
+        out["sessions"] = {sid: session_report(st, exclude=("ds",))["total_bytes"] for sid, st in sessions.items()}
+    return out
+
+
+def format_bytes(n) -> str:
+    if n is None:
+        return "—"
+    n = float(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def format_report(r: dict) -> str:
+    """Texto para as abas Manutenção (Streamlit / Qt)."""
+    lines = []
+    d = r["datastore"]
+    lines.append(f"DataStore (versão {d['version']}): {format_bytes(d['total_bytes'])}")
+    for k in ("trades", "wallets", "symbols", "settings"):
+        e = d[k]
+        lines.append(f"  {k:<10s} {e['count']:>8d}  {format_bytes(e['bytes']):>10s}  ({e['bytes_per_item']:.0f} B/item)")
+    lo = r["live_objects"]
+    lines.append("Objetos vivos no processo: " + ", ".join(f"{k}={v}" for k, v in lo.items()))
+    if r.get("max_rss_bytes"):
+        lines.append(f"Pico de memória residente do processo: {format_bytes(r['max_rss_bytes'])}")
+    if "session" in r:
+        s = r["session"]
+        lines.append(f"Esta sessão (sem o DataStore): {format_bytes(s['total_bytes'])}")
+        for k, v in list(s["keys"].items())[:10]:
+            lines.append(f"  {k:<28s} {format_bytes(v):>10s}")
+    if "sessions" in r:
+        lines.append(f"Sessões ativas: {len(r['sessions'])}, total {format_bytes(sum(r['sessions'].values()))}")
+    tm = r["tracemalloc"]
+    if tm.get("tracing"):
+        lines.append(f"tracemalloc: atual {format_bytes(tm['current_bytes'])}, pico {format_bytes(tm['peak_bytes'])}")
+        for t in tm["top"][:10]:
+            lines.append(f"  {format_bytes(t['bytes']):>10s}  {t['where']}")
+    else:
+        lines.append("tracemalloc desligado (PYTHONTRACEMALLOC=1 para atribuir memória por linha).")
+    return "\n".join(lines)
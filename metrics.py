@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas operacionais em memória + endpoint de texto no formato Prometheus.
+
+    TRADEIROS_METRICS_PORT=9464 streamlit run streamlit_app.py
+    curl http://127.0.0.1:9464/metrics
+
+- Registo único por processo (REGISTRY); contadores, gauges e histogramas com
+  labels, thread-safe, só stdlib. Atualizar custa um lock + somas: fica
+  sempre ligado; só o servidor HTTP é opcional.
+- Gauges podem ter uma função (set_function) avaliada a cada scrape
+  (ex.: tamanho dos ficheiros de dados).
+- serve(port) arranca (uma vez por processo) um ThreadingHTTPServer numa
+  thread daemon: GET /metrics devolve REGISTRY.render().
+"""
+import os
+import math
+import time
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+PORT_ENV_VAR = "TRADEIROS_METRICS_PORT"
+HOST_ENV_VAR = "TRADEIROS_METRICS_HOST"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# latências típicas da app: de 0,5 ms (stats pequenas) a dezenas de segundos (Excel grande)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if isinstance(v, int):
+        return str(v)
+    if isinstance(v, float) and v.is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperadas {self.labelnames}, recebidas {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self):
+        """[(sufixo, labels str, valor)]"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, lbl, value in self._samples():
+            lines.append(f"{self.name}{suffix}{lbl} {_fmt(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", _labels(self.labelnames, k), v) for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._functions: Dict[Tuple[str, ...], Callable[[], Optional[float]]] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, fn: Callable[[], Optional[float]], **labels):
+        """Valor calculado a cada scrape; fn devolve None para omitir a série."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def _samples(self):
+        with self._lock:
+            items = dict(self._values)
+            fns = dict(self._functions)
+        for key, fn in fns.items():
+            try:
+                v = fn()
+            except Exception:
+                v = None
+            if v is not None:
+                items[key] = float(v)
+        return [("", _labels(self.labelnames, k), v) for k, v in sorted(items.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                st = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            st[0][i] += 1
+            st[1] += value
+            st[2] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """with HIST.time(file="x"): ... observa a duração em segundos."""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        st = self._values.get(self._key(labels))
+        return st[2] if st else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        out = []
+        for key, (counts, total, n) in items:
+            acc = 0
+            for bound, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                out.append(("_bucket", _labels(self.labelnames, key, f'le="{_fmt(bound)}"'), acc))
+            out.append(("_sum", _labels(self.labelnames, key), total))
+            out.append(("_count", _labels(self.labelnames, key), n))
+        return out
+
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: dict):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self._t0, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name, help, labelnames, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help, labelnames, **kw)
+            elif not isinstance(m, cls) or m.labelnames != tuple(labelnames):
+                raise ValueError(f"métrica {name} já registada com outro tipo/labels")
+            return m
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get(Counter, name, help, tuple(labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, tuple(labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, tuple(labelnames), buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[k] for k in sorted(self._metrics)]
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------- métricas da app ----------
+TRADE_MUTATIONS = REGISTRY.counter(
+    "tradeiros_trade_mutations_total", "Alterações a trades por tipo de evento do DataStore", ["event"])
+SAVE_JSON_SECONDS = REGISTRY.histogram(
+    "tradeiros_save_json_seconds", "Duração de save_json (escrita atómica) por ficheiro", ["file"])
+SAVE_JSON_BYTES = REGISTRY.histogram(
+    "tradeiros_save_json_bytes", "Bytes escritos por save_json por ficheiro", ["file"], buckets=BYTES_BUCKETS)
+WRITE_CONFLICTS = REGISTRY.counter(
+    "tradeiros_write_conflicts_total", "Escritas que precisaram de merge com outro processo", ["file"])
+LOAD_ALL_SECONDS = REGISTRY.histogram(
+    "tradeiros_load_all_seconds", "Duração de DataStore.load_all")
+CACHE_REQUESTS = REGISTRY.counter(
+    "tradeiros_cache_requests_total", "Pedidos a caches internas por resultado (hit/miss)", ["cache", "result"])
+DATA_FILE_BYTES = REGISTRY.gauge(
+    "tradeiros_data_file_bytes", "Tamanho dos ficheiros de dados", ["file"])
+
+
+def cache_result(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def watch_file_size(path: str):
+    """Exporta o tamanho de path (label = nome do ficheiro) a cada scrape."""
+    def size():
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
+    DATA_FILE_BYTES.set_function(size, file=os.path.basename(path))
+
+
+# ---------- servidor HTTP ----------
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY):
+    """Arranca o endpoint /metrics numa thread daemon (uma vez por processo). Devolve o servidor."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            srv = ThreadingHTTPServer((host, int(port)), Handler)
+            srv.daemon_threads = True
+            threading.Thread(target=srv.serve_forever, name="tradeiros-metrics", daemon=True).start()
+            _server = srv
+        return _server
+
+
+def serve_from_env():
+    """serve() se TRADEIROS_METRICS_PORT estiver definido; None caso contrário (ou porta ocupada)."""
+    port = os.getenv(PORT_ENV_VAR, "").strip()
+    if not port:
+        return None
+    try:
+        return serve(int(port), os.getenv(HOST_ENV_VAR, "127.0.0.1"))
+    except (OSError, ValueError):
+        return None
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, List, Dict
 from datetime import datetime
 import random
 
+import perf
+
 
 @dataclass
 class Wallet:
@@ -36,6 +38,7 @@ class Trade:
     pnl_pct: Optional[float]
     result: Optional[str]         # "Gain" | "Loss" | "Break-even"
     close_reason: Optional[str]   # "TP" | "SL" | "Manual"
+    tags: List[str] = field(default_factory=list)  # ex.: "setup:breakout", "tf:H4", "erro:FOMO"
 
 
 # ---------- Funções utilitárias ----------
@@ -77,6 +80,20 @@ def wallet_current_balance(trades: List[Trade], initial_balance: float) -> float
     return bal
 
 
+def normalize_tags(tags) -> List[str]:
+    """Lista de tags sem espaços a mais nem repetidas (sem distinguir maiúsculas); aceita "a, b"."""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    out, seen = [], set()
+    for tag in tags or []:
+        tag = " ".join(str(tag).split())
+        key = tag.casefold()
+        if tag and key not in seen:
+            seen.add(key)
+            out.append(tag)
+    return out
+
+
 def migrate_trade_dict(raw: dict, wallets: Dict[str, Wallet]) -> dict:
     """Garante compatibilidade com versões antigas dos ficheiros JSON."""
     out = dict(raw)
@@ -86,6 +103,7 @@ def migrate_trade_dict(raw: dict, wallets: Dict[str, Wallet]) -> dict:
     out.setdefault("pnl_pct", None)
     out.setdefault("result", None)
     out.setdefault("close_reason", None)
+    out["tags"] = normalize_tags(out.get("tags"))
     # assegurar consistência de wallet_id
     if out.get("wallet_id") not in wallets:
         if wallets:
@@ -93,6 +111,7 @@ def migrate_trade_dict(raw: dict, wallets: Dict[str, Wallet]) -> dict:
     return out
 
 
+@perf.timed("models.equity_curve")
 def equity_curve(trades: List[Trade], initial_balance: float):
     """Devolve lista de pontos (datetime, saldo) só com trades fechados."""
     bal = initial_balance
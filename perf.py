@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentação de tempos (desligada por omissão; só stdlib).
+
+Ligar:
+    TRADEIROS_PERF=1                     (variável de ambiente)
+    settings.json: {"perf": "1"}         (perf.configure(ds.settings) / aba Manutenção)
+    TRADEIROS_PERF_LOG=perf.log          (opcional) log rotativo com cada quadro
+
+Uso:
+    @perf.timed("reports.global_stats")
+    def global_stats(...): ...
+
+    with perf.span("history.dataframe"):
+        df = ...
+
+    with perf.frame("Histórico.refresh"):   # um "quadro" = rerun Streamlit / refresh Qt
+        ...                                   # spans desta thread lá dentro ficam no quadro
+
+- Desligado, span/timed custam uma verificação de flag (nada é registado).
+- Os quadros são por thread (rerun Streamlit = thread do script; trabalho no
+  QThreadPool = quadro próprio). Ao fechar, o quadro vai para recent(), para
+  os listeners e para o log "tradeiros.perf".
+"""
+import os
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Mapping, Optional
+
+ENV_VAR = "TRADEIROS_PERF"
+LOG_ENV_VAR = "TRADEIROS_PERF_LOG"
+SETTING = "perf"
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUPS = 3
+RECENT_MAX = 50
+
+log = logging.getLogger("tradeiros.perf")
+
+_ON_VALUES = ("1", "true", "on", "yes", "sim")
+_enabled = os.getenv(ENV_VAR, "").strip().lower() in _ON_VALUES
+_forced = False  # enable() explícito (ex.: CLI --perf) prevalece sobre as settings
+_local = threading.local()
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_MAX)
+_listeners: List[Callable] = []
+_log_handler = None
+
+
+class Frame:
+    """Um rerun/refresh: duração total + spans (nome, ms) medidos lá dentro."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.total_ms = None
+        self.spans = []  # (nome, ms)
+
+    def breakdown(self) -> List[tuple]:
+        """[(nome, chamadas, ms total)] por tempo decrescente (spans aninhados contam nos dois)."""
+        agg: Dict[str, list] = {}
+        for name, ms in self.spans:
+            a = agg.setdefault(name, [0, 0.0])
+            a[0] += 1
+            a[1] += ms
+        return sorted(((n, c, ms) for n, (c, ms) in agg.items()), key=lambda r: r[2], reverse=True)
+
+    def format(self) -> str:
+        total = self.total_ms if self.total_ms is not None else (time.perf_counter() - self._t0) * 1000.0
+        lines = [f"{self.label}: {total:.1f} ms"]
+        for name, calls, ms in self.breakdown():
+            lines.append(f"  {name:<32s} {ms:9.2f} ms" + (f"  ({calls}x)" if calls > 1 else ""))
+        return "\n".join(lines)
+
+    def as_dict(self) -> dict:
+        return {"label": self.label, "started_at": self.started_at, "total_ms": self.total_ms,
+                "spans": [{"name": n, "calls": c, "ms": round(ms, 3)} for n, c, ms in self.breakdown()]}
+
+
+# ---------- configuração ----------
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True, log_path: Optional[str] = None):
+    global _enabled, _forced
+    _enabled = _forced = bool(on)
+    if log_path:
+        set_log_file(log_path)
+
+
+def configure(settings: Optional[Mapping] = None):
+    """
+    Liga/desliga conforme a variável de ambiente, settings["perf"] ou um enable()
+    anterior; log de TRADEIROS_PERF_LOG ou settings["perf_log"]. Chamado pelo
+    DataStore sempre que as settings são (re)carregadas.
+    """
+    global _enabled
+    settings = settings or {}
+    _enabled = (_forced or os.getenv(ENV_VAR, "").strip().lower() in _ON_VALUES
+                or str(settings.get(SETTING, "")).strip().lower() in _ON_VALUES)
+    log_path = os.getenv(LOG_ENV_VAR) or settings.get("perf_log")
+    if _enabled and log_path:
+        set_log_file(log_path)
+
+
+def set_log_file(path: str):
+    """Grava cada quadro fechado em path (rotativo, LOG_MAX_BYTES x LOG_BACKUPS)."""
+    global _log_handler
+    from logging.handlers import RotatingFileHandler
+    with _lock:
+        if _log_handler is not None and getattr(_log_handler, "baseFilename", None) == os.path.abspath(path):
+            return
+        if _log_handler is not None:
+            log.removeHandler(_log_handler)
+            _log_handler.close()
+        _log_handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+        _log_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log.addHandler(_log_handler)
+        log.setLevel(logging.INFO)
+
+
+def add_listener(callback: Callable[[Frame], None]) -> Callable[[], None]:
+    """callback(quadro) quando um quadro fecha (na thread que o fechou). Devolve unsubscribe."""
+    with _lock:
+        _listeners.append(callback)
+
+    def unsubscribe():
+        with _lock:
+            if callback in _listeners:
+                _listeners.remove(callback)
+    return unsubscribe
+
+
+def recent() -> List[Frame]:
+    """Últimos quadros fechados (mais recente no fim)."""
+    with _lock:
+        return list(_recent)
+
+
+# ---------- medição ----------
+def _stack() -> list:
+    st = getattr(_local, "frames", None)
+    if st is None:
+        st = _local.frames = []
+    return st
+
+
+@contextmanager
+def span(name: str):
+    if not _enabled:
+        yield
+        return
+    frames = list(_stack())
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000.0
+        for f in frames:
+            f.spans.append((name, ms))
+
+
+def timed(name: Optional[str] = None):
+    """Decorador: mede cada chamada como span(name or módulo.função)."""
+    def deco(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def begin(label: str) -> Optional[Frame]:
+    """
+    Abre um quadro de topo nesta thread, descartando quadros que tenham ficado
+    abertos (ex.: rerun Streamlit interrompido por st.rerun()).
+    """
+    if not _enabled:
+        _local.frames = []
+        return None
+    f = Frame(label)
+    _local.frames = [f]
+    return f
+
+
+def end(f: Optional[Frame] = None) -> Optional[Frame]:
+    """Fecha o quadro f (ou o de topo desta thread) e publica-o."""
+    frames = _stack()
+    if f is None:
+        f = frames[0] if frames else None
+    if f is None:
+        return None
+    if f in frames:
+        del frames[frames.index(f):]
+    f.total_ms = (time.perf_counter() - f._t0) * 1000.0
+    _publish(f)
+    return f
+
+
+@contextmanager
+def frame(label: str):
+    """Quadro aninhável; devolve o Frame (ou None se desligado)."""
+    if not _enabled:
+        yield None
+        return
+    f = Frame(label)
+    frames = _stack()
+    frames.append(f)
+    try:
+        yield f
+    finally:
+        end(f)
+
+
+def _publish(f: Frame):
+    with _lock:
+        _recent.append(f)
+        listeners = list(_listeners)
+    if log.handlers:
+        try:
+            log.info(f.format().replace("\n", " |"))
+        except Exception:
+            pass
+    for cb in listeners:
+        try:
+            cb(f)
+        except Exception:
+            pass
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+Linguagem de consulta do histórico, compilada uma vez e avaliada em colunas
+(columnar.py) com máscaras numpy, ou trade a trade (Query.match).
+
+    q = query.compile("symbol:BTC* dir:Short pnl<0 risk_pct>1.5 closed:2025-01..2025-03", ds.wallets)
+    reports.filter_trades(None, query=q, columns=ds.columns)
+
+Sintaxe:
+- termos separados por espaços = E; `OR` (ou `|`) = OU; `-termo` ou `NOT termo`
+  nega; parênteses agrupam. Uma palavra solta pesquisa na razão (como
+  `reason:`), "entre aspas" para várias palavras.
+- `campo:valor` — texto sem distinguir maiúsculas, com * e ? (`symbol:BTC*`);
+  vários valores com vírgulas (`symbol:BTC*,ETH*`); números e datas aceitam
+  intervalos inclusivos `a..b` (`pnl:-50..50`, `closed:2025-01..2025-03`,
+  `created:..2024`). Datas: AAAA, AAAA-MM ou AAAA-MM-DD (prefixo).
+- `campo<valor`, `<=`, `>`, `>=`, `=`, `!=` para números e datas.
+- Campos: symbol/sym, dir/direction (long/short), status (open/closed),
+  result (gain/loss/be), close (tp/sl/manual), wallet (nome ou id), tag/tags,
+  reason; entry, sl, tp, exit, size, value, risk, risk_pct, pnl, pnl_pct, rr
+  (retorno/risco planeado); created/date, closed.
+- Números com ponto decimal. Valores em falta (ex.: pnl de um trade aberto)
+  não passam em nenhuma comparação (mas passam na negação).
+
+Erros de sintaxe levantam QueryError com a posição no texto.
+"""
+import re
+import fnmatch
+from functools import lru_cache
+from typing import List, Mapping, Optional, Tuple
+
+from columnar import category_value, number_value, date_value
+from search import matches, tokens
+
+# campo -> (tipo, coluna)
+FIELDS = {
+    "symbol": ("cat", "symbol"), "sym": ("cat", "symbol"),
+    "dir": ("cat", "direction"), "direction": ("cat", "direction"),
+    "status": ("cat", "status"), "result": ("cat", "result"), "close": ("cat", "close_reason"),
+    "wallet": ("wallet", "wallet_id"),
+    "tag": ("tag", "tags"), "tags": ("tag", "tags"),
+    "reason": ("text", "reason"),
+    "entry": ("num", "entry_price"), "sl": ("num", "stop_loss"), "tp": ("num", "take_profit"),
+    "exit": ("num", "exit_price"), "size": ("num", "position_size"), "value": ("num", "position_value"),
+    "risk": ("num", "risk_amount"), "risk_pct": ("num", "risk_pct_of_balance"),
+    "pnl": ("num", "pnl_abs"), "pnl_pct": ("num", "pnl_pct"), "rr": ("rr", None),
+    "created": ("date", "created_at"), "date": ("date", "created_at"), "closed": ("date", "closed_at"),
+}
+
+# abreviaturas aceites nos valores de texto
+ALIASES = {
+    "direction": {"l": "long", "s": "short"},
+    "result": {"be": "break-even", "breakeven": "break-even", "win": "gain", "w": "gain", "l": "loss"},
+}
+
+_TERM = re.compile(r"([A-Za-z_]+)(<=|>=|!=|:|<|>|=)(.*)", re.S)
+_DATE = re.compile(r"\d{4}(-\d{2}(-\d{2})?)?$")
+
+
+class QueryError(ValueError):
+    """Consulta inválida; pos = posição (0-based) no texto."""
+
+    def __init__(self, message: str, pos: int = 0):
+        super().__init__(f"{message} (posição {pos + 1})")
+        self.pos = pos
+
+
+# ---------- nós da árvore ----------
+class _And:
+    def __init__(self, items):
+        self.items = items
+
+    def mask(self, view):
+        out = None
+        for it in self.items:
+            m = it.mask(view)
+            out = m if out is None else out & m
+        return out
+
+    def match(self, t) -> bool:
+        return all(it.match(t) for it in self.items)
+
+
+class _Or(_And):
+    def mask(self, view):
+        out = None
+        for it in self.items:
+            m = it.mask(view)
+            out = m if out is None else out | m
+        return out
+
+    def match(self, t) -> bool:
+        return any(it.match(t) for it in self.items)
+
+
+class _Not:
+    def __init__(self, item):
+        self.item = item
+
+    def mask(self, view):
+        return ~self.item.mask(view)
+
+    def match(self, t) -> bool:
+        return not self.item.match(t)
+
+
+class _CatTerm:
+    """Texto (categoria): o predicado corre uma vez por valor distinto da coluna."""
+
+    def __init__(self, column: str, pred):
+        self.column, self.pred = column, pred
+
+    def mask(self, view):
+        import numpy as np
+        codes, values = view.category(self.column)
+        lut = np.fromiter((self.pred(v) for v in values), dtype=bool, count=len(values))
+        return lut[codes] if len(values) else np.zeros(len(codes), dtype=bool)
+
+    def match(self, t) -> bool:
+        return self.pred(category_value(t, self.column))
+
+
+class _CmpTerm:
+    """Número ou data: a mesma comparação serve para colunas numpy e para um valor só."""
+
+    def __init__(self, kind: str, column: Optional[str], tests: List[Tuple[str, object]]):
+        self.kind, self.column, self.tests = kind, column, tests  # tests: [(op, valor)], OU entre eles
+
+    def _column(self, view):
+        if self.kind == "rr":
+            import numpy as np
+            entry, sl, tp = view.number("entry_price"), view.number("stop_loss"), view.number("take_profit")
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rr = np.abs(tp - entry) / np.abs(entry - sl)
+            rr[~np.isfinite(rr)] = np.nan
+            return rr
+        return view.date(self.column) if self.kind == "date" else view.number(self.column)
+
+    def _scalar(self, t):
+        if self.kind == "rr":
+            entry, sl, tp = (number_value(t, c) for c in ("entry_price", "stop_loss", "take_profit"))
+            risk = abs(entry - sl)
+            return abs(tp - entry) / risk if risk > 0 else float("nan")
+        return date_value(t, self.column) if self.kind == "date" else number_value(t, self.column)
+
+    def _eval(self, x):
+        out = None
+        for op, v in self.tests:
+            m = _compare(x, op, v)
+            if self.kind == "date":
+                m = m & (x != "")
+            out = m if out is None else out | m
+        return out
+
+    def mask(self, view):
+        return self._eval(self._column(view))
+
+    def match(self, t) -> bool:
+        return bool(self._eval(self._scalar(t)))
+
+
+def _compare(x, op: str, v):
+    if op == "range":
+        lo, hi = v
+        if lo is None:
+            return x <= hi
+        if hi is None:
+            return x >= lo
+        return (x >= lo) & (x <= hi)
+    if op == "<":
+        return x < v
+    if op == "<=":
+        return x <= v
+    if op == ">":
+        return x > v
+    if op == ">=":
+        return x >= v
+    return x == v
+
+
+# ---------- parser ----------
+def _lex(text: str) -> List[Tuple[str, int]]:
+    """Palavras (com "aspas" lá dentro), parênteses e |; devolve (token, posição)."""
+    out, i, n = [], 0, len(text)
+    while i < n:
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif c in "()|":
+            out.append((c, i))
+            i += 1
+        else:
+            start, buf = i, []
+            while i < n and not text[i].isspace() and text[i] not in "()|":
+                if text[i] == '"':
+                    end = text.find('"', i + 1)
+                    if end < 0:
+                        raise QueryError("aspas por fechar", i)
+                    buf.append(text[i:end + 1])
+                    i = end + 1
+                else:
+                    buf.append(text[i])
+                    i += 1
+            out.append(("".join(buf), start))
+    return out
+
+
+def _unquote(s: str) -> str:
+    return s.replace('"', "")
+
+
+def _split_values(raw: str) -> List[str]:
+    """Separa por vírgulas fora de aspas."""
+    parts, buf, quoted = [], [], False
+    for c in raw:
+        if c == '"':
+            quoted = not quoted
+        elif c == "," and not quoted:
+            parts.append("".join(buf))
+            buf = []
+            continue
+        buf.append(c)
+    parts.append("".join(buf))
+    return [_unquote(p).strip() for p in parts]
+
+
+class _Parser:
+    def __init__(self, text: str, wallets: Tuple[Tuple[str, str], ...]):
+        self.text = text
+        self.toks = _lex(text)
+        self.i = 0
+        self.wallets = wallets
+
+    def peek(self) -> Optional[str]:
+        return self.toks[self.i][0] if self.i < len(self.toks) else None
+
+    def pos(self) -> int:
+        return self.toks[self.i][1] if self.i < len(self.toks) else len(self.text)
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f"inesperado: {self.peek()}", self.pos())
+        return node
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.peek() in ("OR", "|"):
+            self.i += 1
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else _Or(items)
+
+    def parse_and(self):
+        items = []
+        while self.peek() not in (None, ")", "OR", "|"):
+            if self.peek() == "AND":
+                self.i += 1
+                continue
+            items.append(self.parse_unary())
+        if not items:
+            raise QueryError("falta um termo", self.pos())
+        return items[0] if len(items) == 1 else _And(items)
+
+    def parse_unary(self):
+        tok, pos = self.toks[self.i]
+        if tok == "NOT":
+            self.i += 1
+            return _Not(self.parse_unary())
+        if tok == "(":
+            self.i += 1
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise QueryError("falta )", self.pos())
+            self.i += 1
+            return node
+        if tok == ")":
+            raise QueryError(") a mais", pos)
+        self.i += 1
+        if tok.startswith("-") and len(tok) > 1:
+            return _Not(self.term(tok[1:], pos + 1))
+        return self.term(tok, pos)
+
+    def term(self, tok: str, pos: int):
+        m = _TERM.match(tok)
+        if not m or '"' in m.group(1):
+            return self.text_term(_unquote(tok), pos)
+        name, op, raw = m.group(1).lower(), m.group(2), m.group(3)
+        if name not in FIELDS:
+            raise QueryError(f"campo desconhecido: {m.group(1)}", pos)
+        if not raw:
+            raise QueryError(f"falta o valor de {name}", pos + len(m.group(1)) + len(op))
+        kind, column = FIELDS[name]
+        vpos = pos + len(m.group(1)) + len(op)
+        if kind in ("num", "rr", "date"):
+            if op == "!=":
+                return _Not(_CmpTerm(kind, column, self.cmp_tests(kind, name, ":", raw, vpos)))
+            return _CmpTerm(kind, column, self.cmp_tests(kind, name, op, raw, vpos))
+        if op not in (":", "=", "!="):
+            raise QueryError(f"{name} só aceita :, = ou !=", pos + len(m.group(1)))
+        values = [v for v in _split_values(raw) if v]
+        if not values:
+            raise QueryError(f"falta o valor de {name}", vpos)
+        node = self.text_values(kind, column, values)
+        return _Not(node) if op == "!=" else node
+
+    def text_term(self, words: str, pos: int):
+        terms = tokens(words)
+        if not terms:
+            raise QueryError(f"termo inválido: {words}", pos)
+        return _CatTerm("reason", lambda v, terms=terms: matches(v, terms))
+
+    def text_values(self, kind: str, column: str, values: List[str]):
+        if kind == "text":
+            groups = [tokens(v) for v in values]
+            return _CatTerm(column, lambda v: any(matches(v, g) for g in groups))
+        aliases = ALIASES.get(column, {})
+        pats = [aliases.get(v.casefold(), v.casefold()) for v in values]
+
+        def hit(s: str) -> bool:
+            s = s.casefold()
+            return any(fnmatch.fnmatchcase(s, p) for p in pats)
+        if kind == "tag":
+            return _CatTerm(column, lambda tags: any(hit(tag) for tag in tags))
+        if kind == "wallet":
+            ids = frozenset(wid for wid, name in self.wallets if hit(wid) or hit(name))
+            return _CatTerm(column, lambda wid: wid in ids)
+        return _CatTerm(column, hit)
+
+    def cmp_tests(self, kind: str, name: str, op: str, raw: str, pos: int) -> List[Tuple[str, object]]:
+        def val(s: str, upper: bool = False):
+            if kind == "date":
+                if not _DATE.match(s):
+                    raise QueryError(f"data inválida em {name}: {s} (AAAA, AAAA-MM ou AAAA-MM-DD)", pos)
+                return s + "\uffff" if upper else s  # o fim de um prefixo inclui o mês/dia inteiro
+            try:
+                return float(s)
+            except ValueError:
+                raise QueryError(f"número inválido em {name}: {s}", pos)
+
+        if op not in (":", "="):
+            # datas: < e >= comparam com o início do período; <= e > com o fim
+            return [(op, val(raw, upper=kind == "date" and op in ("<=", ">")))]
+        tests = []
+        for s in _split_values(raw):
+            if ".." in s:
+                lo, hi = s.split("..", 1)
+                if not lo and not hi:
+                    raise QueryError(f"intervalo vazio em {name}", pos)
+                tests.append(("range", (val(lo) if lo else None, val(hi, upper=True) if hi else None)))
+            elif kind == "date":
+                tests.append(("range", (val(s), val(s, upper=True))))
+            elif s:
+                tests.append(("==", val(s)))
+        if not tests:
+            raise QueryError(f"falta o valor de {name}", pos)
+        return tests
+
+
+class Query:
+    """Consulta compilada: mask(view) sobre columnar.ColumnarView, match(trade) para um trade só."""
+
+    def __init__(self, text: str, node, wallets_key=()):
+        self.text = text
+        self._node = node
+        self._key = (text, wallets_key)
+
+    def mask(self, view):
+        return self._node.mask(view)
+
+    def match(self, t) -> bool:
+        return bool(self._node.match(t))
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and other._key == self._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return f"Query({self.text!r})"
+
+
+@lru_cache(maxsize=256)
+def _compile(text: str, wallets: Tuple[Tuple[str, str], ...]) -> Query:
+    return Query(text, _Parser(text, wallets).parse(), wallets)
+
+
+def compile(text: Optional[str], wallets: Optional[Mapping] = None) -> Optional[Query]:
+    """Compila a consulta (None se vazia). wallets (ds.wallets) resolve `wallet:` por nome. Levanta QueryError."""
+    text = " ".join((text or "").split())
+    if not text:
+        return None
+    key = tuple(sorted((wid, w.name) for wid, w in (wallets or {}).items()))
+    return _compile(text, key)
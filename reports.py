@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+Estatísticas, filtros de histórico e exportação, sem dependências de UI.
+
+Usado pelo Streamlit, pelas abas Qt e pela CLI (python -m tradeiros).
+pandas/openpyxl só são importados dentro de write_excel.
+"""
+
+import csv
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional
+
+from models import Trade, Wallet, normalize_tags
+from archive import add_summary, empty_summary
+from search import matches, tokens
+import perf
+
+
+class Cancelled(Exception):
+    """Levantada por um callback de progresso para interromper um trabalho longo."""
+
+
+# ---------- estatísticas ----------
+@perf.timed("reports.compute_stats")
+def compute_stats(trades: Iterable[Trade], initial_balance: float, archived: Optional[Mapping] = None) -> dict:
+    """
+    KPIs de um conjunto de trades (uma passagem). archived: resumo de trades
+    fechados no arquivo frio (archive.py), somado sem os ler.
+    """
+    total = closed = winners = losers = be = 0
+    pnl_total = 0.0
+    if archived:
+        total = closed = archived["closed"]
+        winners, losers, be = archived["winners"], archived["losers"], archived["breakeven"]
+        pnl_total = archived["pnl_total"]
+    for t in trades:
+        total += 1
+        if (t.status or "Open") != "Closed":
+            continue
+        closed += 1
+        p = t.pnl_abs or 0.0
+        pnl_total += p
+        if p > 0:
+            winners += 1
+        elif p < 0:
+            losers += 1
+        else:
+            be += 1
+    winrate = (winners / closed * 100.0) if closed else 0.0
+    current_balance = (initial_balance or 0.0) + pnl_total
+    growth_pct = ((current_balance / initial_balance - 1) * 100.0) if initial_balance and initial_balance > 0 else 0.0
+    return dict(
+        total_trades=total, closed_trades=closed, open_trades=total - closed,
+        winners=winners, losers=losers, breakeven=be,
+        winrate_pct=winrate, pnl_total=pnl_total,
+        initial_balance=initial_balance or 0.0, current_balance=current_balance,
+        growth_pct=growth_pct
+    )
+
+
+def stats_by(trades: Iterable[Trade], facet: str, initial_balance: float = 0.0) -> Dict[str, dict]:
+    """compute_stats por valor de uma faceta (facets.FACETS: "tag", "symbol", ...); um trade com várias tags conta em cada uma."""
+    from facets import facet_values
+    groups: Dict[str, List[Trade]] = {}
+    for t in trades:
+        for f, v in facet_values(t):
+            if f == facet:
+                groups.setdefault(v, []).append(t)
+    return {v: compute_stats(ts, initial_balance) for v, ts in sorted(groups.items())}
+
+
+def selection_stats(trades: List[Trade], wallets: Mapping[str, Wallet], wallet_id: Optional[str] = None,
+                    by: Optional[str] = None) -> dict:
+    """
+    KPIs de uma seleção filtrada (ex.: filter_trades com tags): saldo inicial da
+    carteira filtrada ou soma de todas; by="tag"/"symbol"/... acrescenta o
+    mesmo por valor dessa faceta.
+    """
+    w = wallets.get(wallet_id) if wallet_id else None
+    initial = w.initial_balance if w else sum(x.initial_balance for x in wallets.values())
+    out = compute_stats(trades, initial)
+    if by:
+        out["by"] = {by: stats_by(trades, by, initial)}
+    return out
+
+
+@perf.timed("reports.wallet_stats")
+def wallet_stats(wallet: Wallet, trades: Mapping[str, Trade], archived: Optional[Mapping] = None) -> dict:
+    """archived: {wallet_id: resumo} (StoreSnapshot.archived)."""
+    return compute_stats((t for t in trades.values() if t.wallet_id == wallet.id), wallet.initial_balance or 0.0,
+                         (archived or {}).get(wallet.id))
+
+
+@perf.timed("reports.global_stats")
+def global_stats(wallets: Mapping[str, Wallet], trades: Mapping[str, Trade], archived: Optional[Mapping] = None) -> dict:
+    initial_total = sum((w.initial_balance or 0.0) for w in wallets.values())
+    summary = None
+    if archived:
+        summary = empty_summary()
+        for wid, s in archived.items():
+            if wid in wallets:  # carteiras apagadas deixam o arquivo, mas não contam
+                add_summary(summary, s)
+    return compute_stats(trades.values(), initial_total, summary)
+
+
+# ---------- filtros de histórico ----------
+def _date_key(iso: Optional[str]) -> Optional[str]:
+    """'YYYY-MM-DD' de uma data ISO (comparação de strings, sem fromisoformat por trade)."""
+    if iso and len(iso) >= 10 and iso[4] == "-" and iso[7] == "-":
+        return iso[:10]
+    return None
+
+
+@perf.timed("reports.filter_trades")
+def filter_trades(trades: Optional[Iterable[Trade]], wallet_id: Optional[str] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  symbol: Optional[str] = None, status: Optional[str] = None,
+                  reason: Optional[str] = None, index=None,
+                  direction: Optional[str] = None, result: Optional[str] = None,
+                  tags: Iterable[str] = (), facets=None, query=None, columns=None) -> List[Trade]:
+    """
+    Filtros do histórico: carteira, intervalo de datas de criação ('YYYY-MM-DD',
+    inclusivo), substring da paridade, estado ('Open' | 'Closed'; None/'Todos' = todos),
+    direção, resultado, tags (todas têm de estar; sem distinguir maiúsculas)
+    e pesquisa na razão (palavras como prefixo, sem acentos; ver search.py).
+    Com index (ds.reason_index) a pesquisa usa o índice invertido; sem ele
+    compara trade a trade.
+    Com facets (ds.facets) os candidatos saem da interseção dos bitmaps
+    (facets.py) e `trades` é ignorado (pode ser None): inclui o arquivo frio.
+    query: consulta compilada (query.compile); com columns (ds.columns) é
+    avaliada de uma vez em colunas numpy, sem columns trade a trade. Com
+    columns e sem facets nem trades, a fonte são as linhas que passam.
+    Trades sem data válida não são excluídos pelo filtro de datas.
+    Devolve a lista ordenada por data de criação.
+    """
+    symbol, status, direction, result, tags = _norm_values(symbol, status, direction, result, tags)
+    if facets is not None:
+        trades = facets.select(wallet_id=wallet_id, symbol=symbol, status=status, direction=direction,
+                               result=result, tags=tags, date_from=date_from, date_to=date_to)
+    qids = None
+    if query is not None and columns is not None:
+        if trades is None:
+            trades, query = columns.trades(query), None
+        else:
+            qids = columns.ids(query)
+    ids = index.search(reason) if (reason and index is not None) else None
+    terms = tokens(reason) if (reason and index is None) else ()
+    rows = list(_matching(trades, wallet_id, date_from, date_to, symbol, status, direction, result, tags,
+                          ids, terms, query, qids))
+    rows.sort(key=lambda x: (x.created_at or ""))
+    return rows
+
+
+def iter_filtered(trades: Iterable[Trade], wallet_id: Optional[str] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  symbol: Optional[str] = None, status: Optional[str] = None,
+                  reason: Optional[str] = None, index=None,
+                  direction: Optional[str] = None, result: Optional[str] = None,
+                  tags: Iterable[str] = (), query=None, columns=None) -> Iterator[Trade]:
+    """
+    Os filtros de filter_trades trade a trade, pela ordem de `trades` e sem
+    juntar nada: para exportações em fluxo (ex.: sobre ds.iter_history()).
+    Com columns a query é avaliada nas colunas e só os ids ficam em memória.
+    """
+    symbol, status, direction, result, tags = _norm_values(symbol, status, direction, result, tags)
+    qids = columns.ids(query) if (query is not None and columns is not None) else None
+    ids = index.search(reason) if (reason and index is not None) else None
+    terms = tokens(reason) if (reason and index is None) else ()
+    return _matching(trades, wallet_id, date_from, date_to, symbol, status, direction, result, tags,
+                     ids, terms, query, qids)
+
+
+def _norm_values(symbol, status, direction, result, tags) -> tuple:
+    def opt(v):
+        return None if v in (None, "", "Todos") else v
+    return ((symbol or "").strip().upper(), opt(status), opt(direction), opt(result),
+            [tag.casefold() for tag in normalize_tags(tags)])
+
+
+def _matching(trades, wallet_id, date_from, date_to, symbol, status, direction, result, tags,
+              ids, terms, query, qids) -> Iterator[Trade]:
+    for t in trades:
+        if wallet_id is not None and t.wallet_id != wallet_id:
+            continue
+        if qids is not None:
+            if t.id not in qids:
+                continue
+        elif query is not None and not query.match(t):
+            continue
+        if direction and t.direction != direction:
+            continue
+        if result and t.result != result:
+            continue
+        if tags and not _has_tags(t, tags):
+            continue
+        if ids is not None and t.id not in ids:
+            continue
+        if terms and not matches(t.reason, terms):
+            continue
+        if symbol and symbol not in (t.symbol or "").upper():
+            continue
+        if status and (t.status or "Open") != status:
+            continue
+        d = _date_key(t.created_at)
+        if d is not None and ((date_from and d < date_from) or (date_to and d > date_to)):
+            continue
+        yield t
+
+
+def _has_tags(t: Trade, tags: Iterable[str]) -> bool:
+    own = {tag.casefold() for tag in t.tags or ()}
+    return all(tag in own for tag in tags)
+
+
+def _norm_filters(f: Mapping) -> tuple:
+    def opt(v):
+        return None if v in (None, "", "Todos") else v
+    return (f.get("wallet_id"), f.get("date_from") or None, f.get("date_to") or None,
+            (f.get("symbol") or "").strip().upper(), opt(f.get("status")),
+            tokens(f.get("reason") or ""), opt(f.get("direction")), opt(f.get("result")),
+            frozenset(tag.casefold() for tag in normalize_tags(f.get("tags"))),
+            f.get("query"))
+
+
+def filter_key(f: Mapping) -> tuple:
+    """Chave (hashable) de kwargs de filter_trades: filtros equivalentes dão a mesma (ex.: ds.artifacts)."""
+    return _norm_filters(f)
+
+
+def narrows(prev: Mapping, cur: Mapping) -> bool:
+    """
+    True se os filtros `cur` (kwargs de filter_trades) só podem excluir trades
+    em relação a `prev`: basta então filtrar o resultado anterior em vez de
+    todos os trades (ex.: escrever mais letras da paridade, encurtar datas).
+    """
+    pw, pf, pt, ps, pst, pr, pd, pres, ptg, pq = _norm_filters(prev)
+    cw, cf, ct, cs, cst, cr, cd, cres, ctg, cq = _norm_filters(cur)
+    if pw != cw or ps not in cs or not ptg <= ctg:
+        return False
+    # consulta: sem nenhuma antes, a nova só pode excluir; senão tem de ser a mesma
+    if pq is not None and pq != cq:
+        return False
+    # cada palavra pesquisada antes tem de ser prefixo de uma das atuais
+    if not all(any(c.startswith(p) for c in cr) for p in pr):
+        return False
+    if any(p is not None and p != c for p, c in ((pst, cst), (pd, cd), (pres, cres))):
+        return False
+    if pf is not None and (cf is None or cf < pf):
+        return False
+    if pt is not None and (ct is None or ct > pt):
+        return False
+    return True
+
+
+# ---------- linhas para tabela/export ----------
+EXPORT_COLUMNS = [
+    "ID", "Data", "Carteira", "Paridade", "Direção", "Entrada", "SL", "TP", "Quantidade",
+    "ValorPos", "RiscoUSD", "RiscoPct", "Estado", "Saída", "PnL", "PnLPct", "Resultado",
+    "FechadoComo", "Razão", "Tags",
+]
+
+
+def _f(v):
+    try:
+        return None if v is None else float(v)
+    except Exception:
+        return None
+
+
+def trade_row(t: Trade, wallet_name: str = "") -> dict:
+    return dict(
+        ID=t.id, Data=(t.created_at or "").replace("T", " "), Carteira=wallet_name,
+        Paridade=t.symbol, Direção=t.direction,
+        Entrada=_f(t.entry_price), SL=_f(t.stop_loss), TP=_f(t.take_profit),
+        Quantidade=_f(t.position_size), ValorPos=_f(t.position_value),
+        RiscoUSD=_f(t.risk_amount), RiscoPct=_f(t.risk_pct_of_balance),
+        Estado=t.status, Saída=_f(t.exit_price), PnL=_f(t.pnl_abs), PnLPct=_f(t.pnl_pct),
+        Resultado=t.result, FechadoComo=t.close_reason, Razão=t.reason,
+        Tags=", ".join(t.tags or ()),
+    )
+
+
+@perf.timed("reports.trade_rows")
+def trade_rows(trades: Iterable[Trade], wallets: Mapping[str, Wallet]) -> List[dict]:
+    names = {wid: w.name for wid, w in wallets.items()}
+    return [trade_row(t, names.get(t.wallet_id, "")) for t in trades]
+
+
+# ---------- exportação ----------
+@perf.timed("reports.write_csv")
+def write_csv(target, rows: Iterable[dict]) -> int:
+    """Escreve as linhas em CSV (target: caminho ou ficheiro de texto). Devolve nº de linhas."""
+    def _write(f):
+        w = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+        w.writeheader()
+        n = 0
+        for r in rows:
+            w.writerow({k: ("" if v is None else v) for k, v in r.items()})
+            n += 1
+        return n
+    if isinstance(target, str):
+        with open(target, "w", encoding="utf-8", newline="") as f:
+            return _write(f)
+    return _write(target)
+
+
+STATS_LABELS = [
+    ("Total de trades", "total_trades"),
+    ("Fechados", "closed_trades"),
+    ("Abertos", "open_trades"),
+    ("Winners", "winners"),
+    ("Losers", "losers"),
+    ("Break-even", "breakeven"),
+    ("Winrate %", "winrate_pct"),
+    ("PnL total ($)", "pnl_total"),
+    ("Saldo inicial ($)", "initial_balance"),
+    ("Saldo atual ($)", "current_balance"),
+    ("Crescimento %", "growth_pct"),
+]
+
+
+@perf.timed("reports.write_excel")
+def write_excel(target, rows, stats_wallet: dict, stats_global: dict,
+                progress: Optional[Callable[[int, str], None]] = None) -> None:
+    """
+    Folha "Trades" (formatada, se openpyxl existir) + folha "Estatísticas"
+    com a carteira selecionada e o global. target: caminho ou BytesIO.
+    rows: linhas de trade_rows ou um DataFrame já montado (ds.columns.frame).
+    progress(pct, msg) é chamado ao longo do trabalho; pode levantar Cancelled.
+    """
+    progress = progress or (lambda pct, msg="": None)
+    progress(0, "A preparar dados")
+    import pandas as pd
+    try:
+        from openpyxl.styles import Font
+        has_openpyxl = True
+    except Exception:
+        has_openpyxl = False
+
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+    with pd.ExcelWriter(target, engine="openpyxl") as writer:
+        progress(10, "A escrever trades")
+        df.to_excel(writer, index=False, sheet_name="Trades")
+        if has_openpyxl:
+            progress(30, "A formatar")
+            _style_trades_sheet(writer.book["Trades"], df,
+                                lambda f: progress(30 + int(f * 60), "A formatar"))
+
+        ws_stats = writer.book.create_sheet("Estatísticas")
+        ws_stats["A1"] = "Carteira selecionada"
+        if has_openpyxl:
+            ws_stats["A1"].font = Font(bold=True, size=12)
+        _write_stats_block(ws_stats, 2, 1, stats_wallet, has_openpyxl)
+
+        ws_stats["A10"] = "Global (todas as carteiras)"
+        if has_openpyxl:
+            ws_stats["A10"].font = Font(bold=True, size=12)
+        _write_stats_block(ws_stats, 11, 1, stats_global, has_openpyxl)
+        progress(95, "A guardar")
+
+
+def _write_stats_block(ws, start_row: int, start_col: int, s: dict, styled: bool):
+    r = start_row
+    money_keys = {"pnl_total", "initial_balance", "current_balance"}
+    pct_keys = {"winrate_pct", "growth_pct"}
+    if styled:
+        from openpyxl.styles import Font
+
+    for label, key in STATS_LABELS:
+        ws.cell(row=r, column=start_col, value=label)
+        # deixar negrito se openpyxl disponível
+        if styled:
+            ws.cell(row=r, column=start_col).font = Font(bold=True)
+
+        val = (s or {}).get(key, 0.0)
+        cell = ws.cell(row=r, column=start_col + 1, value=val)
+
+        if styled:
+            if key in money_keys:
+                cell.number_format = u'"$"#,##0.00'
+            elif key in pct_keys:
+                try:
+                    cell.value = float(val) / 100.0
+                except Exception:
+                    pass
+                cell.number_format = "0.00%"
+        r += 1
+
+    if styled:
+        try:
+            from openpyxl.utils import get_column_letter
+            for c in range(start_col, start_col + 2):
+                ws.column_dimensions[get_column_letter(c)].width = 24
+        except Exception:
+            pass
+
+
+def _style_trades_sheet(ws, df, progress: Optional[Callable[[float], None]] = None):
+    try:
+        import pandas as pd
+        from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+        from openpyxl.formatting.rule import ColorScaleRule
+        from openpyxl.utils import get_column_letter
+
+        header_fill = PatternFill(start_color="1F2937", end_color="1F2937", fill_type="solid")  # cinza escuro
+        header_font = Font(color="FFFFFF", bold=True)
+        for c in range(1, df.shape[1] + 1):
+            cell = ws.cell(row=1, column=c)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = Alignment(vertical="center")
+            # larguras
+            if c in (1, 3, 4, 5, 18):
+                width = 14
+            elif c in (2,):
+                width = 20
+            else:
+                width = 13
+            ws.column_dimensions[get_column_letter(c)].width = width
+
+        # filtros + freeze header
+        ws.auto_filter.ref = f"A1:{get_column_letter(df.shape[1])}{df.shape[0]+1}"
+        ws.freeze_panes = "A2"
+
+        # estilos nomeados (registar só se necessário)
+        def register_style(style):
+            try:
+                ws.parent.add_named_style(style)
+            except ValueError:
+                pass
+
+        money = NamedStyle(name="Money_Style")
+        money.number_format = u'"$"#,##0.00'
+        pct = NamedStyle(name="Pct_Style")
+        pct.number_format = "0.00%"
+
+        register_style(money)
+        register_style(pct)
+
+        # mapear colunas
+        col_map = {name: idx+1 for idx, name in enumerate(df.columns)}
+
+        # aplicar formatos
+        n_rows = df.shape[0]
+        for r in range(2, n_rows + 2):
+            if progress and r % 500 == 0:
+                progress((r - 1) / n_rows)
+            for nm in ("Entrada", "SL", "TP", "ValorPos", "RiscoUSD", "Saída", "PnL"):
+                c = col_map.get(nm)
+                if c:
+                    ws.cell(row=r, column=c).style = "Money_Style"
+            for nm in ("RiscoPct", "PnLPct"):
+                c = col_map.get(nm)
+                if c:
+                    v = ws.cell(row=r, column=c).value
+                    if isinstance(v, (int, float)) and v > 1.0:
+                        ws.cell(row=r, column=c).value = v / 100.0
+                    ws.cell(row=r, column=c).style = "Pct_Style"
+
+        # gradiente no PnL
+        if df.shape[0] > 0 and "PnL" in df.columns:
+            c = col_map["PnL"]
+            rng = f"{get_column_letter(c)}2:{get_column_letter(c)}{df.shape[0]+1}"
+            safe_min = float(pd.to_numeric(df['PnL'], errors='coerce').fillna(0).min())
+            safe_max = float(pd.to_numeric(df['PnL'], errors='coerce').fillna(0).max())
+            ws.conditional_formatting.add(
+                rng,
+                ColorScaleRule(
+                    start_type='num', start_value=min(safe_min, 0),
+                    mid_type='num', mid_value=0,
+                    end_type='num', end_value=max(safe_max, 0),
+                    start_color='FCA5A5', mid_color='FFFFFF', end_color='86EFAC'
+                )
+            )
+    except Cancelled:
+        raise
+    except Exception:
+        # qualquer erro de styling é ignorado; o ficheiro continua válido
+        pass
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas móveis de uma carteira, por trade fechado (ordem de fecho, como a
+curva de capital):
+
+- taxa de acerto, esperança (PnL médio) e R médio (PnL / risco) dos últimos
+  N fechados;
+- PnL dos últimos D dias (fechados nos D dias até ao fecho deste, inclusive).
+
+    m = rolling.wallet_rolling(ds, wallet_id)             # dict de arrays numpy
+    m["winrate_pct"][-1], m["pnl_days"][-1]
+
+- Uma passagem: somas cumulativas (np.cumsum) e cada janela é a diferença de
+  duas posições; a janela por dias acha o início com np.searchsorted nas
+  datas já ordenadas. Nada é recalculado janela a janela.
+- Os primeiros N-1 pontos usam os fechados que houver (janela a crescer).
+- R só conta trades com risco > 0; sem nenhum na janela fica NaN.
+- wallet_rolling guarda o resultado em ds.artifacts por carteira, N, D e
+  versão dos dados da carteira.
+"""
+from typing import Dict, Optional
+
+import perf
+
+WINDOW = 20   # últimos N trades fechados
+DAYS = 30     # PnL dos últimos D dias
+
+
+def _window_sums(values, window: int):
+    """Soma dos últimos `window` valores em cada posição (menos no início)."""
+    import numpy as np
+    c = np.concatenate(([0], np.cumsum(values)))
+    i = np.arange(1, len(values) + 1)
+    return c[i] - c[np.maximum(0, i - window)]
+
+
+def _seconds(keys):
+    """
+    Datas ISO (ou já em segundos, como ds.columns.seconds) -> segundos int64 não
+    decrescentes; inválidas ficam com a data anterior (ou a primeira).
+    """
+    import numpy as np
+    from columnar import iso_seconds, BAD_SECONDS
+    keys = np.asarray(keys)
+    secs = keys.astype(np.int64) if keys.dtype.kind in "iu" else iso_seconds(keys)
+    bad = secs == BAD_SECONDS
+    if bad.all():
+        return np.zeros(len(secs), dtype=np.int64)
+    secs = np.maximum.accumulate(secs)
+    secs[secs == BAD_SECONDS] = secs[~bad][0]
+    return secs
+
+
+@perf.timed("rolling.metrics")
+def rolling_metrics(keys, pnls, risks=None, window: int = WINDOW, days: int = DAYS) -> Dict[str, object]:
+    """
+    Métricas móveis de trades fechados já ordenados por data de fecho
+    (ex.: ds.columns.closed_series); keys: datas ISO ou segundos. Devolve
+    {"keys", "winrate_pct", "expectancy", "avg_r", "pnl_days", "window",
+    "days"}: um valor por trade.
+    """
+    import numpy as np
+    pnls = np.asarray(pnls, dtype=np.float64)
+    n = len(pnls)
+    window = max(1, int(window))
+    count = np.minimum(np.arange(1, n + 1), window)
+    wins = _window_sums((pnls > 0).astype(np.int64), window)
+    out = {
+        "keys": np.asarray(keys),
+        "winrate_pct": wins * 100.0 / count,
+        "expectancy": _window_sums(pnls, window) / count,
+        "window": window,
+        "days": int(days),
+    }
+    if risks is None:
+        out["avg_r"] = np.full(n, np.nan)
+    else:
+        risks = np.asarray(risks, dtype=np.float64)
+        ok = np.isfinite(risks) & (risks > 0)
+        r = np.where(ok, pnls / np.where(ok, risks, 1.0), 0.0)
+        r_count = _window_sums(ok.astype(np.int64), window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["avg_r"] = np.where(r_count > 0, _window_sums(r, window) / np.maximum(r_count, 1), np.nan)
+    secs = _seconds(keys)
+    start = np.searchsorted(secs, secs - int(days) * 86400, side="right")
+    c = np.concatenate(([0.0], np.cumsum(pnls)))
+    out["pnl_days"] = c[1:] - c[start]
+    return out
+
+
+def wallet_rolling(ds, wallet_id: Optional[str], window: int = WINDOW, days: int = DAYS) -> Dict[str, object]:
+    """rolling_metrics dos fechados da carteira (inclui o arquivo frio), em cache por versão dos dados."""
+    version = ds.data_version(wallet_id)  # antes de ler as colunas
+
+    def build():
+        import numpy as np
+        from columnar import BAD_SECONDS
+        keys, cols = ds.columns.closed_series(wallet_id, ("pnl_abs", "risk_amount", "closed_at_s", "created_at_s"))
+        # a mesma chave da ordem (fecho, ou criação), já em segundos: sem ler datas em texto
+        secs = np.where(cols["closed_at_s"] != BAD_SECONDS, cols["closed_at_s"], cols["created_at_s"])
+        m = rolling_metrics(secs, cols["pnl_abs"], cols["risk_amount"], window, days)
+        m["keys"] = keys
+        return m
+    return ds.artifacts.get("rolling_metrics", (wallet_id, int(window), int(days)), version, build)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Pesquisa de texto na razão dos trades (Trade.reason) com índice invertido.
+
+    ids = ds.reason_index.search("diverg rsi")     # set de ids (None = consulta vazia)
+    reports.filter_trades(trades, reason="fomc", index=ds.reason_index)
+
+- Texto normalizado por fold(): minúsculas e sem acentos ("Divergência" e
+  "divergencia" são a mesma palavra); palavras = sequências alfanuméricas.
+- Consulta: todas as palavras têm de aparecer, cada uma como prefixo de uma
+  palavra da razão ("break fo" encontra "breakout FOMC"). O prefixo resolve-se
+  por bisect no vocabulário ordenado.
+- O índice cobre os trades do DataStore e os do arquivo frio (archive.py);
+  é construído na primeira pesquisa e depois mantido pelos eventos do
+  DataStore (TradeAdded/Edited/Closed/Deleted); alterações em bloco
+  (CollectionChanged de trades/arquivo) marcam-no para reconstruir.
+- Persistido em reason_index.json ao lado dos dados, com as assinaturas de
+  trades.json/archive.json de quando foi gravado (storage.file_signature:
+  versão do lock, mtime, tamanho): se ainda coincidirem ao abrir, é lido em
+  vez de reconstruído. Grava-se depois de cada reconstrução
+  e à saída do processo, se tiver mudado.
+"""
+import re
+import atexit
+import bisect
+import threading
+import unicodedata
+import weakref
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from events import TRADE_EVENTS, CollectionChanged, TradeDeleted
+import metrics
+import perf
+
+INDEX_FILE = "reason_index.json"
+
+_WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Minúsculas sem acentos/cedilhas ("Ação" -> "acao")."""
+    s = unicodedata.normalize("NFKD", (text or "").casefold())
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=65536)
+def tokens(text: str) -> Tuple[str, ...]:
+    """Palavras distintas (normalizadas) de um texto, pela ordem em que aparecem."""
+    return tuple(dict.fromkeys(_WORD.findall(fold(text))))
+
+
+def matches(text: str, terms: Iterable[str]) -> bool:
+    """Mesma regra do índice, para um só texto: cada termo é prefixo de alguma palavra."""
+    words = tokens(text or "")
+    return all(any(w.startswith(term) for w in words) for term in terms)
+
+
+class ReasonIndex:
+    """Índice invertido palavra -> ids dos trades, ligado a um DataStore."""
+
+    def __init__(self, ds, path: Optional[str] = None):
+        self._ds = weakref.ref(ds)
+        self.path = path
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[str]] = {}
+        self._docs: Dict[str, Tuple[str, ...]] = {}
+        self._vocab: List[str] = []      # palavras ordenadas (prefixos por bisect)
+        self._built = False
+        self._dirty = False              # alterações ainda não gravadas
+        self._disk_ok = True             # False depois de invalidate(): não reler reason_index.json
+        ds.events.subscribe(self._on_event, *TRADE_EVENTS, CollectionChanged, on_error=self.invalidate)
+        if path:
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    # ---------- manutenção ----------
+    def _add(self, tid: str, reason: str):
+        words = tokens(reason or "")
+        if not words:
+            return
+        self._docs[tid] = words
+        for w in words:
+            ids = self._postings.get(w)
+            if ids is None:
+                ids = self._postings[w] = set()
+                bisect.insort(self._vocab, w)
+            ids.add(tid)
+
+    def _remove(self, tid: str):
+        for w in self._docs.pop(tid, ()):
+            ids = self._postings.get(w)
+            if ids is not None:
+                ids.discard(tid)
+
+    def _on_event(self, e):
+        with self._lock:
+            if not self._built:
+                return
+            if isinstance(e, CollectionChanged):
+                if e.names & {"trades", "archive"}:
+                    self._built = False  # reconstrói na próxima pesquisa
+                return
+            if isinstance(e, TradeDeleted):
+                self._remove(e.trade.id)
+            else:
+                t = getattr(e, "new", None) or e.trade
+                if self._docs.get(t.id) == tokens(t.reason or ""):
+                    return
+                self._remove(t.id)
+                self._add(t.id, t.reason)
+            self._dirty = True
+
+    def _versions(self, ds) -> Dict[str, List[int]]:
+        # assinatura inteira (storage.file_signature), como columnar: apanha reescritas sem lock
+        return {"trades": list(ds.known_signature(ds.trades_file)),
+                "archive": list(ds.known_signature(ds.archive_file))}
+
+    @perf.timed("search.build")
+    def rebuild(self):
+        ds = self._ds()
+        if ds is None:
+            return
+        with self._lock:
+            self._postings, self._docs, self._vocab = {}, {}, []
+            for t in ds.history_trades():
+                self._add(t.id, t.reason)
+            self._vocab = sorted(w for w, ids in self._postings.items() if ids)
+            self._built = True
+            self._dirty = True
+            self._disk_ok = True
+        self.flush()
+
+    def _load(self, ds) -> bool:
+        if not self.path:
+            return False
+        from storage import load_json
+        raw = load_json(self.path, None)
+        if not isinstance(raw, dict) or raw.get("versions") != self._versions(ds):
+            return False
+        docs = raw.get("docs")
+        if not isinstance(docs, dict):
+            return False
+        postings: Dict[str, Set[str]] = {}
+        self._docs = {}
+        for tid, text in docs.items():
+            words = tuple(text.split())  # já normalizadas: sem fold()
+            self._docs[tid] = words
+            for w in words:
+                ids = postings.get(w)
+                if ids is None:
+                    ids = postings[w] = set()
+                ids.add(tid)
+        self._postings = postings
+        self._vocab = sorted(postings)
+        return True
+
+    def invalidate(self):
+        """Descarta o índice (ex.: um evento falhou a meio): reconstrói na próxima pesquisa, sem reler o ficheiro."""
+        with self._lock:
+            self._built, self._dirty, self._disk_ok = False, False, False
+
+    def ensure(self):
+        """Constrói (ou lê do disco) se ainda não estiver pronto."""
+        with self._lock:
+            if self._built:
+                return
+            ds = self._ds()
+            if ds is not None and self._disk_ok and self._load(ds):
+                self._built, self._dirty = True, False
+                metrics.cache_result("reason_index", True)
+                return
+        metrics.cache_result("reason_index", False)
+        self.rebuild()
+
+    def flush(self):
+        """Grava o índice (se mudou desde a última gravação)."""
+        ds = self._ds()
+        if not self.path or ds is None:
+            return
+        with self._lock:
+            if not (self._built and self._dirty):
+                return
+            payload = {"versions": self._versions(ds),
+                       "docs": {tid: " ".join(words) for tid, words in self._docs.items()}}
+            self._dirty = False
+        from storage import save_json
+        try:
+            save_json(self.path, payload, indent=None)
+        except Exception:
+            pass
+
+    # ---------- consulta ----------
+    def _prefix(self, term: str) -> Set[str]:
+        lo = bisect.bisect_left(self._vocab, term)
+        hi = bisect.bisect_left(self._vocab, term + "\uffff")
+        words = self._vocab[lo:hi]
+        if len(words) == 1:
+            return self._postings.get(words[0], set())
+        return set().union(*(self._postings.get(w, ()) for w in words))
+
+    @perf.timed("search.query")
+    def search(self, query: str) -> Optional[Set[str]]:
+        """Ids dos trades cuja razão tem todas as palavras da consulta (como prefixo); None se a consulta é vazia."""
+        terms = tokens(query or "")
+        if not terms:
+            return None
+        self.ensure()
+        with self._lock:
+            result: Optional[Set[str]] = None
+            # termos mais longos primeiro: costumam ter listas mais curtas
+            for term in sorted(terms, key=len, reverse=True):
+                ids = self._prefix(term)
+                result = set(ids) if result is None else result & ids
+                if not result:
+                    break
+            return result
+
+    @property
+    def ready(self) -> bool:
+        """True se já está construído (pesquisar não vai ler/reconstruir)."""
+        return self._built
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+def _flush_at_exit(ref):
+    idx = ref()
+    if idx is not None:
+        idx.flush()
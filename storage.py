@@ -5,6 +5,11 @@ Paths seguros para dados/recursos + DataStore com leitura/escrita robusta.
 - DATA_DIR: %LOCALAPPDATA%/Tradeiros (ou equivalente), com fallback para pasta local.
 - Recursos (logo, ico, qss...) resolvidos compatíveis com PyInstaller (sys._MEIPASS).
 - save_json: escrita atómica para evitar ficheiros corrompidos.
+- FileLock: lock consultivo entre processos (<ficheiro>.lock), que guarda também
+  o contador de versão do ficheiro; o DataStore faz merge em vez de sobrescrever
+  quando outro processo escreveu entretanto.
+- Arquivo frio (archive.py): trades fechados antigos saem do trades.json para
+  ficheiros mensais comprimidos; saldos e estatísticas usam os resumos do índice.
 - BASE_DIR: compatibilidade p/ código antigo (aponta para a base de recursos).
 """
 
@@ -12,11 +17,28 @@ import os
 import sys
 import json
 import pathlib
-from dataclasses import asdict
-from typing import Dict, List
-from datetime import datetime
-
-from models import Wallet, Trade, symbols_default, migrate_trade_dict
+import threading
+import time
+from contextlib import contextmanager
+from types import MappingProxyType
+from dataclasses import dataclass, asdict, field, replace
+from typing import Dict, List, Optional, Iterable, Iterator, Set, Mapping, Tuple
+from datetime import datetime, timedelta
+
+try:  # POSIX
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+try:  # Windows
+    import msvcrt  # type: ignore
+except ImportError:
+    msvcrt = None
+
+from models import Wallet, Trade, symbols_default, migrate_trade_dict, pnl_value, wallet_current_balance, normalize_tags
+from events import EventBus, CollectionChanged, TradeDeleted, WalletChanged, TRADE_EVENTS, trade_event
+import perf
+import metrics
+import archive
 
 APP_NAME = "Tradeiros"
 APP_PUBLISHER = "TradeirosApp"  # usado pelo appdirs
@@ -52,7 +74,15 @@ def _user_data_dir() -> pathlib.Path:
     """
     Tenta usar AppData/Local (Windows) ou equivalente via appdirs.
     Fallback: pasta do executável (./data).
+    TRADEIROS_DATA_DIR tem prioridade (várias instâncias/ scripts na mesma pasta).
     """
+    # 0) override explícito
+    env = os.getenv("TRADEIROS_DATA_DIR")
+    if env:
+        p = pathlib.Path(env)
+        p.mkdir(parents=True, exist_ok=True)
+        return p
+
     # 1) tentar appdirs (recomendado)
     try:
         from appdirs import user_data_dir  # type: ignore
@@ -87,6 +117,7 @@ WALLETS_FILE  = str(DATA_DIR / "wallets.json")
 TRADES_FILE   = str(DATA_DIR / "trades.json")
 SYMBOLS_FILE  = str(DATA_DIR / "symbols.json")
 SETTINGS_FILE = str(DATA_DIR / "settings.json")
+ARCHIVE_FILE  = str(DATA_DIR / archive.INDEX_FILE)
 
 
 # ---------- IO ----------
@@ -100,14 +131,18 @@ def load_json(path: str, default):
     return default
 
 
-def save_json(path: str, obj) -> None:
+def save_json(path: str, obj, indent: Optional[int] = 2) -> None:
     """
     Escrita atómica: escreve para <path>.tmp e renomeia.
+    indent=None para ficheiros grandes que não são para ler à mão (caches).
     """
     tmp = f"{path}.tmp"
+    name = os.path.basename(path)
+    t0 = time.perf_counter()
     with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+        json.dump(obj, f, indent=indent, ensure_ascii=False)
         f.flush()
+        size = f.tell()
         try:
             os.fsync(f.fileno())
         except Exception:
@@ -121,61 +156,589 @@ def save_json(path: str, obj) -> None:
             except Exception:
                 pass
         os.rename(tmp, path)
+    metrics.SAVE_JSON_SECONDS.observe(time.perf_counter() - t0, file=name)
+    metrics.SAVE_JSON_BYTES.observe(size, file=name)
 
 
-# ---------- DataStore ----------
-class DataStore:
-    def __init__(self):
-        self.wallets: Dict[str, Wallet] = {}
-        self.trades: Dict[str, Trade] = {}
-        self.symbols: List[str] = []
-        self.settings: Dict[str, str] = {}
-        self.load_all()
+def _count_mutation(event) -> None:
+    metrics.TRADE_MUTATIONS.inc(event=type(event).__name__)
 
-    def load_all(self):
-        # carteiras
-        wl = load_json(WALLETS_FILE, [])
-        self.wallets = {}
-        for w in wl:
-            try:
-                self.wallets[w["id"]] = Wallet(**w)
-            except Exception:
-                pass
 
-        # trades (migração tolerante)
-        tl = load_json(TRADES_FILE, [])
-        self.trades = {}
-        for raw in tl:
+# ---------- lock entre processos + versão ----------
+class FileLock:
+    """
+    Lock consultivo em <path>.lock (fcntl em POSIX, msvcrt no Windows).
+    O próprio ficheiro .lock guarda a versão (inteiro) do ficheiro de dados:
+    cada escrita feita com o lock exclusivo incrementa-a.
+
+        with FileLock(TRADES_FILE) as lk:
+            v = lk.read_version()
+            ...
+            lk.write_version(v + 1)
+    """
+
+    def __init__(self, path: str, exclusive: bool = True):
+        self.path = f"{path}.lock"
+        self.exclusive = exclusive
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "FileLock":
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+            elif msvcrt is not None:
+                # msvcrt não tem lock partilhado: é sempre exclusivo (tenta ~10s)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        except Exception:
+            os.close(self._fd)
+            self._fd = None
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        return False
+
+    def read_version(self) -> int:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        try:
+            return int(os.read(self._fd, 32).decode("ascii").strip() or 0)
+        except Exception:
+            return 0
+
+    def write_version(self, version: int) -> None:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, str(int(version)).encode("ascii"))
+        try:
+            os.fsync(self._fd)
+        except Exception:
+            pass
+
+
+def file_stat(path: str) -> Tuple[int, int]:
+    """(mtime_ns, tamanho) de um ficheiro de dados, (0, 0) se não existe."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 0, 0
+    return st.st_mtime_ns, st.st_size
+
+
+def file_signature(path: str) -> Tuple[int, int, int]:
+    """
+    (versão do lock, mtime_ns, tamanho): a versão apanha as escritas com
+    FileLock, o mtime/tamanho as feitas por fora (scripts, restauros, edição à mão).
+    """
+    with FileLock(path, exclusive=False) as lk:
+        return (lk.read_version(), *file_stat(path))
+
+
+def _merge_keyed(disk: Dict[str, object], base: Dict[str, object], local: Dict[str, object]) -> Dict[str, object]:
+    """
+    Merge a 3 vias por id: parte do disco e aplica só o que mudou localmente
+    desde a última leitura (novos/alterados sobrepõem-se, apagados saem).
+    """
+    merged = dict(disk)
+    for k, v in local.items():
+        b = base.get(k)
+        if b is not v and b != v:
+            merged[k] = v
+    for k in base:
+        if k not in local:
+            merged.pop(k, None)
+    return merged
+
+
+def reset_all_data(paths: Optional[List[str]] = None) -> None:
+    """
+    Reset total: apaga os ficheiros de dados e repõe paridades/definições por omissão.
+    As versões são incrementadas, para que outras instâncias abertas façam merge
+    com o estado vazio em vez de reescreverem os dados antigos.
+    """
+    paths = paths or [WALLETS_FILE, TRADES_FILE, SYMBOLS_FILE, SETTINGS_FILE]
+    for path in paths:
+        with FileLock(path) as lk:
+            v = lk.read_version()
             try:
-                fixed = migrate_trade_dict(raw, self.wallets)
-                t = Trade(**fixed)
-                self.trades[t.id] = t
+                if os.path.exists(path):
+                    os.remove(path)
             except Exception:
                 pass
+            if path.endswith(archive.INDEX_FILE):
+                import shutil
+                shutil.rmtree(os.path.join(os.path.dirname(path), archive.ARCHIVE_DIR), ignore_errors=True)
+            elif path.endswith("symbols.json"):
+                save_json(path, symbols_default())
+            elif path.endswith("settings.json"):
+                save_json(path, {"theme": "dark"})
+            lk.write_version(v + 1)
 
-        # símbolos
-        sl = load_json(SYMBOLS_FILE, None)
-        if not sl or not isinstance(sl, list):
-            sl = symbols_default()
-            save_json(SYMBOLS_FILE, sl)
-        self.symbols = sorted(list({str(s).upper().strip() for s in sl if str(s).strip()}))
 
-        # settings
-        st = load_json(SETTINGS_FILE, {"theme": "dark"})
-        self.settings = st if isinstance(st, dict) else {"theme": "dark"}
+# ---------- DataStore ----------
+@dataclass(frozen=True)
+class StoreSnapshot:
+    """
+    Vista imutável e consistente dos dados num dado momento.
+    Os mapas são só de leitura e nunca são alterados depois de publicados;
+    versões sucessivas partilham os objetos Wallet/Trade que não mudaram.
+    archived: resumo por carteira dos trades no arquivo frio (archive.py),
+    publicado junto com os trades que saíram de `trades`.
+    """
+    version: int
+    wallets: Mapping[str, Wallet]
+    trades: Mapping[str, Trade]
+    symbols: Tuple[str, ...]
+    archived: Mapping[str, Mapping] = field(default_factory=lambda: MappingProxyType({}))
 
-    # saves
-    def save_wallets(self):
-        save_json(WALLETS_FILE, [asdict(w) for w in self.wallets.values()])
 
+def _parse_wallets(items) -> Dict[str, Wallet]:
+    out = {}
+    for w in items if isinstance(items, list) else []:
+        try:
+            out[w["id"]] = Wallet(**w)
+        except Exception:
+            pass
+    return out
+
+
+def _parse_trades(items, wallets: Mapping[str, Wallet]) -> Dict[str, Trade]:
+    # migração tolerante
+    out = {}
+    for raw in items if isinstance(items, list) else []:
+        try:
+            fixed = migrate_trade_dict(raw, wallets)
+            t = Trade(**fixed)
+            out[t.id] = t
+        except Exception:
+            pass
+    return out
+
+
+class DataStore:
+    """
+    Carteiras, trades, paridades e definições, com persistência em JSON.
+
+    Copy-on-write: os dados publicados vivem num StoreSnapshot imutável
+    (ds.snapshot()); ds.wallets / ds.trades / ds.symbols são vistas só de leitura
+    do snapshot atual. Cada mutação constrói mapas novos (partilhando os objetos
+    que não mudaram) e troca o snapshot numa só atribuição, por isso leitores
+    noutras threads nunca veem um estado a meio. Os Trade/Wallet publicados não
+    devem ser alterados in place: usar dataclasses.replace + update_trade /
+    update_wallet, ou edit_trade / close_trade.
+
+    Cada mutação emite um evento em ds.events (ver events.py) depois de publicar
+    o snapshot novo e gravar o ficheiro.
+
+    data_version(wallet_id) dá uma versão que só sobe (global, ou a última
+    alteração que tocou essa carteira): chave de ds.artifacts (artifacts.py).
+    """
+
+    def __init__(self, data_dir: Optional[str] = None):
+        base = pathlib.Path(data_dir) if data_dir else DATA_DIR
+        base.mkdir(parents=True, exist_ok=True)
+        self.data_dir = str(base)
+        self.wallets_file = str(base / "wallets.json")
+        self.trades_file = str(base / "trades.json")
+        self.symbols_file = str(base / "symbols.json")
+        self.settings_file = str(base / "settings.json")
+        self.archive_file = str(base / archive.INDEX_FILE)
+        self.archive_dir = str(base / archive.ARCHIVE_DIR)
+
+        self._snap = StoreSnapshot(0, MappingProxyType({}), MappingProxyType({}), ())
+        self._write_lock = threading.RLock()  # serializa escritores deste processo
+        self.settings: Dict[str, str] = {}
+        # por ficheiro: assinatura lida (file_signature) e último estado conhecido (base do merge a 3 vias)
+        self._signatures: Dict[str, Tuple[int, int, int]] = {}
+        self._base: Dict[str, object] = {}
+        self._batch_depth = 0          # batch(): saves adiados até ao fim do bloco exterior
+        self._batch_dirty: Set[str] = set()
+        self._archive_index = archive.normalize_index(None)
+        self._archive_reader = archive.ArchiveReader(self.archive_dir)
+        self._reason_index = None
+        self._facets = None
+        self._columns = None
+        self._artifacts = None
+        self._wallet_versions: Dict[str, int] = {}  # carteira -> versão do snapshot da última alteração
+        self._bulk_version = 0                      # última alteração em bloco (conta para todas)
+        self.events = EventBus()
+        self.events.subscribe(_count_mutation, *TRADE_EVENTS)
+        self.events.subscribe(self._bump_versions, *TRADE_EVENTS, WalletChanged, CollectionChanged,
+                              on_error=self._bump_all)
+        for path in (self.wallets_file, self.trades_file, self.symbols_file, self.settings_file, self.archive_file):
+            metrics.watch_file_size(path)
+        self.load_all()
+
+    # ---------- snapshots ----------
+    def snapshot(self) -> StoreSnapshot:
+        return self._snap
+
+    @property
+    def version(self) -> int:
+        return self._snap.version
+
+    def _bump_versions(self, e):
+        # os eventos chegam já com o snapshot novo publicado: a versão dele serve
+        v = self._snap.version
+        if isinstance(e, CollectionChanged):
+            if e.names & {"trades", "wallets", "archive"}:
+                self._bulk_version = v
+            return
+        ids = {e.wallet_id}
+        old = getattr(e, "old", None)
+        if old is not None:
+            ids.add(old.wallet_id)  # trade mudado de carteira conta para as duas
+        if None in ids:
+            self._bulk_version = v
+            return
+        for wid in ids:
+            self._wallet_versions[wid] = v
+
+    def _bump_all(self):
+        # _bump_versions falhou: todas as carteiras contam como alteradas (ds.artifacts recalcula)
+        self._bulk_version = self._snap.version
+
+    def data_version(self, wallet_id: Optional[str] = None) -> int:
+        """
+        Versão dos dados (só sobe): global, ou de uma carteira (trades, arquivo e a
+        própria carteira). Ler antes do snapshot de que se deriva o artefacto.
+        """
+        if wallet_id is None:
+            return self._snap.version
+        return max(self._wallet_versions.get(wallet_id, 0), self._bulk_version)
+
+    @property
+    def artifacts(self):
+        """Cache LRU de artefactos derivados por versão dos dados (artifacts.py), criada na primeira utilização."""
+        if self._artifacts is None:
+            import artifacts
+            self._artifacts = artifacts.ArtifactCache()
+        return self._artifacts
+
+    @property
+    def wallets(self) -> Mapping[str, Wallet]:
+        return self._snap.wallets
+
+    @property
+    def trades(self) -> Mapping[str, Trade]:
+        return self._snap.trades
+
+    @property
+    def reason_index(self):
+        """Índice de pesquisa na razão dos trades (search.py), criado na primeira utilização."""
+        if self._reason_index is None:
+            import search
+            self._reason_index = search.ReasonIndex(self, os.path.join(self.data_dir, search.INDEX_FILE))
+        return self._reason_index
+
+    @property
+    def facets(self):
+        """Bitmaps por faceta/tag para filtros combinados (facets.py), criados na primeira utilização."""
+        if self._facets is None:
+            import facets
+            self._facets = facets.FacetIndex(self)
+        return self._facets
+
+    @property
+    def columns(self):
+        """Vista em colunas numpy (columnar.py) para consultas (query.py), tabelas, KPIs e gráficos; mapeada do disco ou criada na primeira utilização."""
+        if self._columns is None:
+            import columnar
+            self._columns = columnar.ColumnarView(self, os.path.join(self.data_dir, columnar.CACHE_DIR))
+        return self._columns
+
+    @property
+    def symbols(self) -> Tuple[str, ...]:
+        return self._snap.symbols
+
+    @symbols.setter
+    def symbols(self, values):
+        self._publish(symbols=values)
+
+    def _publish(self, wallets=None, trades=None, symbols=None, archived=None) -> StoreSnapshot:
+        cur = self._snap
+        self._snap = StoreSnapshot(
+            version=cur.version + 1,
+            wallets=cur.wallets if wallets is None else MappingProxyType(wallets),
+            trades=cur.trades if trades is None else MappingProxyType(trades),
+            symbols=cur.symbols if symbols is None else tuple(symbols),
+            archived=cur.archived if archived is None else MappingProxyType(archived),
+        )
+        return self._snap
+
+    # ---------- IO com lock/versão ----------
+    def _read(self, path: str, default):
+        with perf.span("storage.read " + os.path.basename(path)), FileLock(path, exclusive=False) as lk:
+            # stat antes de ler: uma escrita de fora pelo meio só causa um reload a mais
+            signature = (lk.read_version(), *file_stat(path))
+            data = load_json(path, default)
+            self._signatures[path] = signature
+        return data
+
+    def _write(self, path: str, local, merge, serialize):
+        """
+        Escreve `local` com lock exclusivo. Se o ficheiro mudou desde a nossa
+        última leitura/escrita (outra assinatura: outro processo, com ou sem
+        lock), grava merge(disco, base, local) em vez de sobrescrever.
+        Devolve (estado gravado, houve_conflito).
+        """
+        with perf.span("storage.write " + os.path.basename(path)), FileLock(path) as lk:
+            version = lk.read_version()
+            conflict = (version, *file_stat(path)) != self.known_signature(path)
+            state = merge(load_json(path, None), self._base.get(path), local) if conflict else local
+            save_json(path, serialize(state))
+            lk.write_version(version + 1)
+            self._signatures[path] = (version + 1, *file_stat(path))
+        self._base[path] = state
+        if conflict:
+            metrics.WRITE_CONFLICTS.inc(file=os.path.basename(path))
+        return state, conflict
+
+    @perf.timed("storage.load_all")
+    def load_all(self):
+        with metrics.LOAD_ALL_SECONDS.time():
+            self.load_wallets()
+            self.load_trades()
+            self.load_symbols()
+            self.load_settings()
+            self.load_archive()
+
+    def load_wallets(self):
+        with self._write_lock:
+            wallets = _parse_wallets(self._read(self.wallets_file, []))
+            self._base[self.wallets_file] = wallets
+            self._publish(wallets=wallets)
+        self.events.emit(CollectionChanged(frozenset({"wallets"})))
+
+    @perf.timed("storage.load_trades")
+    def load_trades(self):
+        with self._write_lock:
+            trades = _parse_trades(self._read(self.trades_file, []), self.wallets)
+            self._base[self.trades_file] = trades
+            self._publish(trades=trades)
+        self.events.emit(CollectionChanged(frozenset({"trades"})))
+
+    def load_symbols(self):
+        with self._write_lock:
+            sl = self._read(self.symbols_file, None)
+            if not sl or not isinstance(sl, list):
+                self._base[self.symbols_file] = []
+                self._publish(symbols=symbols_default())
+                self.save_symbols()
+                sl = list(self.symbols)
+            else:
+                self._base[self.symbols_file] = sl
+            self._publish(symbols=sorted({str(s).upper().strip() for s in sl if str(s).strip()}))
+        self.events.emit(CollectionChanged(frozenset({"symbols"})))
+
+    def load_settings(self):
+        st = self._read(self.settings_file, {"theme": "dark"})
+        self.settings = st if isinstance(st, dict) else {"theme": "dark"}
+        self._base[self.settings_file] = dict(self.settings)
+        perf.configure(self.settings)
+        self.events.emit(CollectionChanged(frozenset({"settings"})))
+
+    def load_archive(self):
+        names = {"archive"}
+        with self._write_lock:
+            index = archive.normalize_index(self._read(self.archive_file, None))
+            self._archive_index = index
+            self._publish(archived=archive.wallet_summaries(index))
+            stale = {tid for tid in index["pending"] if tid in self._snap.trades}
+            if stale:
+                # arquivamento interrompido depois de gravar o índice: acabar de os tirar do trades.json
+                self._publish(trades={k: t for k, t in self._snap.trades.items() if k not in stale})
+                self.save_trades()
+                with FileLock(self.archive_file) as lk:
+                    index = archive.normalize_index(load_json(self.archive_file, None))
+                    if index["pending"]:
+                        index["pending"] = []
+                        self._write_archive_index(lk, index)
+                names.add("trades")
+        self.events.emit(CollectionChanged(frozenset(names)))
+
+    # ---------- recarregar só o que mudou no disco ----------
+    def collection_files(self) -> Dict[str, str]:
+        return {
+            "wallets": self.wallets_file,
+            "trades": self.trades_file,
+            "symbols": self.symbols_file,
+            "settings": self.settings_file,
+            "archive": self.archive_file,
+        }
+
+    def known_signature(self, path: str) -> Tuple[int, int, int]:
+        """file_signature do ficheiro na última leitura/escrita deste DataStore ((0, 0, 0) se nenhuma)."""
+        return self._signatures.get(path, (0, 0, 0))
+
+    def changed_on_disk(self, names: Optional[Iterable[str]] = None) -> Set[str]:
+        """Coleções cuja assinatura em disco difere da nossa (escritas de outro processo, com ou sem lock)."""
+        files = self.collection_files()
+        out = set()
+        for name in (names if names is not None else files):
+            path = files.get(name)
+            if path and file_signature(path) != self.known_signature(path):
+                out.add(name)
+            metrics.cache_result("disk_snapshot", name not in out)
+        return out
+
+    def reload(self, names: Iterable[str]):
+        """Recarrega só as coleções indicadas (as carteiras primeiro: os trades dependem delas)."""
+        names = set(names)
+        for name in ("wallets", "trades", "symbols", "settings", "archive"):
+            if name in names:
+                getattr(self, f"load_{name}")()
+
+    # ---------- escritas agrupadas ----------
+    @contextmanager
+    def batch(self, rollback: bool = False):
+        """
+        Agrupa várias mutações numa só escrita por ficheiro:
+
+            with ds.batch():
+                for t in novos: ds.add_trade(t)
+
+        Dentro do bloco o snapshot é publicado e os eventos emitidos a cada
+        mutação como de costume, mas os save_* só marcam a coleção; cada
+        ficheiro alterado é gravado uma vez à saída do bloco exterior.
+        Segura o lock de escrita durante o bloco: manter os blocos curtos.
+        rollback=True: se a gravação falhar, repõe o snapshot de antes do bloco
+        (restore) ainda com o lock, e a exceção segue.
+        """
+        with self._write_lock:
+            before = self._snap if self._batch_depth == 0 else None
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._batch_dirty:
+                    dirty, self._batch_dirty = self._batch_dirty, set()
+                    try:
+                        for name in ("wallets", "trades", "symbols", "settings"):
+                            if name in dirty:
+                                getattr(self, f"save_{name}")()
+                    except Exception:
+                        if rollback:
+                            self.restore(before)
+                        raise
+
+    def restore(self, snap: StoreSnapshot):
+        """
+        Volta a publicar carteiras, trades e paridades de um snapshot anterior
+        (ex.: um batch() cuja gravação falhou: nada dele fica visível). Os
+        índices recebem CollectionChanged e reconstroem-se.
+        """
+        with self._write_lock:
+            self._publish(wallets=dict(snap.wallets), trades=dict(snap.trades), symbols=snap.symbols)
+        self.events.emit(CollectionChanged(frozenset({"wallets", "trades", "symbols"})))
+
+    @contextmanager
+    def idle(self):
+        """
+        Tenta segurar o lock de escrita sem esperar. Dá True se nenhuma mutação
+        ou batch() está a meio (o estado publicado é o gravado; índices e caches
+        podem ser lidos) e segura-o até ao fim do bloco; False se está ocupado.
+        """
+        got = self._write_lock.acquire(blocking=False)
+        try:
+            yield got
+        finally:
+            if got:
+                self._write_lock.release()
+
+    def _deferred(self, name: str) -> bool:
+        """Dentro de batch(): marca a coleção para gravar no fim em vez de gravar já."""
+        if self._batch_depth:
+            self._batch_dirty.add(name)
+            return True
+        return False
+
+    # saves (merge com alterações de outros processos em vez de as perder)
+    def save_wallets(self):
+        with self._write_lock:
+            if self._deferred("wallets"):
+                return
+            local = self._snap.wallets
+            state, conflict = self._write(
+                self.wallets_file, dict(local),
+                lambda disk, base, loc: _merge_keyed(_parse_wallets(disk), base or {}, loc),
+                lambda st: [asdict(w) for w in st.values()],
+            )
+            if conflict:
+                self._publish(wallets=state)
+                self.events.emit(CollectionChanged(frozenset({"wallets"})))
+
+    @perf.timed("storage.save_trades")
     def save_trades(self):
-        save_json(TRADES_FILE, [asdict(t) for t in self.trades.values()])
+        with self._write_lock:
+            if self._deferred("trades"):
+                return
+            local = self._snap.trades
+            state, conflict = self._write(
+                self.trades_file, dict(local),
+                # sem migrar wallet_id: as carteiras em memória podem não ter as de outro processo
+                lambda disk, base, loc: _merge_keyed(_parse_trades(disk, {}), base or {}, loc),
+                lambda st: [dict(vars(t)) for t in st.values()],  # campos simples: ~30x mais rápido que asdict
+            )
+            if conflict:
+                self._publish(trades=state)
+                self.events.emit(CollectionChanged(frozenset({"trades"})))
 
     def save_symbols(self):
-        save_json(SYMBOLS_FILE, sorted(list({s.upper() for s in self.symbols})))
+        def merge(disk, base, loc):
+            disk, base = set(disk or []), set(base or [])
+            return sorted((disk - (base - set(loc))) | (set(loc) - base))
+        with self._write_lock:
+            if self._deferred("symbols"):
+                return
+            local = sorted({s.upper() for s in self.symbols})
+            state, conflict = self._write(self.symbols_file, local, merge, list)
+            if conflict:
+                self._publish(symbols=state)
+                self.events.emit(CollectionChanged(frozenset({"symbols"})))
 
     def save_settings(self):
-        save_json(SETTINGS_FILE, self.settings)
+        def merge(disk, base, loc):
+            disk = disk if isinstance(disk, dict) else {}
+            base = base or {}
+            out = dict(disk)
+            for k, v in loc.items():
+                if base.get(k) != v:
+                    out[k] = v
+            for k in base:
+                if k not in loc:
+                    out.pop(k, None)
+            return out
+        with self._write_lock:
+            if self._deferred("settings"):
+                return
+            state, conflict = self._write(self.settings_file, dict(self.settings), merge, dict)
+            if conflict:
+                self.settings = dict(state)
+                self.events.emit(CollectionChanged(frozenset({"settings"})))
+
+    # paridades
+    def add_symbol(self, symbol: str) -> bool:
+        """Acrescenta uma paridade; devolve False se já existia."""
+        sym = (symbol or "").strip().upper()
+        with self._write_lock:
+            if not sym or sym in self.symbols:
+                return False
+            self._publish(symbols=sorted(set(self.symbols) | {sym}))
+            self.save_symbols()
+        self.events.emit(CollectionChanged(frozenset({"symbols"})))
+        return True
 
     # carteiras
     def add_wallet(self, name: str, init_bal: float, risk_pct: float) -> Wallet:
@@ -187,30 +750,271 @@ class DataStore:
             risk_percent=float(risk_pct),
             created_at=datetime.now().isoformat(timespec='seconds')
         )
-        self.wallets[w.id] = w
-        self.save_wallets()
+        self.update_wallet(w)
         return w
 
     def update_wallet(self, wallet: Wallet):
-        self.wallets[wallet.id] = wallet
-        self.save_wallets()
+        with self._write_lock:
+            wallets = dict(self._snap.wallets)
+            wallets[wallet.id] = wallet
+            self._publish(wallets=wallets)
+            self.save_wallets()
+        self.events.emit(WalletChanged(wallet.id, wallet))
+
+    def delete_wallet(self, wallet_id: str):
+        """Apaga a carteira e todos os seus trades."""
+        with self._write_lock:
+            if wallet_id not in self._snap.wallets:
+                return
+            trades = {k: t for k, t in self._snap.trades.items() if t.wallet_id != wallet_id}
+            wallets = dict(self._snap.wallets)
+            del wallets[wallet_id]
+            self._publish(trades=trades)
+            self.save_trades()
+            self._publish(wallets=wallets)
+            self.save_wallets()
+        self.events.emit(WalletChanged(wallet_id, None))
 
     def get_wallets(self) -> List[Wallet]:
         return list(self.wallets.values())
 
     # trades
     def add_trade(self, t: Trade):
-        self.trades[t.id] = t
-        self.save_trades()
+        self.update_trade(t)
 
     def update_trade(self, t: Trade):
-        self.trades[t.id] = t
-        self.save_trades()
+        with self._write_lock:
+            trades = dict(self._snap.trades)
+            old = trades.get(t.id)
+            trades[t.id] = t
+            self._publish(trades=trades)
+            self.save_trades()
+        self.events.emit(trade_event(old, t))
 
     def delete_trade(self, trade_id: str):
-        if trade_id in self.trades:
-            del self.trades[trade_id]
+        with self._write_lock:
+            if trade_id not in self._snap.trades:
+                return
+            trades = dict(self._snap.trades)
+            old = trades.pop(trade_id)
+            self._publish(trades=trades)
+            self.save_trades()
+        self.events.emit(TradeDeleted(old))
+
+    def wallet_balance(self, wallet_id: str, snap: Optional[StoreSnapshot] = None) -> float:
+        snap = snap or self._snap
+        w = snap.wallets.get(wallet_id)
+        if not w:
+            return 0.0
+        archived = snap.archived.get(wallet_id)
+        base = w.initial_balance + (archived["pnl_total"] if archived else 0.0)
+        return wallet_current_balance([t for t in snap.trades.values() if t.wallet_id == wallet_id], base)
+
+    def edit_trade(self, trade_id: str, entry: float, sl: float, tp: float, size: float) -> Optional[Trade]:
+        """Altera preços/quantidade de um trade (nova versão do objeto) e recalcula o risco."""
+        with self._write_lock:
+            t = self._snap.trades.get(trade_id)
+            if not t:
+                return None
+            entry_price, stop_loss = round(entry, 2), round(sl, 2)
+            size = float(size)
+            risk_amount = abs(entry_price - stop_loss) * size
+            bal = self.wallet_balance(t.wallet_id)
+            new = replace(
+                t, entry_price=entry_price, stop_loss=stop_loss, take_profit=round(tp, 2),
+                position_size=size, position_value=round(entry_price * size, 2),
+                risk_amount=risk_amount,
+                risk_pct_of_balance=(risk_amount / bal * 100.0) if bal > 0 else 0.0,
+            )
+            self.update_trade(new)
+            return new
+
+    def close_trade(self, trade_id: str, price: float, reason: str) -> Optional[Trade]:
+        """Fecha o trade ao preço indicado ("TP" | "SL" | "Manual") e devolve a versão fechada."""
+        with self._write_lock:
+            t = self._snap.trades.get(trade_id)
+            if not t:
+                return None
+            exit_price = round(price, 2)
+            pnl = pnl_value(t.direction, t.entry_price, exit_price, t.position_size)
+            bal = self.wallet_balance(t.wallet_id)
+            new = replace(
+                t, exit_price=exit_price, closed_at=datetime.now().isoformat(timespec='seconds'),
+                status="Closed", close_reason=reason, pnl_abs=pnl,
+                pnl_pct=(pnl / bal * 100.0) if bal > 0 else None,
+                result="Gain" if pnl > 0 else ("Loss" if pnl < 0 else "Break-even"),
+            )
+            self.update_trade(new)
+            return new
+
+    def set_tags(self, trade_id: str, tags) -> Optional[Trade]:
+        """Substitui as tags de um trade (lista ou "a, b"; normalizadas por models.normalize_tags)."""
+        with self._write_lock:
+            t = self._snap.trades.get(trade_id)
+            if not t:
+                return None
+            tags = normalize_tags(tags)
+            if tags == list(t.tags or ()):
+                return t
+            new = replace(t, tags=tags)
+            self.update_trade(new)
+            return new
+
+    def import_trades(self, items, overwrite: bool = False) -> Dict[str, int]:
+        """
+        Importa trades (dicts no esquema de trades.json) numa só escrita.
+        Ids já existentes são ignorados, a não ser com overwrite=True.
+        `items` pode ser qualquer iterável (ex.: transfer.iter_import); None
+        conta como linha ignorada.
+        """
+        added = replaced = skipped = 0
+        with self._write_lock:
+            trades = dict(self._snap.trades)
+            for raw in items if not isinstance(items, (dict, str, bytes)) else []:
+                try:
+                    t = Trade(**migrate_trade_dict(raw, self.wallets))
+                except Exception:
+                    skipped += 1
+                    continue
+                if t.id in trades:
+                    if not overwrite:
+                        skipped += 1
+                        continue
+                    replaced += 1
+                else:
+                    added += 1
+                trades[t.id] = t
+            if added or replaced:
+                self._publish(trades=trades)
+                self.save_trades()
+        if added or replaced:
+            metrics.TRADE_MUTATIONS.inc(added + replaced, event="Imported")
+            self.events.emit(CollectionChanged(frozenset({"trades"})))
+        return {"added": added, "replaced": replaced, "skipped": skipped}
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Reescreve todos os ficheiros já normalizados/migrados (campos em falta,
+        paridades duplicadas) e apaga restos de escritas interrompidas (<f>.tmp).
+        Devolve bytes antes/depois.
+        """
+        files = list(self.collection_files().values())
+        before = sum(os.path.getsize(p) for p in files if os.path.exists(p))
+        removed_tmp = 0
+        for p in files:
+            if os.path.exists(f"{p}.tmp"):
+                try:
+                    os.remove(f"{p}.tmp")
+                    removed_tmp += 1
+                except Exception:
+                    pass
+        with self._write_lock:
+            self.save_wallets()
             self.save_trades()
+            self.save_symbols()
+            self.save_settings()
+        after = sum(os.path.getsize(p) for p in files if os.path.exists(p))
+        return {"bytes_before": before, "bytes_after": after, "tmp_removed": removed_tmp}
 
     def trades_for_wallet(self, wallet_id: str) -> List[Trade]:
         return [t for t in self.trades.values() if t.wallet_id == wallet_id]
+
+    # ---------- arquivo frio (archive.py) ----------
+    def _write_archive_index(self, lk: FileLock, index: dict):
+        """Grava o índice do arquivo; chamar com o FileLock exclusivo de archive.json."""
+        save_json(self.archive_file, index)
+        version = lk.read_version() + 1
+        lk.write_version(version)
+        self._signatures[self.archive_file] = (version, *file_stat(self.archive_file))
+        self._archive_index = index
+
+    def archive_after_days(self) -> int:
+        try:
+            return max(0, int(self.settings.get(archive.SETTING) or archive.DEFAULT_DAYS))
+        except (TypeError, ValueError):
+            return archive.DEFAULT_DAYS
+
+    def archive_closed(self, older_than_days: Optional[int] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Move para o arquivo frio os trades fechados há mais de N dias (omissão:
+        setting archive_after_days). Ordem das escritas: ficheiros do mês,
+        índice com os ids em "pending", trades.json, índice sem "pending".
+        Devolve {"archived": nº de trades, "periods": nº de meses tocados}.
+        Não pode correr dentro de batch(): o trades.json tem de estar gravado
+        antes de o índice largar "pending" (RuntimeError).
+        """
+        days = self.archive_after_days() if older_than_days is None else max(0, int(older_than_days))
+        cutoff = ((now or datetime.now()) - timedelta(days=days)).isoformat(timespec="seconds")
+        with self._write_lock, FileLock(self.archive_file) as lk:
+            # com o lock, _batch_depth só pode ser de um batch() desta thread
+            if self._batch_depth:
+                raise RuntimeError("archive_closed() não pode correr dentro de ds.batch()")
+            by_period: Dict[str, List[Trade]] = {}
+            for t in self._snap.trades.values():
+                if t.status == "Closed" and (t.closed_at or t.created_at or "") < cutoff:
+                    period = archive.period_of(t)
+                    if period:
+                        by_period.setdefault(period, []).append(t)
+            if not by_period:
+                return {"archived": 0, "periods": 0}
+            index = archive.normalize_index(load_json(self.archive_file, None))
+            # outro processo pode já ter arquivado alguns (o nosso snapshot ainda os tem)
+            done = self._archive_reader.ids(index, by_period)
+            ids = set()
+            for period, ts in sorted(by_period.items()):
+                new = [t for t in ts if t.id not in done]
+                if new:
+                    archive.append_period(self.archive_dir, index, period, new)
+                ids.update(t.id for t in ts)
+            index["pending"] = sorted(ids)
+            self._write_archive_index(lk, index)
+            self._publish(trades={k: t for k, t in self._snap.trades.items() if k not in ids},
+                          archived=archive.wallet_summaries(index))
+            self.save_trades()
+            index["pending"] = []
+            self._write_archive_index(lk, index)
+        self.events.emit(CollectionChanged(frozenset({"trades", "archive"})))
+        return {"archived": len(ids), "periods": len(by_period)}
+
+    def archive_info(self) -> Dict[str, int]:
+        """Meses, trades e bytes comprimidos no arquivo (só o índice; nada é descomprimido)."""
+        periods = self._archive_index["periods"]
+        return {"periods": len(periods),
+                "trades": sum(int(e.get("count") or 0) for e in periods.values()),
+                "bytes": sum(int(e.get("bytes") or 0) for e in periods.values())}
+
+    def history_trades(self, snap: Optional[StoreSnapshot] = None, wallet_id: Optional[str] = None,
+                       date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Trade]:
+        """
+        Trades do snapshot + arquivados que podem passar nos filtros (carteira,
+        datas de criação 'YYYY-MM-DD'): fonte para reports.filter_trades no
+        histórico, gráficos e exportação. Só descomprime os meses do arquivo
+        que podem ter resultados.
+        """
+        snap = snap or self._snap
+        hot = snap.trades
+        out = [t for t in self._archive_reader.trades(self._archive_index, wallet_id, date_from, date_to)
+               if t.id not in hot and t.wallet_id in snap.wallets]
+        out.extend(hot.values() if wallet_id is None else (t for t in hot.values() if t.wallet_id == wallet_id))
+        return out
+
+    def iter_history(self, snap: Optional[StoreSnapshot] = None, wallet_id: Optional[str] = None,
+                     date_from: Optional[str] = None, date_to: Optional[str] = None) -> Iterator[Trade]:
+        """
+        Os trades de history_trades um a um: meses do arquivo por ordem, lidos
+        do disco sem passar pela cache do arquivo, e depois os do snapshot.
+        Memória constante para exportações grandes (ver transfer.py).
+        """
+        snap = snap or self._snap
+        hot = snap.trades
+        index = self._archive_index
+        for period in sorted(index.get("periods", {})):
+            entry = index["periods"][period]
+            if not archive.may_match(entry, wallet_id, date_from, date_to):
+                continue
+            for t in archive.iter_period(os.path.join(self.archive_dir, entry["file"]), int(entry.get("bytes") or 0)):
+                if t.id not in hot and t.wallet_id in snap.wallets and (wallet_id is None or t.wallet_id == wallet_id):
+                    yield t
+        for t in list(hot.values()):
+            if wallet_id is None or t.wallet_id == wallet_id:
+                yield t
@@ -2,20 +2,29 @@
 # Tradeiros — Streamlit v12 (fix stay-on-tab + per-tab alerts + charts lado a lado)
 
 import os, sys, io
-from datetime import datetime
+from datetime import datetime, date
+from dataclasses import replace
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+# pandas / matplotlib são carregados só nos blocos que os usam (histórico, export, gráficos)
 
 # ===== imports locais =====
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from storage import DataStore, WALLETS_FILE, TRADES_FILE, SYMBOLS_FILE, SETTINGS_FILE, save_json
+import perf
+_perf_frame = perf.begin("rerun")  # None se a instrumentação estiver desligada
+import metrics
+metrics.serve_from_env()  # /metrics (Prometheus) se TRADEIROS_METRICS_PORT estiver definido; uma vez por processo
+
+from storage import DataStore, reset_all_data
+from watcher import shared_watcher, PendingChanges
+import reports
+import archive
+import query
 from models import (
-    Trade, new_trade_id, pnl_value, wallet_current_balance,
-    equity_curve, symbols_default
+    Trade, new_trade_id, pnl_value,
+    symbols_default, normalize_tags
 )
 
 # ===== helpers =====
@@ -45,31 +54,20 @@ def parse_number(txt: str) -> float:
     except Exception:
         return 0.0
 
+def figure_png(fig) -> bytes:
+    """PNG de uma Figure como st.pyplot a desenha (para guardar em ds.artifacts)."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+    return buf.getvalue()
+
 def refresh_datastore():
+    """DataStore novo (só depois do reset total; as outras mutações já publicam no ds da sessão)."""
     cur = st.session_state.get("selected_wallet_id")
     st.session_state.ds = DataStore()
     st.session_state.selected_wallet_id = cur if cur in st.session_state.ds.wallets else (
         next(iter(st.session_state.ds.wallets.keys()), None)
     )
 
-def compute_stats(trades, initial_balance: float):
-    closed = [t for t in trades if (t.status or "Open") == "Closed"]
-    winners = [t for t in closed if (t.pnl_abs or 0) > 0]
-    losers  = [t for t in closed if (t.pnl_abs or 0) < 0]
-    be      = [t for t in closed if (t.pnl_abs or 0) == 0]
-    pnl_total = sum((t.pnl_abs or 0.0) for t in closed)
-    total = len(trades)
-    winrate = (len(winners)/len(closed)*100.0) if closed else 0.0
-    current_balance = (initial_balance or 0.0) + pnl_total
-    growth_pct = ((current_balance/initial_balance - 1)*100.0) if initial_balance and initial_balance>0 else 0.0
-    return dict(
-        total_trades=total, closed_trades=len(closed), open_trades=total-len(closed),
-        winners=len(winners), losers=len(losers), breakeven=len(be),
-        winrate_pct=winrate, pnl_total=pnl_total,
-        initial_balance=initial_balance or 0.0, current_balance=current_balance,
-        growth_pct=growth_pct
-    )
-
 # ===== app config / CSS =====
 st.set_page_config(page_title="Tradeiros", page_icon="💹", layout="wide")
 st.markdown("""
@@ -143,6 +141,25 @@ def show_alert(scope: str):
 
 ds: DataStore = st.session_state.ds
 
+# === alterações externas aos ficheiros (outro processo/instância) ===
+# O watcher é partilhado por todas as sessões; cada sessão acumula as coleções
+# alteradas e um fragmento periódico recarrega só essas e pede novo render.
+if os.getenv("TRADEIROS_WATCH", "1") != "0":
+    if "_watch_pending" not in st.session_state:
+        st.session_state._watch_pending = PendingChanges()
+        shared_watcher(ds.data_dir).subscribe(st.session_state._watch_pending.add)
+
+    @st.fragment(run_every=2)
+    def _apply_external_changes():
+        names = st.session_state._watch_pending.pop()
+        cur_ds = st.session_state.ds
+        names = cur_ds.changed_on_disk(names) if names else set()
+        if names:
+            cur_ds.reload(names)
+            st.rerun()
+
+    _apply_external_changes()
+
 # ===== sidebar carteiras =====
 st.sidebar.subheader("Carteiras")
 wallets = ds.get_wallets()
@@ -184,37 +201,34 @@ if st.session_state.selected_wallet_id and st.session_state.selected_wallet_id i
             risk_e = st.number_input("Risco (%)", min_value=0.0, max_value=100.0, step=0.25, value=float(curw.risk_percent), format="%.2f")
             ok_e = st.form_submit_button("Guardar")
         if ok_e:
-            curw.name = name_e.strip() or curw.name
-            curw.initial_balance = float(init_e)
-            curw.risk_percent = float(risk_e)
-            ds.update_wallet(curw)
+            ds.update_wallet(replace(curw, name=name_e.strip() or curw.name,
+                                     initial_balance=float(init_e), risk_percent=float(risk_e)))
             set_alert("new", "success", "Carteira atualizada.")
-            refresh_datastore(); st.rerun()
+            st.rerun()
 
 if st.sidebar.button("🗑️ Apagar carteira", disabled=not wallets):
     wid = st.session_state.selected_wallet_id
     if wid and wid in ds.wallets:
-        for t in list(ds.trades.values()):
-            if t.wallet_id == wid:
-                del ds.trades[t.id]
-        ds.save_trades()
-        del ds.wallets[wid]; ds.save_wallets()
+        ds.delete_wallet(wid)
         set_alert("new", "success", "Carteira apagada.")
-        refresh_datastore(); st.rerun()
+        st.rerun()
 
 if st.session_state.selected_wallet_id and st.session_state.selected_wallet_id in ds.wallets:
     wsel = ds.wallets[st.session_state.selected_wallet_id]
-    saldo_atual = wallet_current_balance(ds.trades_for_wallet(wsel.id), wsel.initial_balance)
+    saldo_atual = ds.wallet_balance(wsel.id)
     st.sidebar.markdown(f"**Saldo atual:** $ {pretty_money(saldo_atual)}")
 
 # ===== título =====
 st.title("Tradeiros — Diário de Trades")
 
 # ===== tabs =====
-tabs = st.tabs(["Novo Trade", "Atualização de Trade", "Histórico", "Estatísticas", "Gráficos", "Manutenção"])
+PAGES = ["Novo Trade", "Atualização de Trade", "Histórico", "Estatísticas", "Gráficos", "Manutenção"]
+# só a secção escolhida corre: com st.tabs todas correm a cada rerun (pandas e matplotlib logo no
+# primeiro render); a key mantém a secção entre reruns
+page = st.radio("Secção", PAGES, horizontal=True, key="page", label_visibility="collapsed")
 
 # =============== TAB 0: NOVO TRADE ===============
-with tabs[0]:
+if page == PAGES[0]:
     show_alert("new")
     if not wallets:
         st.info("Cria uma carteira na barra lateral para começar.")
@@ -225,13 +239,13 @@ with tabs[0]:
         for k, v in {
             "entry_txt":"90000,00","sl_txt":"90000,00","tp_txt":"90000,00",
             "qty_txt":"0,0000","val_txt":"0,00","dir_new":"Long",
-            "last_changed":None
+            "tags_new":"", "last_changed":None
         }.items(): st.session_state.setdefault(k, v)
         if st.session_state.get("_reset_new"):
             st.session_state.update({
                 "dir_new":"Long",
                 "entry_txt":"90000,00","sl_txt":"90000,00","tp_txt":"90000,00",
-                "qty_txt":"0,0000","val_txt":"0,00", "last_changed":None
+                "qty_txt":"0,0000","val_txt":"0,00", "tags_new":"", "last_changed":None
             })
             st.session_state["_reset_new"] = False
 
@@ -256,8 +270,7 @@ with tabs[0]:
             if i2.button("Adicionar à lista", use_container_width=True, key="add_sym_btn"):
                 ns = (st.session_state.new_sym_text or "").strip().upper()
                 if ns:
-                    if ns not in ds.symbols:
-                        ds.symbols.append(ns); ds.symbols = sorted(list(set(ds.symbols))); ds.save_symbols()
+                    if ds.add_symbol(ns):
                         set_alert("new", "success", f"Paridade <b>{ns}</b> adicionada.")
                     else:
                         set_alert("new", "info", "Paridade já existe.")
@@ -316,7 +329,7 @@ with tabs[0]:
         risk_amount = risk_per_unit * qty
         loss_abs = pnl_value(dir_choice, entry, sl, qty)
         gain_abs = pnl_value(dir_choice, entry, tp, qty)
-        bal = wallet_current_balance(ds.trades_for_wallet(w.id), w.initial_balance)
+        bal = ds.wallet_balance(w.id)
         risk_pct = (risk_amount / bal * 100.0) if bal > 0 else 0.0
         risk_color = "#2e7d32" if risk_pct <= 1.0 else ("#ffcc00" if risk_pct <= 2.0 else "#b71c1c")
         c1.markdown(f"**Risco Retorno**<br><span style='font-size:20px'>{int(round(rr))} : 1</span>", unsafe_allow_html=True)
@@ -325,6 +338,8 @@ with tabs[0]:
         c4.markdown(f"**Ganho potencial (TP)**<br><span style='color:#2e7d32;font-size:20px'>$ {pretty_money(gain_abs)}</span>", unsafe_allow_html=True)
 
         reason = st.text_area("Razão da Entrada", height=60)
+        tags_txt = st.text_input("Tags", key="tags_new", placeholder="ex.: setup:breakout, tf:H4, sessão:NY",
+                                 help="Separadas por vírgulas; servem de filtro no Histórico.")
         if st.button("Guardar Trade", type="primary", use_container_width=True):
             if not symbol or entry<=0 or sl<=0 or qty<=0 or not reason.strip():
                 st.error("Paridade, entrada, SL, quantidade e razão da entrada são obrigatórios.")
@@ -339,15 +354,15 @@ with tabs[0]:
                     created_at=created_at, risk_amount=risk_amount,
                     risk_pct_of_balance=(risk_pct if bal>0 else 0.0), status="Open",
                     exit_price=None, closed_at=None, pnl_abs=None, pnl_pct=None,
-                    result=None, close_reason=None
+                    result=None, close_reason=None, tags=normalize_tags(tags_txt)
                 )
                 ds.add_trade(t)
                 st.session_state["_reset_new"] = True
                 set_alert("new", "success", "Trade guardado.")
-                refresh_datastore(); st.rerun()
+                st.rerun()
 
 # =============== TAB 1: ATUALIZAÇÃO DE TRADE ===============
-with tabs[1]:
+if page == PAGES[1]:
     show_alert("update")
     if not wallets:
         st.info("Cria uma carteira para continuar.")
@@ -394,17 +409,11 @@ with tabs[1]:
                 r3c1, r3c2 = st.columns([1,1])
                 r3c1.caption(f"<span style='color:#2e7d32'>Ganho em TP:</span> $ {pretty_money(pnl_value(t.direction, new_entry, new_tp, new_qty))}", unsafe_allow_html=True)
                 r3c2.caption(f"<span style='color:#b71c1c'>Perda em SL:</span> $ {pretty_money(pnl_value(t.direction, new_entry, new_sl, new_qty))}", unsafe_allow_html=True)
+                new_tags = st.text_input("Tags", value=", ".join(t.tags or ()), key=f"tags_{t.id}")
 
                 if st.button("Guardar alterações", key=f"upd_{t.id}", use_container_width=True):
-                    t.entry_price = round(new_entry, 2)
-                    t.stop_loss   = round(new_sl, 2)
-                    t.take_profit = round(new_tp, 2)
-                    t.position_size = float(new_qty)
-                    t.position_value = round(t.entry_price * t.position_size, 2)
-                    t.risk_amount = abs(t.entry_price - t.stop_loss) * t.position_size
-                    bal_upd = wallet_current_balance(ds.trades_for_wallet(t.wallet_id), ds.wallets[t.wallet_id].initial_balance)
-                    t.risk_pct_of_balance = (t.risk_amount / bal_upd * 100.0) if bal_upd > 0 else 0.0
-                    ds.update_trade(t)
+                    t = ds.edit_trade(t.id, new_entry, new_sl, new_tp, new_qty) or t
+                    t = ds.set_tags(t.id, new_tags) or t
                     set_alert("update", "success", "Alterações guardadas.")
 
             # ====== Fechar trade ======
@@ -414,14 +423,7 @@ with tabs[1]:
             with b1:
                 st.markdown("<div class='tp-scope'>", unsafe_allow_html=True)
                 if st.button("Fechar em TP", key=f"btn_tp_{t.id}", use_container_width=True):
-                    t.exit_price = round(t.take_profit, 2)
-                    t.closed_at = datetime.now().isoformat(timespec='seconds')
-                    t.status = "Closed"; t.close_reason = "TP"
-                    t.pnl_abs = pnl_value(t.direction, t.entry_price, t.exit_price, t.position_size)
-                    balc = wallet_current_balance(ds.trades_for_wallet(t.wallet_id), ds.wallets[t.wallet_id].initial_balance)
-                    t.pnl_pct = (t.pnl_abs / balc * 100.0) if balc > 0 else None
-                    t.result = "Gain" if (t.pnl_abs or 0) > 0 else ("Loss" if (t.pnl_abs or 0) < 0 else "Break-even")
-                    ds.update_trade(t)
+                    t = ds.close_trade(t.id, t.take_profit, "TP") or t
                     set_alert("update", "success", f"Trade fechado em TP. PnL: $ {pretty_money(t.pnl_abs)}")
                 st.markdown("</div>", unsafe_allow_html=True)
                 st.caption(f"<span style='color:#2e7d32'>Ganho em TP:</span> $ {pretty_money(pnl_value(t.direction, t.entry_price, t.take_profit, t.position_size))}", unsafe_allow_html=True)
@@ -429,14 +431,7 @@ with tabs[1]:
             with b2:
                 st.markdown("<div class='sl-scope'>", unsafe_allow_html=True)
                 if st.button("Fechar em SL", key=f"btn_sl_{t.id}", use_container_width=True):
-                    t.exit_price = round(t.stop_loss, 2)
-                    t.closed_at = datetime.now().isoformat(timespec='seconds')
-                    t.status = "Closed"; t.close_reason = "SL"
-                    t.pnl_abs = pnl_value(t.direction, t.entry_price, t.exit_price, t.position_size)
-                    balc = wallet_current_balance(ds.trades_for_wallet(t.wallet_id), ds.wallets[t.wallet_id].initial_balance)
-                    t.pnl_pct = (t.pnl_abs / balc * 100.0) if balc > 0 else None
-                    t.result = "Gain" if (t.pnl_abs or 0) > 0 else ("Loss" if (t.pnl_abs or 0) < 0 else "Break-even")
-                    ds.update_trade(t)
+                    t = ds.close_trade(t.id, t.stop_loss, "SL") or t
                     set_alert("update", "warn", f"Trade fechado em SL. PnL: $ {pretty_money(t.pnl_abs)}")
                 st.markdown("</div>", unsafe_allow_html=True)
                 st.caption(f"<span style='color:#b71c1c'>Perda em SL:</span> $ {pretty_money(pnl_value(t.direction, t.entry_price, t.stop_loss, t.position_size))}", unsafe_allow_html=True)
@@ -449,14 +444,7 @@ with tabs[1]:
                     if exit_price <= 0:
                         set_alert("update", "warn", "Indica um preço válido para fechar manualmente.")
                     else:
-                        t.exit_price = round(exit_price, 2)
-                        t.closed_at = datetime.now().isoformat(timespec='seconds')
-                        t.status = "Closed"; t.close_reason = "Manual"
-                        t.pnl_abs = pnl_value(t.direction, t.entry_price, t.exit_price, t.position_size)
-                        balc = wallet_current_balance(ds.trades_for_wallet(t.wallet_id), ds.wallets[t.wallet_id].initial_balance)
-                        t.pnl_pct = (t.pnl_abs / balc * 100.0) if balc > 0 else None
-                        t.result = "Gain" if (t.pnl_abs or 0) > 0 else ("Loss" if (t.pnl_abs or 0) < 0 else "Break-even")
-                        ds.update_trade(t)
+                        t = ds.close_trade(t.id, exit_price, "Manual") or t
                         set_alert("update", "info", f"Trade fechado manualmente. PnL: $ {pretty_money(t.pnl_abs)}")
                 st.markdown("</div>", unsafe_allow_html=True)
                 exit_price = parse_number(exit_txt)
@@ -464,7 +452,7 @@ with tabs[1]:
                 st.caption(f"Pré-visualização PnL: $ {pretty_money(preview)}")
 
 # =============== TAB 2: HISTÓRICO ===============
-with tabs[2]:
+if page == PAGES[2]:
     show_alert("history")
     wallets_all = list(ds.wallets.values())
     if not wallets_all:
@@ -472,61 +460,63 @@ with tabs[2]:
     else:
         opts = ["Todas"] + [w.name for w in wallets_all]
         opt = st.selectbox("Carteira", options=opts, index=0)
-        if opt == "Todas":
-            trades = list(ds.trades.values())
-            wname_of = lambda tid: ds.wallets[ds.trades[tid].wallet_id].name if ds.trades[tid].wallet_id in ds.wallets else "—"
-        else:
-            wsel = next(w for w in wallets_all if w.name == opt)
-            trades = [t for t in ds.trades.values() if t.wallet_id == wsel.id]
-            wname_of = lambda tid: opt
+        wsel = None if opt == "Todas" else next(w for w in wallets_all if w.name == opt)
 
         c1, c2, c3, c4 = st.columns(4)
-        with c1: from_date = st.date_input("De", value=pd.to_datetime("2000-01-01")).strftime("%Y-%m-%d")
-        with c2: to_date   = st.date_input("Até", value=pd.Timestamp.today()).strftime("%Y-%m-%d")
+        with c1: from_date = st.date_input("De", value=date(2000, 1, 1)).strftime("%Y-%m-%d")
+        with c2: to_date   = st.date_input("Até", value=date.today()).strftime("%Y-%m-%d")
         with c3: symbol_f  = st.text_input("Paridade (filtro)", "")
         with c4: status_f  = st.selectbox("Estado", ["Todos","Open","Closed"])
-
-        def in_range(iso):
-            try:
-                d = datetime.fromisoformat(iso)
-                dmin = pd.to_datetime(from_date)
-                dmax = pd.to_datetime(to_date) + pd.Timedelta(hours=23, minutes=59, seconds=59)
-                return dmin <= d <= dmax
-            except Exception:
-                return True
-
-        rows = []
-        for t in trades:
-            if symbol_f and symbol_f.upper() not in (t.symbol or "").upper(): continue
-            if status_f != "Todos" and (t.status or "Open") != status_f: continue
-            if not in_range(t.created_at or ""): continue
-            rows.append(t)
-
-        def as_dict(t: Trade):
-            tofloat = lambda v: (float(v) if v is not None else None)
-            return dict(ID=t.id, Data=(t.created_at or "").replace("T"," "),
-                        Carteira=wname_of(t.id), Paridade=t.symbol, Direção=t.direction,
-                        Entrada=tofloat(t.entry_price), SL=tofloat(t.stop_loss), TP=tofloat(t.take_profit),
-                        Quantidade=tofloat(t.position_size), ValorPos=tofloat(t.position_value),
-                        RiscoUSD=tofloat(t.risk_amount), RiscoPct=tofloat(t.risk_pct_of_balance),
-                        Estado=t.status, Saída=tofloat(t.exit_price), PnL=tofloat(t.pnl_abs),
-                        PnLPct=tofloat(t.pnl_pct), Resultado=t.result, FechadoComo=t.close_reason, Razão=t.reason)
-        df = pd.DataFrame([as_dict(t) for t in rows])
-        st.dataframe(df, use_container_width=True)
-
-        to_delete = st.selectbox("Apagar trade (opcional)", options=["—"] + [t.id for t in rows])
+        reason_f = st.text_input("Pesquisar na razão", "", placeholder="ex.: rompimento fomc",
+                                 help="Todas as palavras, como início de palavra; maiúsculas e acentos não contam.")
+        c5, c6, c7 = st.columns([1, 1, 2])
+        with c5: direction_f = st.selectbox("Direção", ["Todos", "Long", "Short"])
+        with c6: result_f    = st.selectbox("Resultado", ["Todos", "Gain", "Loss", "Break-even"])
+        with c7: tags_f      = st.multiselect("Tags (todas)", options=ds.facets.values("tag"))
+        query_txt = st.text_input("Consulta", "", placeholder="ex.: symbol:BTC* dir:Short pnl<0 risk_pct>1.5 closed:2025-01..2025-03",
+                                  help="Termos separados por espaços (E), OR, -termo para negar, parênteses. "
+                                       "Campos: symbol dir status result close wallet tag reason entry sl tp exit size value "
+                                       "risk risk_pct pnl pnl_pct rr created closed. Texto com * e ?; números e datas "
+                                       "com < <= > >= != e intervalos a..b.")
+        try:
+            query_f = query.compile(query_txt, ds.wallets)
+        except query.QueryError as e:
+            st.error(f"Consulta inválida: {e}")
+            query_f = None
+
+        version = ds.data_version()  # antes do snapshot: chave do export em ds.artifacts
+        snap = ds.snapshot()  # vista consistente para filtro, tabela e export
+        hist_args = dict(wallet_id=(wsel.id if wsel else None), date_from=from_date, date_to=to_date,
+                         symbol=symbol_f, status=status_f, direction=direction_f, result=result_f,
+                         tags=tags_f, reason=reason_f, query=query_f)
+        # candidatos pela interseção dos bitmaps (facets.py), incluindo o arquivo frio
+        rows = reports.filter_trades(None, index=ds.reason_index, facets=ds.facets, columns=ds.columns, **hist_args)
+        sel = reports.selection_stats(rows, snap.wallets, wsel.id if wsel else None, by="tag")
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Trades na seleção", sel["total_trades"]); m2.metric("Fechados", sel["closed_trades"])
+        m3.metric("Taxa de acerto", f"{sel['winrate_pct']:.2f}%"); m4.metric("PnL", f"$ {pretty_money(sel['pnl_total'])}")
+        with perf.span("history.dataframe"):
+            import pandas as pd
+            df = ds.columns.frame(rows, snap.wallets)  # indexação das colunas numpy, sem um dict por trade
+            st.dataframe(df, use_container_width=True)
+            if sel["by"]["tag"]:
+                with st.expander("Por tag (dentro da seleção)"):
+                    st.dataframe(pd.DataFrame(
+                        [dict(Tag=tag, Trades=s["total_trades"], Fechados=s["closed_trades"],
+                              Acerto=round(s["winrate_pct"], 2), PnL=round(s["pnl_total"], 2))
+                         for tag, s in sel["by"]["tag"].items()]
+                    ), use_container_width=True, hide_index=True)
+
+        # os arquivados (archive.py) só se consultam
+        to_delete = st.selectbox("Apagar trade (opcional)", options=["—"] + [t.id for t in rows if t.id in snap.trades])
         if to_delete != "—" and st.button("Apagar trade selecionado"):
             ds.delete_trade(to_delete)
             set_alert("history", "success", "Trade apagado.")
-            refresh_datastore(); st.rerun()
+            st.rerun()
 
-        if st.button("Exportar Excel"):
-            initial_total = sum((w.initial_balance or 0.0) for w in wallets_all)
-            stats_global = compute_stats(list(ds.trades.values()), initial_total)
-            stats_wallet = None
-            if opt != "Todas":
-                wsel = next(w for w in wallets_all if w.name == opt)
-                stats_wallet = compute_stats([t for t in ds.trades.values() if t.wallet_id == wsel.id], wsel.initial_balance)
+        def build_excel() -> bytes:
+            stats_global = reports.global_stats(snap.wallets, snap.trades, snap.archived)
+            stats_wallet = reports.wallet_stats(wsel, snap.trades, snap.archived) if wsel else None
 
             buffer = io.BytesIO()
             with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
@@ -536,16 +526,43 @@ with tabs[2]:
                      .rename(columns={"index":"Métrica", 0:"Valor"}).to_excel(writer, index=False, sheet_name=f"Estatísticas_{opt}"))
                 (pd.DataFrame([stats_global]).T.reset_index()
                  .rename(columns={"index":"Métrica", 0:"Valor"}).to_excel(writer, index=False, sheet_name="Estatísticas_Global"))
-            st.download_button("Descarregar Excel", data=buffer.getvalue(),
-                               file_name="Tradeiros_Historico.xlsx",
-                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            return buffer.getvalue()
+
+        if st.button("Exportar Excel"):
+            with perf.span("history.export_excel"):
+                # igual enquanto filtros e dados não mudarem: segundo clique não recalcula
+                data = ds.artifacts.get("history_xlsx", reports.filter_key(hist_args), version, build_excel)
+                st.download_button("Descarregar Excel", data=data,
+                                   file_name="Tradeiros_Historico.xlsx",
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+        # esquema de trades.json, importável na Manutenção (transfer.py); passa por um ficheiro
+        # temporário, mas o Streamlit guarda a descarga em memória até ao próximo rerun
+        ext = st.selectbox("Trades listados (importável)", [".ndjson", ".ndjson.gz", ".csv", ".csv.gz"],
+                           key="hist_transfer_ext")
+        if st.button("Exportar trades"):
+            import tempfile
+            import transfer
+            fd, tmp_path = tempfile.mkstemp(suffix=ext)
+            os.close(fd)
+            try:
+                with perf.span("history.export_trades"):
+                    transfer.export_trades(tmp_path, rows)
+                with open(tmp_path, "rb") as f:
+                    st.download_button("Descarregar trades", data=f, file_name="Tradeiros_Trades" + ext,
+                                       mime="application/gzip" if ext.endswith(".gz") else "text/plain")
+            finally:
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
 
 # =============== TAB 3: ESTATÍSTICAS ===============
-with tabs[3]:
+if page == PAGES[3]:
     show_alert("stats")
-    wallets_all = list(ds.wallets.values())
-    initial_total = sum((w.initial_balance or 0.0) for w in wallets_all) if wallets_all else 0.0
-    s = compute_stats(list(ds.trades.values()), initial_total)
+    version = ds.data_version()
+    snap = ds.snapshot()
+    s = ds.artifacts.get("global_stats", (), version, lambda: reports.global_stats(snap.wallets, snap.trades, snap.archived))
     cA, cB, cC = st.columns(3)
     cA.metric("Total de trades", s["total_trades"]); cA.metric("Fechados", s["closed_trades"]); cA.metric("Abertos", s["open_trades"])
     cB.metric("Vencedores", s["winners"]); cB.metric("Perdedores", s["losers"]); cB.metric("Break-even", s["breakeven"])
@@ -557,46 +574,131 @@ with tabs[3]:
     c3.metric("Crescimento (global)", f"{s['growth_pct']:.2f}%")
 
 # =============== TAB 4: GRÁFICOS (lado a lado) ===============
-with tabs[4]:
+if page == PAGES[4]:
     show_alert("charts")
     if not wallets:
         st.info("Cria uma carteira para ver gráficos.")
     else:
+        from matplotlib.figure import Figure  # sem pyplot: evita backend global e figuras por fechar
+        import rolling
+        version = ds.data_version(st.session_state.selected_wallet_id)  # antes de ler a carteira e as colunas
         w = ds.wallets[st.session_state.selected_wallet_id]
-        col1, col2 = st.columns(2)
-
-        with col1:
-            eq = equity_curve(ds.trades_for_wallet(w.id), w.initial_balance)
-            fig1, ax1 = plt.subplots(figsize=(4.0, 2.0))
-            if eq:
-                xs = list(range(1, len(eq)+1)); ys = [p[1] for p in eq]; ax1.plot(xs, ys, marker="o")
+        window = int(st.number_input("Janela das métricas móveis (trades fechados)", min_value=2, max_value=1000,
+                                     value=rolling.WINDOW, step=5, key="rolling_window"))
+
+        def render_charts():
+            _, pnls = ds.columns.closed_pnls(w.id)  # inclui o arquivo frio
+            fig1 = Figure(figsize=(4.0, 2.0)); ax1 = fig1.subplots()
+            if len(pnls):
+                ys = w.initial_balance + pnls.cumsum(); ax1.plot(range(1, len(ys)+1), ys, marker="o")
             else:
                 ax1.plot([0,1],[w.initial_balance, w.initial_balance])
             ax1.set_title("Evolução do Saldo"); ax1.set_xlabel("Trade fechado #"); ax1.set_ylabel("Saldo")
-            st.pyplot(fig1, use_container_width=True)
-
-        with col2:
-            closed = [t for t in ds.trades_for_wallet(w.id) if t.status=="Closed" and t.pnl_abs is not None]
-            closed.sort(key=lambda x: x.closed_at or x.created_at); pnls = [t.pnl_abs for t in closed]
-            fig2, ax2 = plt.subplots(figsize=(4.0, 2.0))
-            if pnls:
-                xs = list(range(1, len(pnls)+1)); colors = ["#4caf50" if p>=0 else "#e53935" for p in pnls]
+
+            fig2 = Figure(figsize=(4.0, 2.0)); ax2 = fig2.subplots()
+            if len(pnls):
+                xs = range(1, len(pnls)+1); colors = ["#4caf50" if p>=0 else "#e53935" for p in pnls]
                 ax2.bar(xs, pnls, align="center", color=colors)
             ax2.set_title("PnL por Trade (fechados)"); ax2.set_xlabel("Trade fechado #"); ax2.set_ylabel("PnL")
-            st.pyplot(fig2, use_container_width=True)
+
+            m = rolling.wallet_rolling(ds, w.id, window)  # uma passagem (somas cumulativas), em cache
+            xs = range(1, len(m["expectancy"]) + 1)
+            fig3 = Figure(figsize=(4.0, 2.0)); ax3 = fig3.subplots(); ax3r = ax3.twinx()
+            if len(xs):
+                ax3.plot(xs, m["winrate_pct"], color="#42a5f5", label="Acerto %"); ax3.set_ylim(0, 100)
+                ax3r.plot(xs, m["avg_r"], color="#ab47bc", lw=1.0, label="R médio")
+            ax3.set_title(f"Acerto e R médio (últimos {window})"); ax3.set_xlabel("Trade fechado #")
+            ax3.set_ylabel("Acerto %"); ax3r.set_ylabel("R médio")
+
+            fig4 = Figure(figsize=(4.0, 2.0)); ax4 = fig4.subplots()
+            ax4.axhline(0, color="#888", lw=0.8)
+            if len(xs):
+                ax4.plot(xs, m["expectancy"], color="#4caf50", label=f"Esperança (últimos {window})")
+                ax4.plot(xs, m["pnl_days"], color="#ff9800", lw=1.0, label=f"PnL {m['days']} dias")
+                ax4.legend(loc="upper left", fontsize=6)
+            ax4.set_title("Esperança e PnL móvel"); ax4.set_xlabel("Trade fechado #"); ax4.set_ylabel("PnL")
+            return figure_png(fig1), figure_png(fig2), figure_png(fig3), figure_png(fig4)
+
+        with perf.span("charts.render"):
+            # PNGs guardados por carteira/janela/versão: reruns sem alterações a esta carteira não redesenham
+            png1, png2, png3, png4 = ds.artifacts.get("wallet_charts", (w.id, window), version, render_charts)
+        col1, col2 = st.columns(2)
+        col1.image(png1, use_column_width=True)
+        col2.image(png2, use_column_width=True)
+        col3, col4 = st.columns(2)
+        col3.image(png3, use_column_width=True)
+        col4.image(png4, use_column_width=True)
+
+        st.subheader("Dias e horas")
+        import heatmaps
+
+        def render_heatmaps():
+            h = heatmaps.wallet_heatmaps(ds, w.id)  # agrupado em colunas numéricas, em cache
+            fig5 = Figure(figsize=(4.0, 2.2)); heatmaps.plot_weekday_hour(fig5.subplots(), h["hours"], "pnl")
+            fig6 = Figure(figsize=(4.0, 2.2)); heatmaps.plot_weekday_hour(fig6.subplots(), h["hours"], "winrate_pct")
+            fig7 = Figure(figsize=(8.0, 2.2)); heatmaps.plot_calendar(fig7.subplots(), h["days"])
+            return figure_png(fig5), figure_png(fig6), figure_png(fig7)
+
+        with perf.span("charts.heatmaps"):
+            png5, png6, png7 = ds.artifacts.get("wallet_heatmaps_png", (w.id,), version, render_heatmaps)
+        col5, col6 = st.columns(2)
+        col5.image(png5, use_column_width=True)
+        col6.image(png6, use_column_width=True)
+        st.image(png7, use_column_width=True)
 
 # =============== TAB 5: MANUTENÇÃO ===============
-with tabs[5]:
+if page == PAGES[5]:
     show_alert("admin")
     st.warning("⚠️ Reset Total apaga carteiras, trades, paridades e definições.", icon="⚠️")
     if st.button("RESET TOTAL (apagar todos os dados)", type="secondary"):
-        import os as _os
-        for path in [WALLETS_FILE, TRADES_FILE, SYMBOLS_FILE, SETTINGS_FILE]:
-            try:
-                if _os.path.exists(path): _os.remove(path)
-            except Exception:
-                pass
-        save_json(SYMBOLS_FILE, symbols_default()); save_json(SETTINGS_FILE, {"theme":"dark"})
+        reset_all_data(list(ds.collection_files().values()))
         set_alert("admin", "success", "Dados apagados.")
         refresh_datastore(); st.rerun()
 
+    st.write("---")
+    perf_saved = str(ds.settings.get(perf.SETTING, "")).lower() in ("1", "true", "on")
+    perf_on = st.checkbox("Medir tempos (instrumentação por rerun)", value=perf_saved,
+                          help=f"Também: variável de ambiente {perf.ENV_VAR}=1; log rotativo com {perf.LOG_ENV_VAR}=ficheiro.")
+    if perf_on != perf_saved:
+        ds.settings[perf.SETTING] = "1" if perf_on else "0"
+        ds.save_settings()
+        perf.configure(ds.settings)
+        st.rerun()
+
+    st.write("---")
+    info = ds.archive_info()
+    st.caption(f"Arquivo: {info['trades']} trades fechados em {info['periods']} meses "
+               f"({info['bytes'] / 1024:.0f} KB comprimidos). Histórico, gráficos e estatísticas incluem-nos.")
+    days = st.number_input("Arquivar trades fechados há mais de (dias)", min_value=0, step=30,
+                           value=ds.archive_after_days())
+    if st.button("Arquivar trades antigos"):
+        if days != ds.archive_after_days():
+            ds.settings[archive.SETTING] = str(int(days))
+            ds.save_settings()
+        res = ds.archive_closed(int(days))
+        set_alert("admin", "success", f"{res['archived']} trades arquivados ({res['periods']} meses).")
+        st.rerun()
+
+    st.write("---")
+    upload = st.file_uploader("Importar trades (NDJSON/CSV, esquema de trades.json; .gz aceite)",
+                              type=["ndjson", "jsonl", "csv", "gz"])
+    overwrite = st.checkbox("Substituir trades com o mesmo id")
+    if upload is not None and st.button("Importar"):
+        import transfer
+        with perf.span("admin.import_trades"):
+            res = ds.import_trades(transfer.iter_import(upload), overwrite=overwrite)
+        set_alert("admin", "success", f"{res['added']} adicionados, {res['replaced']} substituídos, "
+                                      f"{res['skipped']} ignorados.")
+        st.rerun()
+
+    st.write("---")
+    if st.button("Relatório de memória"):
+        import memreport
+        st.code(memreport.format_report(memreport.full_report(ds, st.session_state)), language=None)
+
+# ===== tempos deste rerun (instrumentação ligada) =====
+if _perf_frame is not None:
+    perf.end(_perf_frame)
+    with st.sidebar.expander("⏱️ Tempos deste rerun", expanded=False):
+        st.code(_perf_frame.format(), language=None)
+
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+CLI sem interface gráfica (não importa Streamlit nem Qt):
+
+    python -m tradeiros wallets
+    python -m tradeiros stats [--wallet NOME|ID] [--per-wallet] [filtros do history] [--by tag|symbol|...]
+    python -m tradeiros history [--wallet ...] [--from AAAA-MM-DD] [--to ...] [--symbol BTC] [--status Open|Closed]
+                                [--direction Long|Short] [--result Gain|Loss|Break-even] [--tag T ...]
+                                [--query "symbol:BTC* pnl<0 closed:2025-01..2025-03"] [--limit N]
+    python -m tradeiros export --format xlsx|csv|ndjson --out FICHEIRO|- [--raw] [--gzip] [filtros do history]
+    python -m tradeiros import FICHEIRO|- [--format json|ndjson|csv] [--gzip] [--overwrite]
+    python -m tradeiros compact
+    python -m tradeiros memory [--tracemalloc] [--top N]
+    python -m tradeiros reset --yes
+
+Saída em JSON no stdout (--pretty para indentar). --data-dir usa outra pasta de dados.
+export/import em NDJSON ou CSV com --raw (esquema de trades.json) passam um trade de
+cada vez (ver transfer.py); com --out - o ficheiro vai para o stdout e o resumo não é escrito.
+--perf escreve no stderr os tempos de cada operação (ver perf.py).
+"""
+
+import os
+import sys
+import json
+import argparse
+
+
+def _print(obj, pretty: bool):
+    json.dump(obj, sys.stdout, ensure_ascii=False, indent=2 if pretty else None, default=str)
+    sys.stdout.write("\n")
+
+
+def _open_store(args):
+    from storage import DataStore
+    return DataStore(args.data_dir)
+
+
+def _find_wallet(ds, ref):
+    """Resolve carteira por id ou por nome (case-insensitive)."""
+    if ref is None:
+        return None
+    w = ds.wallets.get(ref)
+    if w:
+        return w
+    for w in ds.wallets.values():
+        if w.name.lower() == ref.lower():
+            return w
+    raise SystemExit(f"carteira não encontrada: {ref}")
+
+
+def _filtered(ds, args):
+    import reports
+    import query
+    snap = ds.snapshot()
+    w = _find_wallet(ds, args.wallet)
+    try:
+        q = query.compile(args.query, snap.wallets)
+    except query.QueryError as e:
+        raise SystemExit(f"consulta inválida: {e}")
+    rows = reports.filter_trades(
+        None, wallet_id=(w.id if w else None),
+        date_from=args.date_from, date_to=args.date_to, symbol=args.symbol, status=args.status,
+        direction=args.direction, result=args.result, tags=args.tag or (),
+        reason=args.search, index=ds.reason_index, facets=ds.facets,
+        query=q, columns=ds.columns,
+    )
+    return snap, w, rows
+
+
+# ---------- comandos ----------
+def cmd_wallets(args):
+    ds = _open_store(args)
+    return [
+        dict(id=w.id, name=w.name, initial_balance=w.initial_balance, risk_percent=w.risk_percent,
+             current_balance=ds.wallet_balance(w.id), created_at=w.created_at)
+        for w in ds.wallets.values()
+    ]
+
+
+def cmd_stats(args):
+    import reports
+    ds = _open_store(args)
+    if args.by or any(getattr(args, k) for k in _SELECTION_FILTERS):
+        snap, w, rows = _filtered(ds, args)
+        return {"wallet": w.name if w else None, "selection": True,
+                **reports.selection_stats(rows, snap.wallets, w.id if w else None, args.by)}
+    snap = ds.snapshot()
+    if args.per_wallet:
+        return {w.name: reports.wallet_stats(w, snap.trades, snap.archived) for w in snap.wallets.values()}
+    w = _find_wallet(ds, args.wallet)
+    if w:
+        return {"wallet": w.name, **reports.wallet_stats(w, snap.trades, snap.archived)}
+    return {"wallet": None, **reports.global_stats(snap.wallets, snap.trades, snap.archived)}
+
+
+def cmd_history(args):
+    import reports
+    ds = _open_store(args)
+    snap, _, rows = _filtered(ds, args)
+    if args.limit:
+        rows = rows[-args.limit:]
+    return reports.trade_rows(rows, snap.wallets)
+
+
+def _stream(ds, args):
+    """
+    Os trades da seleção por ordem de armazenamento (arquivo, depois os atuais),
+    sem os juntar: consulta e razão avaliadas trade a trade, sem índices.
+    """
+    import reports
+    import query
+    snap = ds.snapshot()
+    w = _find_wallet(ds, args.wallet)
+    try:
+        q = query.compile(args.query, snap.wallets)
+    except query.QueryError as e:
+        raise SystemExit(f"consulta inválida: {e}")
+    return reports.iter_filtered(
+        ds.iter_history(snap, w.id if w else None, args.date_from, args.date_to),
+        wallet_id=(w.id if w else None), date_from=args.date_from, date_to=args.date_to,
+        symbol=args.symbol, status=args.status, direction=args.direction, result=args.result,
+        tags=args.tag or (), reason=args.search, query=q,
+    )
+
+
+def cmd_export(args):
+    import reports
+    ds = _open_store(args)
+    if args.format == "ndjson" or (args.format == "csv" and args.raw):
+        import transfer
+        n = transfer.export_trades(args.out, _stream(ds, args), args.format, args.gzip or None)
+        if args.out == "-":
+            return None
+        return {"out": os.path.abspath(args.out), "format": args.format, "rows": n}
+    if args.out == "-" and args.format == "xlsx":
+        raise SystemExit("xlsx não vai para o stdout: usar --out FICHEIRO")
+    snap, w, rows = _filtered(ds, args)
+    if args.out == "-":
+        reports.write_csv(sys.stdout, reports.trade_rows(rows, snap.wallets))
+        return None
+    if args.format == "csv":
+        reports.write_csv(args.out, reports.trade_rows(rows, snap.wallets))
+    else:
+        stats_wallet = reports.wallet_stats(w, snap.trades, snap.archived) if w else {}
+        reports.write_excel(args.out, ds.columns.frame(rows, snap.wallets), stats_wallet,
+                            reports.global_stats(snap.wallets, snap.trades, snap.archived))
+    return {"out": os.path.abspath(args.out), "format": args.format, "rows": len(rows)}
+
+
+def cmd_import(args):
+    import transfer
+    fmt = args.format or ("json" if args.file.lower().endswith(".json") else transfer.format_of(args.file))
+    if fmt == "json":
+        with open(args.file, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    else:
+        items = transfer.iter_import(args.file, fmt, args.gzip or None)
+    ds = _open_store(args)
+    return ds.import_trades(items, overwrite=args.overwrite)
+
+
+def cmd_compact(args):
+    return _open_store(args).compact()
+
+
+def cmd_archive(args):
+    ds = _open_store(args)
+    out = ds.archive_closed(args.days)
+    out.update({"archive_" + k: v for k, v in ds.archive_info().items()})
+    return out
+
+
+def cmd_memory(args):
+    import memreport
+    if args.tracemalloc:
+        ds, load = memreport.traced_load(args.data_dir, args.top)
+    else:
+        ds, load = _open_store(args), None
+    out = memreport.full_report(ds, limit=args.top)
+    if load is not None:
+        out["load"] = load
+    return out
+
+
+def cmd_reset(args):
+    if not args.yes:
+        raise SystemExit("reset apaga TODOS os dados: confirmar com --yes")
+    from storage import reset_all_data
+    ds = _open_store(args)
+    reset_all_data(list(ds.collection_files().values()))
+    return {"reset": True, "data_dir": ds.data_dir}
+
+
+_SELECTION_FILTERS = ("date_from", "date_to", "symbol", "status", "search", "direction", "result", "tag", "query")
+
+
+def _add_filters(p):
+    p.add_argument("--wallet", help="nome ou id da carteira (omissão: todas)")
+    p.add_argument("--from", dest="date_from", help="data de criação mínima AAAA-MM-DD")
+    p.add_argument("--to", dest="date_to", help="data de criação máxima AAAA-MM-DD")
+    p.add_argument("--symbol", help="substring da paridade")
+    p.add_argument("--status", choices=["Open", "Closed"])
+    p.add_argument("--search", help="palavras na razão (prefixos; sem acentos/maiúsculas)")
+    p.add_argument("--direction", choices=["Long", "Short"])
+    p.add_argument("--result", choices=["Gain", "Loss", "Break-even"])
+    p.add_argument("--tag", action="append", help="tag obrigatória (repetir para exigir várias)")
+    p.add_argument("--query", "-q", help='consulta, ex.: "symbol:BTC* dir:Short pnl<0" (ver query.py)')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from facets import FACETS
+    def add_common(p, suppress: bool):
+        p.add_argument("--data-dir", default=argparse.SUPPRESS if suppress else None,
+                       help="pasta de dados (omissão: a da app / TRADEIROS_DATA_DIR)")
+        p.add_argument("--pretty", action="store_true", default=argparse.SUPPRESS if suppress else False,
+                       help="JSON indentado")
+        p.add_argument("--perf", action="store_true", default=argparse.SUPPRESS if suppress else False,
+                       help="tempos por operação no stderr")
+
+    ap = argparse.ArgumentParser(prog="python -m tradeiros", description="Tradeiros — CLI")
+    add_common(ap, suppress=False)
+    # as opções comuns também são aceites depois do subcomando
+    common = argparse.ArgumentParser(add_help=False)
+    add_common(common, suppress=True)
+    sub = ap.add_subparsers(dest="command", required=True)
+    _add_parser = sub.add_parser
+    sub.add_parser = lambda *a, **k: _add_parser(*a, parents=[common], **k)
+
+    sub.add_parser("wallets", help="listar carteiras").set_defaults(func=cmd_wallets)
+
+    p = sub.add_parser("stats", help="estatísticas globais, por carteira ou de uma seleção filtrada")
+    _add_filters(p)
+    p.add_argument("--per-wallet", action="store_true", help="uma entrada por carteira")
+    p.add_argument("--by", choices=list(FACETS), help="KPIs da seleção por valor desta faceta (ex.: tag)")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("history", help="histórico filtrado")
+    _add_filters(p)
+    p.add_argument("--limit", type=int, help="só os N mais recentes")
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("export", help="exportar histórico filtrado")
+    _add_filters(p)
+    p.add_argument("--format", choices=["xlsx", "csv", "ndjson"], default="xlsx")
+    p.add_argument("--out", required=True, help='ficheiro ou "-" (stdout; não para xlsx)')
+    p.add_argument("--raw", action="store_true", help="CSV no esquema de trades.json (importável) em vez das colunas do relatório")
+    p.add_argument("--gzip", action="store_true", help="comprimir (omissão: se --out acabar em .gz)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="importar trades (esquema de trades.json) de JSON, NDJSON ou CSV")
+    p.add_argument("file", help='ficheiro ou "-" (stdin)')
+    p.add_argument("--format", choices=["json", "ndjson", "csv"], help="omissão: pela extensão (.json/.ndjson/.csv, com ou sem .gz)")
+    p.add_argument("--gzip", action="store_true", help="entrada comprimida (omissão: detetada)")
+    p.add_argument("--overwrite", action="store_true", help="substituir trades com o mesmo id")
+    p.set_defaults(func=cmd_import)
+
+    sub.add_parser("compact", help="normalizar ficheiros e limpar restos").set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("archive", help="mover trades fechados antigos para o arquivo comprimido")
+    p.add_argument("--days", type=int, help="fechados há mais de N dias (omissão: setting archive_after_days ou 365)")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("memory", help="relatório de memória dos dados carregados")
+    p.add_argument("--tracemalloc", action="store_true", help="carregar sob tracemalloc (pico e linhas que mais alocam)")
+    p.add_argument("--top", type=int, default=15, help="nº de linhas do tracemalloc")
+    p.set_defaults(func=cmd_memory)
+
+    p = sub.add_parser("reset", help="apagar todos os dados")
+    p.add_argument("--yes", action="store_true")
+    p.set_defaults(func=cmd_reset)
+    return ap
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    import perf
+    if args.perf:
+        perf.enable()
+    frame = perf.begin(f"tradeiros {args.command}")
+    try:
+        out = args.func(args)
+        if out is not None:  # None: o comando já escreveu no stdout
+            _print(out, args.pretty)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # quem lia fechou o pipe (ex.: "| head"): sair sem traceback nem novo erro ao fechar o stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    if frame is not None:
+        sys.stderr.write(perf.end(frame).format() + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
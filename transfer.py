@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação/importação de trades em fluxo, em NDJSON ou CSV (opcionalmente
+gzip), no esquema de trades.json.
+
+    n = transfer.export_trades("trades.ndjson.gz", ds.iter_history())
+    ds.import_trades(transfer.iter_import("trades.csv"))
+    python -m tradeiros export --format ndjson --out - | gzip > backup.ndjson.gz
+
+- Um trade de cada vez, dos dois lados: a memória não cresce com o número de
+  trades (do lado da importação, ds.import_trades junta-os num só dict antes
+  de gravar, como sempre fez).
+- NDJSON: uma linha JSON por trade, igual às do arquivo frio. CSV: uma coluna
+  por campo de Trade; None fica "" e volta a None nos campos opcionais e
+  numéricos; tags separadas por vírgulas; floats com repr (voltam iguais).
+- Formato pela extensão (.ndjson/.jsonl/.csv, com ou sem .gz); gzip pela
+  extensão ou, a ler, pelos primeiros bytes. "-" é o stdin/stdout.
+- Linhas que não se leem chegam como None; ds.import_trades conta-as como
+  ignoradas.
+"""
+import io
+import sys
+import csv
+import gzip
+import json
+import dataclasses
+import typing
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+
+from models import Trade
+
+FIELDS = [f.name for f in dataclasses.fields(Trade)]
+NUMERIC = {f.name for f in dataclasses.fields(Trade) if float in typing.get_args(f.type) or f.type is float}
+OPTIONAL = {f.name for f in dataclasses.fields(Trade) if type(None) in typing.get_args(f.type)}
+FORMATS = ("ndjson", "csv")
+PROGRESS_EVERY = 1000
+
+
+def format_of(path, default: str = "ndjson") -> str:
+    """Formato pela extensão (ignora um .gz final); path pode ser um ficheiro aberto com .name."""
+    name = _name(path).lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return default
+
+
+@contextmanager
+def _open(path, mode: str, gz: Optional[bool]):
+    """
+    Texto UTF-8 sobre um caminho, "-" (stdin/stdout) ou um ficheiro binário já
+    aberto (ex.: upload do Streamlit; não é fechado), com ou sem gzip.
+    """
+    owned = isinstance(path, str) and path != "-"
+    if owned:
+        raw = open(path, mode + "b")
+    elif path == "-":
+        raw = sys.stdin.buffer if mode == "r" else sys.stdout.buffer
+    else:
+        raw = path
+    try:
+        if gz is None:
+            if mode == "r":
+                if hasattr(raw, "peek"):
+                    head = raw.peek(2)[:2]
+                else:
+                    pos = raw.tell()
+                    head = raw.read(2)
+                    raw.seek(pos)
+                gz = head == b"\x1f\x8b"
+            else:
+                gz = _name(path).lower().endswith(".gz")
+        stream = gzip.GzipFile(fileobj=raw, mode=mode + "b", compresslevel=6, mtime=0) if gz else raw
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        try:
+            yield text
+        finally:
+            text.flush()
+            text.detach()
+            if gz:
+                stream.close()  # escreve o fim do gzip; não fecha o ficheiro por baixo
+    finally:
+        if owned:
+            raw.close()
+        elif mode == "w":
+            raw.flush()
+
+
+def _name(target) -> str:
+    return target if isinstance(target, str) else str(getattr(target, "name", "") or "")
+
+
+# ---------- escrita ----------
+def _csv_value(name: str, v):
+    if v is None:
+        return ""
+    if name == "tags":
+        return ",".join(v)
+    return v
+
+
+def export_trades(target, trades: Iterable[Trade], fmt: Optional[str] = None, gz: Optional[bool] = None,
+                  progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Escreve os trades em `target` (caminho, "-" ou ficheiro binário), pela ordem em que chegam.
+    progress(n) a cada PROGRESS_EVERY trades; pode levantar Cancelled (o
+    ficheiro fica a meio). Devolve o nº de trades escritos.
+    """
+    fmt = fmt or format_of(target)
+    if fmt not in FORMATS:
+        raise ValueError(f"formato desconhecido: {fmt}")
+    n = 0
+    with _open(target, "w", gz) as f:
+        if fmt == "csv":
+            w = csv.writer(f)
+            w.writerow(FIELDS)
+            for t in trades:
+                w.writerow([_csv_value(k, getattr(t, k)) for k in FIELDS])
+                n += 1
+                if progress and n % PROGRESS_EVERY == 0:
+                    progress(n)
+        else:
+            for t in trades:
+                f.write(json.dumps(dict(vars(t)), ensure_ascii=False) + "\n")
+                n += 1
+                if progress and n % PROGRESS_EVERY == 0:
+                    progress(n)
+    return n
+
+
+# ---------- leitura ----------
+def _from_csv(row: dict) -> dict:
+    out = {}
+    for k, v in row.items():
+        if k not in FIELDS:
+            continue
+        if k == "tags":
+            out[k] = v or ""
+        elif v == "" and (k in OPTIONAL or k in NUMERIC):
+            out[k] = None
+        elif k in NUMERIC:
+            out[k] = float(v)
+        else:
+            out[k] = v
+    return out
+
+
+def iter_import(source, fmt: Optional[str] = None, gz: Optional[bool] = None) -> Iterator[Optional[dict]]:
+    """Dicts no esquema de trades.json, um por linha de `source` (None nas linhas que não se leem)."""
+    fmt = fmt or format_of(source)
+    if fmt not in FORMATS:
+        raise ValueError(f"formato desconhecido: {fmt}")
+    with _open(source, "r", gz) as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                try:
+                    yield _from_csv(row)
+                except (TypeError, ValueError):
+                    yield None
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    raw = json.loads(line)
+                except ValueError:
+                    yield None
+                    continue
+                yield raw if isinstance(raw, dict) else None
+
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Refresh por eventos nas abas Qt (em vez de app.refresh_all() a cada alteração).
+
+    self._dirty = DirtyTracker(self, app.ds, self.refresh, TradeAdded, TradeDeleted,
+                               apply=self.apply_event, relevant=lambda e: ...)
+
+- Só os eventos dos tipos indicados (e aceites por relevant) contam.
+- Aba visível: apply(evento) tenta uma atualização incremental (devolve True se
+  tratou); senão agenda refresh() — vários eventos seguidos dão um só refresh.
+- Aba escondida: fica marcada como suja e refresca quando volta a ser mostrada
+  (com apply_hidden=True tenta primeiro apply, ex.: acrescentar um ponto a um gráfico).
+- Eventos emitidos noutra thread chegam à GUI por sinal (QueuedConnection automática).
+"""
+from PyQt5.QtCore import QObject, QEvent, QTimer, pyqtSignal
+
+
+class DirtyTracker(QObject):
+    event_received = pyqtSignal(object)
+
+    def __init__(self, widget, ds, refresh, *types, apply=None, relevant=None, apply_hidden=False):
+        super().__init__(widget)
+        self.widget = widget
+        self.refresh = refresh
+        self.apply = apply
+        self.relevant = relevant
+        self.apply_hidden = apply_hidden
+        self.dirty = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._refresh_now)
+
+        self.event_received.connect(self._on_event)
+        widget.installEventFilter(self)
+        # referência fraca: a subscrição cai sozinha quando a aba é destruída
+        ds.events.subscribe(self._forward, *types)
+
+    def _forward(self, event):
+        # thread de quem alterou os dados
+        try:
+            self.event_received.emit(event)
+        except RuntimeError:
+            pass  # widget já destruído
+
+    def _on_event(self, event):
+        if self.relevant is not None and not self.relevant(event):
+            return
+        visible = self.widget.isVisible()
+        if self.dirty or self._timer.isActive():
+            if visible:
+                self._timer.start()  # já há um refresh completo pendente
+            return
+        if self.apply is not None and (visible or self.apply_hidden):
+            try:
+                if self.apply(event):
+                    return
+            except Exception:
+                pass
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """Marca para refresh: já (no próximo ciclo) se visível, ou quando for mostrada."""
+        self.dirty = True
+        if self.widget.isVisible():
+            self._timer.start()
+
+    def _refresh_now(self):
+        self.dirty = False
+        self.refresh()
+
+    def eventFilter(self, obj, ev):
+        if obj is self.widget and ev.type() == QEvent.Show and self.dirty:
+            self._timer.start()
+        return False
+
+
+def current_wallet_only(app):
+    """relevant= para abas que só mostram a carteira selecionada (e mudanças em bloco)."""
+    def relevant(e) -> bool:
+        names = getattr(e, "names", None)
+        if names is not None:
+            return bool(names & {"trades", "wallets", "archive"})
+        w = app.current_wallet()
+        return w is not None and e.wallet_id == w.id
+    return relevant
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo Qt (QAbstractTableModel) para o histórico de trades.
+
+- Guarda só a lista de Trade filtrados; o texto de cada célula é formatado
+  quando a vista o pede (só as células visíveis).
+- Ordenação feita no modelo, sobre os valores brutos (None no fim).
+- Larguras de coluna estimadas a partir de uma amostra de linhas, em vez de
+  resizeColumnsToContents sobre a tabela inteira.
+"""
+from typing import List, Mapping, Optional
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+
+from models import Trade
+
+
+def _f2(x): return "" if x is None else f"{float(x):.2f}"
+def _f4(x): return "" if x is None else f"{float(x):.4f}"
+def _txt(x): return "" if x is None else str(x)
+def _date(x): return (x or "").replace("T", " ")
+def _tags(x): return ", ".join(x or ())
+
+
+# (atributo, cabeçalho, formatador, numérico)
+COLUMNS = [
+    ("id", "ID", _txt, False),
+    ("created_at", "Data", _date, False),
+    ("wallet", "Carteira", _txt, False),
+    ("symbol", "Paridade", _txt, False),
+    ("direction", "Direção", _txt, False),
+    ("entry_price", "Entrada", _f2, True),
+    ("stop_loss", "SL", _f2, True),
+    ("take_profit", "TP", _f2, True),
+    ("position_size", "Quantidade", _f4, True),
+    ("position_value", "Valor posição", _f2, True),
+    ("risk_amount", "Risco $", _f2, True),
+    ("risk_pct_of_balance", "Risco % saldo", _f2, True),
+    ("status", "Estado", _txt, False),
+    ("exit_price", "Saída", _f2, True),
+    ("pnl_abs", "PnL $", _f2, True),
+    ("pnl_pct", "PnL %", _f2, True),
+    ("result", "Resultado", _txt, False),
+    ("close_reason", "Fechado Como", _txt, False),
+    ("reason", "Razão", _txt, False),
+    ("tags", "Tags", _tags, False),
+]
+
+_RIGHT = int(Qt.AlignVCenter | Qt.AlignRight)
+
+
+class TradeTableModel(QAbstractTableModel):
+    TradeRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[Trade] = []
+        self._wallet_names: Mapping[str, str] = {}
+        self._sort = None  # (coluna, ordem) da última ordenação
+
+    # ---------- dados ----------
+    def set_rows(self, rows: List[Trade], wallet_names: Optional[Mapping[str, str]] = None):
+        self.beginResetModel()
+        self._rows = list(rows)
+        if wallet_names is not None:
+            self._wallet_names = wallet_names
+        self.endResetModel()
+
+    def rows(self) -> List[Trade]:
+        return self._rows
+
+    def trade_at(self, row: int) -> Optional[Trade]:
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def row_of(self, trade_id: str) -> int:
+        for i, t in enumerate(self._rows):
+            if t.id == trade_id:
+                return i
+        return -1
+
+    def upsert_trade(self, t: Trade):
+        """Substitui a linha do trade (ou acrescenta-a) e mantém a ordenação atual."""
+        i = self.row_of(t.id)
+        if i >= 0:
+            self._rows[i] = t
+            self.dataChanged.emit(self.index(i, 0), self.index(i, len(COLUMNS) - 1))
+        else:
+            n = len(self._rows)
+            self.beginInsertRows(QModelIndex(), n, n)
+            self._rows.append(t)
+            self.endInsertRows()
+        if self._sort:
+            self.sort(*self._sort)
+
+    def remove_trade(self, trade_id: str) -> bool:
+        i = self.row_of(trade_id)
+        if i < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), i, i)
+        del self._rows[i]
+        self.endRemoveRows()
+        return True
+
+    def _raw(self, t: Trade, col: int):
+        attr = COLUMNS[col][0]
+        if attr == "wallet":
+            return self._wallet_names.get(t.wallet_id, "")
+        return getattr(t, attr, None)
+
+    # ---------- API Qt ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        if role == Qt.DisplayRole:
+            t = self._rows[index.row()]
+            return COLUMNS[index.column()][2](self._raw(t, index.column()))
+        if role == Qt.TextAlignmentRole and COLUMNS[index.column()][3]:
+            return _RIGHT
+        if role == self.TradeRole:
+            return self._rows[index.row()]
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(COLUMNS):
+            return COLUMNS[section][1]
+        return QVariant()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if not 0 <= column < len(COLUMNS):
+            return
+        self._sort = (column, order)
+        numeric = COLUMNS[column][3]
+        raw = self._raw
+        key = (lambda t: float(raw(t, column))) if numeric else (lambda t: str(raw(t, column)))
+
+        self.layoutAboutToBeChanged.emit()
+        # None fica sempre no fim, em ambas as direções
+        present = [t for t in self._rows if raw(t, column) is not None]
+        missing = [t for t in self._rows if raw(t, column) is None]
+        present.sort(key=key, reverse=(order == Qt.DescendingOrder))
+        self._rows = present + missing
+        self.layoutChanged.emit()
+
+    # ---------- larguras ----------
+    def sample_column_widths(self, font_metrics, sample: int = 200, padding: int = 18, max_width: int = 360) -> List[int]:
+        """Largura por coluna a partir do cabeçalho + até `sample` linhas espalhadas."""
+        n = len(self._rows)
+        step = max(1, n // sample) if n else 1
+        picks = self._rows[::step][:sample]
+        widths = []
+        for c, (_, header, fmt, _) in enumerate(COLUMNS):
+            w = font_metrics.horizontalAdvance(header)
+            for t in picks:
+                w = max(w, font_metrics.horizontalAdvance(fmt(self._raw(t, c))))
+            widths.append(min(w + padding, max_width))
+        return widths
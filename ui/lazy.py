@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Construção preguiçosa das abas Qt: a janela aparece logo e cada aba só é
+criada (e carrega os seus dados) quando é ativada pela primeira vez.
+
+Na janela principal:
+    self.tabs = QTabWidget()
+    add_lazy_tabs(self.tabs, self, [
+        ("Novo Trade", "tab_new", TabNew),
+        ("Histórico", "tab_history", TabHistory),
+        ...
+    ])
+    # refresh_all: for tab in built_tabs(self.tabs): ...
+
+add_lazy_tabs também liga a UI ao watcher da pasta de dados (ui/watch.py,
+app.data_watch): escritas de outros processos recarregam a coleção mudada.
+
+A aba real fica em app.<attr> a partir do momento em que é criada; até lá
+app.<attr> não existe (usar getattr(app, attr, None)).
+"""
+import os
+from typing import Callable, Iterable, List, Tuple
+
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTabWidget
+
+
+class LazyTab(QWidget):
+    """Placeholder que cria factory(app) no primeiro show e o mostra no seu lugar."""
+
+    def __init__(self, app, factory: Callable, attr: str = None, parent=None):
+        super().__init__(parent)
+        self.app = app
+        self.factory = factory
+        self.attr = attr
+        self.widget = None
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+
+    def ensure_built(self) -> QWidget:
+        if self.widget is None:
+            self.widget = self.factory(self.app)
+            self._layout.addWidget(self.widget)
+            if self.attr:
+                setattr(self.app, self.attr, self.widget)
+        return self.widget
+
+    def showEvent(self, event):
+        self.ensure_built()
+        super().showEvent(event)
+
+
+def add_lazy_tabs(tabs: QTabWidget, app, specs: Iterable[Tuple[str, str, Callable]]) -> List[LazyTab]:
+    """
+    specs: (título, atributo no app, classe/fábrica que recebe app).
+    Cria também app.data_watch (QtDataWatcher sobre app.ds), se ainda não houver
+    e TRADEIROS_WATCH não for "0".
+    """
+    out = []
+    for title, attr, factory in specs:
+        lt = LazyTab(app, factory, attr)
+        tabs.addTab(lt, title)
+        out.append(lt)
+    if os.getenv("TRADEIROS_WATCH", "1") != "0" and getattr(app, "data_watch", None) is None:
+        from ui.watch import QtDataWatcher
+        app.data_watch = QtDataWatcher(app, parent=tabs)
+    return out
+
+
+def built_tabs(tabs: QTabWidget) -> List[QWidget]:
+    """Abas já criadas (as LazyTab ainda por ativar ficam de fora)."""
+    out = []
+    for i in range(tabs.count()):
+        w = tabs.widget(i)
+        if isinstance(w, LazyTab):
+            w = w.widget
+        if w is not None:
+            out.append(w)
+    return out
@@ -1,18 +1,35 @@
 # -*- coding: utf-8 -*-
-import os
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QMessageBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox, QCheckBox, QPlainTextEdit, QSpinBox,
+    QFileDialog
+)
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QFont
 
-from storage import WALLETS_FILE, TRADES_FILE, SYMBOLS_FILE, SETTINGS_FILE, save_json
-from storage import load_json
+from storage import reset_all_data
+from ui.workers import run_in_pool
+import archive
+import perf
+import transfer
+
+PERF_VIEW_FRAMES = 20  # quadros mostrados na caixa de tempos
+
+
+def _import_job(job, ds, path, overwrite):
+    return ds.import_trades(transfer.iter_import(path), overwrite=overwrite)
 
 
 class TabAdmin(QWidget):
-    """Aba de manutenção: reset total."""
+    """Aba de manutenção: reset total, arquivo frio, importação, tempos por refresh (perf) e relatório de memória."""
+    perf_frame = pyqtSignal(str)  # quadros fechados noutras threads chegam à GUI por aqui
+
     def __init__(self, app):
         super().__init__()
         self.app = app
         self.build()
+        self.perf_frame.connect(self._append_perf)
+        unsubscribe = perf.add_listener(lambda f: self.perf_frame.emit(f.format()))
+        self.destroyed.connect(lambda *_: unsubscribe())
 
     def build(self):
         self.setStyleSheet("QLabel { font-size: 12pt; } QPushButton { font-size: 12pt; }")
@@ -25,19 +42,114 @@ class TabAdmin(QWidget):
         btn.clicked.connect(self.reset_all)
         v.addWidget(btn)
 
+        v.addSpacing(12)
+        self.lbl_archive = QLabel()
+        v.addWidget(self.lbl_archive)
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Arquivar trades fechados há mais de"))
+        self.sp_archive_days = QSpinBox()
+        self.sp_archive_days.setRange(0, 36500)
+        self.sp_archive_days.setSingleStep(30)
+        self.sp_archive_days.setSuffix(" dias")
+        self.sp_archive_days.setValue(self.app.ds.archive_after_days())
+        row.addWidget(self.sp_archive_days)
+        btn_archive = QPushButton("Arquivar")
+        btn_archive.clicked.connect(self.archive_old)
+        row.addWidget(btn_archive)
+        row.addStretch()
+        v.addLayout(row)
+        self._show_archive_info()
+
+        v.addSpacing(12)
+        row = QHBoxLayout()
+        self.btn_import = QPushButton("Importar NDJSON/CSV…")
+        self.btn_import.setToolTip("Trades no esquema de trades.json (ex.: exportados no Histórico); .gz aceite")
+        self.btn_import.clicked.connect(self.import_trades)
+        row.addWidget(self.btn_import)
+        self.chk_overwrite = QCheckBox("Substituir trades com o mesmo id")
+        row.addWidget(self.chk_overwrite)
+        row.addStretch()
+        v.addLayout(row)
+
+        v.addSpacing(12)
+        self.chk_perf = QCheckBox("Medir tempos (cada refresh das abas e trabalho em segundo plano)")
+        self.chk_perf.setToolTip(f"Também: variável de ambiente {perf.ENV_VAR}=1; log rotativo com {perf.LOG_ENV_VAR}=ficheiro.")
+        self.chk_perf.setChecked(perf.enabled())
+        self.chk_perf.toggled.connect(self.toggle_perf)
+        v.addWidget(self.chk_perf)
+        self.txt_perf = QPlainTextEdit()
+        self.txt_perf.setReadOnly(True)
+        self.txt_perf.setMaximumBlockCount(PERF_VIEW_FRAMES * 12)
+        self.txt_perf.setFont(QFont("monospace", 9))
+        self.txt_perf.setMinimumHeight(220)
+        v.addWidget(self.txt_perf)
+        for f in perf.recent()[-PERF_VIEW_FRAMES:]:
+            self._append_perf(f.format())
+
+        v.addSpacing(12)
+        btn_mem = QPushButton("Relatório de memória")
+        btn_mem.clicked.connect(self.memory_report)
+        v.addWidget(btn_mem)
+        self.txt_mem = QPlainTextEdit()
+        self.txt_mem.setReadOnly(True)
+        self.txt_mem.setFont(QFont("monospace", 9))
+        self.txt_mem.setMinimumHeight(220)
+        v.addWidget(self.txt_mem)
+
+    def toggle_perf(self, on: bool):
+        ds = self.app.ds
+        ds.settings[perf.SETTING] = "1" if on else "0"
+        ds.save_settings()
+        perf.configure(ds.settings)
+
+    def _show_archive_info(self):
+        info = self.app.ds.archive_info()
+        self.lbl_archive.setText(f"Arquivo: {info['trades']} trades fechados em {info['periods']} meses "
+                                 f"({info['bytes'] / 1024:.0f} KB comprimidos)")
+
+    def archive_old(self):
+        ds = self.app.ds
+        days = self.sp_archive_days.value()
+        if days != ds.archive_after_days():
+            ds.settings[archive.SETTING] = str(days)
+            ds.save_settings()
+        res = ds.archive_closed(days)
+        self._show_archive_info()
+        QMessageBox.information(self, "Arquivo", f"{res['archived']} trades arquivados ({res['periods']} meses).")
+
+    def import_trades(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Importar trades", "",
+            "Trades (*.ndjson *.jsonl *.csv *.ndjson.gz *.jsonl.gz *.csv.gz);;Todos (*)")
+        if not path:
+            return
+        self.btn_import.setEnabled(False)
+        run_in_pool(_import_job, self.app.ds, path, self.chk_overwrite.isChecked(),
+                    on_finished=self._import_done, on_error=self._import_failed)
+
+    def _import_done(self, res):
+        self.btn_import.setEnabled(True)
+        QMessageBox.information(self, "Importar", f"{res['added']} adicionados, {res['replaced']} substituídos, "
+                                                  f"{res['skipped']} ignorados.")
+
+    def _import_failed(self, details):
+        self.btn_import.setEnabled(True)
+        last = details.strip().splitlines()[-1] if details.strip() else ""
+        QMessageBox.critical(self, "Erro ao importar", f"Ocorreu um erro:\n{last}")
+
+    def _append_perf(self, text: str):
+        self.txt_perf.appendPlainText(text)
+
+    def memory_report(self):
+        import memreport
+        self.txt_mem.setPlainText(memreport.format_report(memreport.full_report(self.app.ds)))
+
     def reset_all(self):
         if QMessageBox.question(self, "Confirmar Reset",
                                 "Irá perder TODOS os dados. Tem a certeza?",
                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No) != QMessageBox.Yes:
             return
-        # Apagar ficheiros (ou limpar conteúdo)
-        for path in [WALLETS_FILE, TRADES_FILE, SYMBOLS_FILE, SETTINGS_FILE]:
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception:
-                pass
-        # Recriar defaults mínimos
-        save_json(SYMBOLS_FILE, ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"])
-        save_json(SETTINGS_FILE, {"theme": "dark"})
+        # Apagar ficheiros e recriar defaults mínimos (incrementa as versões p/ outras instâncias)
+        ds = self.app.ds
+        reset_all_data(list(ds.collection_files().values()))
         QMessageBox.information(self, "Reset", "Dados apagados. Reinicie a aplicação.")
@@ -1,27 +1,116 @@
 # -*- coding: utf-8 -*-
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton
-from charts import EquityCanvas, PnLCanvas
-from models import equity_curve
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSpinBox, QTabWidget
+from events import TRADE_EVENTS, CollectionChanged, TradeAdded, TradeClosed, TradeDeleted, TradeEdited, WalletChanged
+from ui.dirty import DirtyTracker, current_wallet_only
+from ui.workers import LatestJob
+import heatmaps
+import perf
+import rolling
+
+
+def _series_job(job, ds, wallet_id, initial_balance, window):
+    """Séries dos gráficos (thread do pool, colunas de ds.columns, inclui o arquivo frio); o desenho fica na thread da GUI."""
+    keys, pnls = ds.columns.closed_pnls(wallet_id)
+    job.check()
+    eq = list(zip(keys.tolist(), (initial_balance + pnls.cumsum()).tolist()))
+    last_key = str(keys[-1]) if len(keys) else ""
+    return wallet_id, eq, initial_balance, pnls.tolist(), last_key, _derived_job(job, ds, wallet_id, window)
+
+
+def _derived_job(job, ds, wallet_id, window):
+    """Métricas móveis e mapas de calor (em cache por versão da carteira)."""
+    m = rolling.wallet_rolling(ds, wallet_id, window)
+    job.check()
+    return m, heatmaps.wallet_heatmaps(ds, wallet_id)
+
 
 class TabCharts(QWidget):
     def __init__(self, app):
         super().__init__()
         self.app = app
+        self._job = LatestJob(self)
+        self._job.finished.connect(self._draw)
+        self._derived = LatestJob(self)  # só métricas móveis e mapas (depois de um ponto acrescentado)
+        self._derived.finished.connect(self._draw_derived)
+        # o que está desenhado: (carteira, chave do último fechado, saldo final)
+        self._plotted = None
         self.build()
+        self._dirty = DirtyTracker(
+            self, app.ds, self.refresh,
+            *TRADE_EVENTS, WalletChanged, CollectionChanged,
+            apply=self.apply_event, relevant=current_wallet_only(app), apply_hidden=True,
+        )
+        self._dirty.mark_dirty()  # primeiro desenho só quando a aba é mostrada
 
     def build(self):
+        from charts import EquityCanvas, PnLCanvas, RollingCanvas, HeatmapCanvas  # matplotlib só quando a aba é construída
         v = QVBoxLayout(self)
-        self.canvas_equity = EquityCanvas(self); v.addWidget(self.canvas_equity, 1)
-        self.canvas_pnl = PnLCanvas(self); v.addWidget(self.canvas_pnl, 1)
-        hb = QHBoxLayout(); btn = QPushButton("Atualizar Gráficos"); btn.clicked.connect(self.refresh); hb.addStretch(); hb.addWidget(btn); v.addLayout(hb)
+        self.sections = QTabWidget(); v.addWidget(self.sections, 1)
+        page = QWidget(); pv = QVBoxLayout(page)
+        self.canvas_equity = EquityCanvas(page); pv.addWidget(self.canvas_equity, 1)
+        self.canvas_pnl = PnLCanvas(page); pv.addWidget(self.canvas_pnl, 1)
+        self.canvas_rolling = RollingCanvas(page); pv.addWidget(self.canvas_rolling, 1)
+        self.sections.addTab(page, "Evolução")
+        page = QWidget(); pv = QVBoxLayout(page)
+        self.canvas_heatmaps = HeatmapCanvas(page); pv.addWidget(self.canvas_heatmaps, 1)
+        self.sections.addTab(page, "Dias e horas")
+        hb = QHBoxLayout()
+        hb.addWidget(QLabel("Janela móvel:"))
+        self.sp_window = QSpinBox(); self.sp_window.setRange(2, 1000); self.sp_window.setValue(rolling.WINDOW)
+        self.sp_window.setSuffix(" trades"); self.sp_window.valueChanged.connect(self.refresh_derived)
+        hb.addWidget(self.sp_window)
+        btn = QPushButton("Atualizar Gráficos"); btn.clicked.connect(self.refresh); hb.addStretch(); hb.addWidget(btn); v.addLayout(hb)
 
     def refresh(self):
+        with perf.frame("Gráficos.refresh"):
+            w = self.app.current_wallet()
+            self._plotted = None
+            if not w:
+                self._job.cancel(); self._derived.cancel()
+                self.canvas_equity.draw_equity([], 0.0); self.canvas_pnl.draw_pnl([])
+                self._draw_derived((None, None)); return
+            self._derived.cancel()
+            self._job.submit(_series_job, self.app.ds, w.id, w.initial_balance, self.sp_window.value())
+
+    def refresh_derived(self):
+        """Só métricas móveis e mapas (janela alterada ou trade acrescentado aos outros gráficos)."""
         w = self.app.current_wallet()
-        if not w:
-            self.canvas_equity.draw_equity([], 0.0); self.canvas_pnl.draw_pnl([]); return
-        eq = equity_curve(self.app.ds.trades_for_wallet(w.id), w.initial_balance)
-        self.canvas_equity.draw_equity(eq, w.initial_balance)
-        closed = [t for t in self.app.ds.trades_for_wallet(w.id) if t.status=="Closed" and t.pnl_abs is not None]
-        closed.sort(key=lambda x: x.closed_at or x.created_at)
-        pnls = [t.pnl_abs for t in closed]
-        self.canvas_pnl.draw_pnl(pnls)
+        if w and not self._job.running:
+            self._derived.submit(_derived_job, self.app.ds, w.id, self.sp_window.value())
+
+    def _draw_derived(self, derived):
+        m, h = derived
+        self.canvas_rolling.draw_rolling(m)
+        self.canvas_heatmaps.draw_heatmaps(h)
+
+    def _draw(self, series):
+        with perf.frame("Gráficos.draw"):
+            wallet_id, eq, initial_balance, pnls, last_key, derived = series
+            self.canvas_equity.draw_equity(eq, initial_balance)
+            self.canvas_pnl.draw_pnl(pnls)
+            self._draw_derived(derived)
+            self._plotted = (wallet_id, last_key, eq[-1][1] if eq else initial_balance)
+
+    def apply_event(self, e) -> bool:
+        """Trade fechado a seguir ao último: acrescenta ponto + barra; False = redesenho completo."""
+        if self._plotted is None or self._job.running:
+            return False
+        wallet_id, last_key, balance = self._plotted
+        if isinstance(e, (TradeAdded, TradeEdited, TradeDeleted)):
+            # trades abertos não entram nos gráficos
+            old = getattr(e, "old", None) or getattr(e, "trade", None)
+            new = getattr(e, "new", None)
+            return all(t is None or t.status != "Closed" for t in (old, new))
+        if not isinstance(e, TradeClosed) or e.new.wallet_id != wallet_id or e.new.pnl_abs is None:
+            return False
+        key = e.new.closed_at or e.new.created_at
+        if key < last_key:
+            return False  # fechado "no passado": a ordem muda, redesenhar
+        balance += e.new.pnl_abs
+        self.canvas_equity.append_equity(balance)
+        self.canvas_pnl.append_pnl(e.new.pnl_abs)
+        self._plotted = (wallet_id, key, balance)
+        # séries móveis e mapas recalculados fora da GUI, depois de o evento chegar também a ds.columns
+        QTimer.singleShot(0, self.refresh_derived)
+        return True
@@ -1,23 +1,56 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
-from PyQt5.QtCore import QDate, Qt
+import io
+
+from PyQt5.QtCore import QDate, Qt, QTimer
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QDateEdit, QLineEdit, QComboBox,
-    QPushButton, QTableWidget, QTableWidgetItem, QMessageBox, QFileDialog
+    QPushButton, QTableView, QHeaderView, QMessageBox, QFileDialog, QProgressDialog
 )
 
-import pandas as pd
+from models import Wallet, pretty_money
+import reports
+import query
+import transfer
+from events import TRADE_EVENTS, CollectionChanged, TradeAdded, TradeDeleted, WalletChanged
+from ui.dirty import DirtyTracker, current_wallet_only
+from ui.history_model import TradeTableModel
+from ui.workers import LatestJob, run_in_pool
+import perf
+import metrics
+
+FILTER_DEBOUNCE_MS = 250     # espera após a última alteração de filtro
+ASYNC_FILTER_MIN = 20000     # nº de trades a partir do qual o filtro corre fora da thread da GUI
+
 
-# Estes imports são opcionais: se openpyxl faltar, a exportação continua sem formatação
-try:
-    from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
-    from openpyxl.formatting.rule import ColorScaleRule
-    from openpyxl.utils import get_column_letter
-    _HAS_OPENPYXL = True
-except Exception:
-    _HAS_OPENPYXL = False
+def _filter_job(job, key, source, args, index, facets, columns):
+    return key, reports.filter_trades(source, index=index, facets=facets, columns=columns, **args)
 
-from models import pretty_money, Trade, Wallet
+
+def _export_job(job, path, trades, ds, wallet, key):
+    """
+    Gera o .xlsx em memória (thread do pool) e só escreve o ficheiro no fim.
+    Os bytes ficam em ds.artifacts: exportar de novo sem alterações é imediato.
+    """
+    def build():
+        snap = ds.snapshot()
+        rows = ds.columns.frame(trades, snap.wallets)
+        stats_wallet = reports.wallet_stats(wallet, snap.trades, snap.archived) if wallet else {}
+        stats_global = reports.global_stats(snap.wallets, snap.trades, snap.archived)
+        buf = io.BytesIO()
+        reports.write_excel(buf, rows, stats_wallet, stats_global, progress=job.progress)
+        job.check()
+        return buf.getvalue()
+    data = ds.artifacts.get("history_xlsx", key, ds.data_version(), build)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _transfer_job(job, path, trades):
+    """Escreve os trades listados em NDJSON/CSV (formato e gzip pela extensão), um a um."""
+    total = max(1, len(trades))
+    transfer.export_trades(path, trades, progress=lambda n: job.progress(n * 100 // total, f"{n} de {total} trades"))
+    return path
 
 
 class TabHistory(QWidget):
@@ -25,38 +58,31 @@ class TabHistory(QWidget):
     Histórico de trades (da carteira selecionada), com filtros,
     apagar trade, e EXPORTAÇÃO para Excel (Trades + Estatísticas).
     """
-    COLS = [
-        ("id", "ID"),
-        ("created_at", "Data"),
-        ("wallet", "Carteira"),
-        ("symbol", "Paridade"),
-        ("direction", "Direção"),
-        ("entry_price", "Entrada"),
-        ("stop_loss", "SL"),
-        ("take_profit", "TP"),
-        ("position_size", "Quantidade"),
-        ("position_value", "Valor posição"),
-        ("risk_amount", "Risco $"),
-        ("risk_pct_of_balance", "Risco % saldo"),
-        ("status", "Estado"),
-        ("exit_price", "Saída"),
-        ("pnl_abs", "PnL $"),
-        ("pnl_pct", "PnL %"),
-        ("result", "Resultado"),
-        ("close_reason", "Fechado Como"),
-        ("reason", "Razão"),
-    ]
 
     def __init__(self, app):
         super().__init__()
         self.app = app
         self._rows_cache = []  # cache dos trades filtrados exibidos
+        self._last_filter = None  # (versão do snapshot, kwargs) do último resultado
+        self._filter_job = LatestJob(self)  # resultados de filtros antigos são descartados
+        self._filter_job.finished.connect(lambda res: self._apply_filtered(*res))
+        self._export_dlg = None
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self._filter_timer.timeout.connect(self.refresh_table)
         self.build()
+        self._dirty = DirtyTracker(
+            self, app.ds, self.refresh_table,
+            *TRADE_EVENTS, WalletChanged, CollectionChanged,
+            apply=self.apply_event, relevant=current_wallet_only(app),
+        )
+        self._dirty.mark_dirty()  # primeira carga só quando a aba é mostrada
 
     def build(self):
         self.setStyleSheet("""
             QLabel { font-size: 12pt; }
-            QComboBox, QDateEdit, QLineEdit, QPushButton, QTableWidget { font-size: 11pt; }
+            QComboBox, QDateEdit, QLineEdit, QPushButton, QTableView { font-size: 11pt; }
         """)
         v = QVBoxLayout(self)
 
@@ -79,6 +105,12 @@ class TabHistory(QWidget):
         self.ed_f_symbol.setPlaceholderText("ex.: BTCUSDT")
         filt.addWidget(self.ed_f_symbol)
 
+        filt.addWidget(QLabel("Razão:"))
+        self.ed_f_reason = QLineEdit()
+        self.ed_f_reason.setPlaceholderText("pesquisar, ex.: rompimento fomc")
+        self.ed_f_reason.setClearButtonEnabled(True)
+        filt.addWidget(self.ed_f_reason)
+
         filt.addWidget(QLabel("Estado:"))
         self.cmb_status = QComboBox()
         self.cmb_status.addItems(["Todos", "Open", "Closed"])
@@ -95,129 +127,200 @@ class TabHistory(QWidget):
         self.btn_export.clicked.connect(self.export_to_excel)
         filt.addWidget(self.btn_export)
 
+        self.btn_transfer = QPushButton("Exportar NDJSON/CSV")
+        self.btn_transfer.setToolTip("Trades listados no esquema de trades.json (importável no Admin)")
+        self.btn_transfer.clicked.connect(self.export_trades_file)
+        filt.addWidget(self.btn_transfer)
+
         self.btn_delete = QPushButton("Apagar Trade")
         self.btn_delete.clicked.connect(self.delete_selected_trade)
         filt.addWidget(self.btn_delete)
 
         v.addLayout(filt)
 
-        # ---- Tabela
-        self.tbl = QTableWidget(0, len(self.COLS))
-        self.tbl.setSelectionBehavior(QTableWidget.SelectRows)
-        self.tbl.setSelectionMode(QTableWidget.SingleSelection)
+        # ---- Facetas (bitmaps em facets.py) + resumo da seleção
+        filt2 = QHBoxLayout()
+        filt2.addWidget(QLabel("Direção:"))
+        self.cmb_direction = QComboBox()
+        self.cmb_direction.addItems(["Todos", "Long", "Short"])
+        filt2.addWidget(self.cmb_direction)
+
+        filt2.addWidget(QLabel("Resultado:"))
+        self.cmb_result = QComboBox()
+        self.cmb_result.addItems(["Todos", "Gain", "Loss", "Break-even"])
+        filt2.addWidget(self.cmb_result)
+
+        filt2.addWidget(QLabel("Tags:"))
+        self.ed_f_tags = QLineEdit()
+        self.ed_f_tags.setPlaceholderText("todas estas, ex.: setup:breakout, tf:H4")
+        self.ed_f_tags.setClearButtonEnabled(True)
+        filt2.addWidget(self.ed_f_tags, 1)
+
+        self.lbl_selection = QLabel("")
+        self.lbl_selection.setStyleSheet("color:#bbb;")
+        filt2.addWidget(self.lbl_selection)
+        v.addLayout(filt2)
+
+        # ---- Consulta (query.py)
+        filt3 = QHBoxLayout()
+        filt3.addWidget(QLabel("Consulta:"))
+        self.ed_query = QLineEdit()
+        self.ed_query.setPlaceholderText("ex.: symbol:BTC* dir:Short pnl<0 risk_pct>1.5 closed:2025-01..2025-03")
+        self.ed_query.setClearButtonEnabled(True)
+        self.ed_query.setToolTip(
+            "Termos separados por espaços (E), OR, -termo para negar, parênteses.\n"
+            "Campos: symbol dir status result close wallet tag reason entry sl tp exit\n"
+            "size value risk risk_pct pnl pnl_pct rr created closed.\n"
+            "Texto com * e ?; números/datas com < <= > >= != e intervalos a..b."
+        )
+        filt3.addWidget(self.ed_query, 1)
+        self.lbl_query_error = QLabel("")
+        self.lbl_query_error.setStyleSheet("color:#e57373;")
+        filt3.addWidget(self.lbl_query_error)
+        v.addLayout(filt3)
+
+        # ---- Tabela (model/view: células formatadas só quando visíveis)
+        self.model = TradeTableModel(self)
+        self.tbl = QTableView()
+        self.tbl.setModel(self.model)
+        self.tbl.setSelectionBehavior(QTableView.SelectRows)
+        self.tbl.setSelectionMode(QTableView.SingleSelection)
         self.tbl.setSortingEnabled(True)
+        self.tbl.horizontalHeader().setSortIndicator(1, Qt.AscendingOrder)  # Data
         self.tbl.verticalHeader().setVisible(False)
+        # altura de linha fixa: o scroll não precisa de medir cada linha
+        self.tbl.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.tbl.verticalHeader().setDefaultSectionSize(self.tbl.fontMetrics().height() + 8)
         self.tbl.setAlternatingRowColors(True)
-        for i, (_, header) in enumerate(self.COLS):
-            self.tbl.setHorizontalHeaderItem(i, QTableWidgetItem(header))
         v.addWidget(self.tbl)
 
-        # primeira carga
-        self.refresh_table()
-
-        # sinais para refazer ao mudar filtros
-        self.dt_from.dateChanged.connect(self.refresh_table)
-        self.dt_to.dateChanged.connect(self.refresh_table)
-        self.ed_f_symbol.textChanged.connect(self.refresh_table)
-        self.cmb_status.currentIndexChanged.connect(self.refresh_table)
+        # sinais para refazer ao mudar filtros (com debounce)
+        self.dt_from.dateChanged.connect(self.schedule_refresh)
+        self.dt_to.dateChanged.connect(self.schedule_refresh)
+        self.ed_f_symbol.textChanged.connect(self.schedule_refresh)
+        self.ed_f_reason.textChanged.connect(self.schedule_refresh)
+        self.cmb_status.currentIndexChanged.connect(self.schedule_refresh)
+        self.cmb_direction.currentIndexChanged.connect(self.schedule_refresh)
+        self.cmb_result.currentIndexChanged.connect(self.schedule_refresh)
+        self.ed_f_tags.textChanged.connect(self.schedule_refresh)
+        self.ed_query.textChanged.connect(self.schedule_refresh)
 
     # ------------------------------------------------------------------
     # Helpers de dados/filters
     # ------------------------------------------------------------------
-    def _date_ok(self, iso: str) -> bool:
-        """Verifica se a data ISO está dentro do intervalo (De/Até)."""
+    def _compiled_query(self):
+        """Consulta compilada (None se vazia); com erro de sintaxe mostra-o e ignora a consulta."""
         try:
-            d = datetime.fromisoformat(iso)
-        except Exception:
-            return True  # sem data bem formatada, não filtra
-        dmin = datetime(self.dt_from.date().year(), self.dt_from.date().month(), self.dt_from.date().day())
-        dmax = datetime(self.dt_to.date().year(), self.dt_to.date().month(), self.dt_to.date().day(), 23, 59, 59)
-        return dmin <= d <= dmax
-
-    def _wallet_name_by_id(self, wid: str) -> str:
-        """Resolve nome da carteira localmente, sem depender de métodos no app."""
-        try:
-            w = self.app.ds.wallets.get(wid)
-            return w.name if w else ""
-        except Exception:
-            return ""
+            q = query.compile(self.ed_query.text(), self.app.ds.wallets)
+            self.lbl_query_error.setText("")
+            return q
+        except query.QueryError as e:
+            self.lbl_query_error.setText(str(e))
+            return None
 
-    def _filter_trades(self):
-        """Aplica filtros aos trades da carteira selecionada."""
+    def _filter_args(self):
+        """kwargs de reports.filter_trades para a carteira selecionada (None sem carteira)."""
         w: Wallet = self.app.current_wallet()
         if not w:
-            return []
-
-        symbol_f = self.ed_f_symbol.text().strip().upper()
-        status_f = self.cmb_status.currentText()
-        rows = []
-        for t in self.app.ds.trades.values():
-            if t.wallet_id != w.id:
-                continue
-            if symbol_f and symbol_f not in (t.symbol or "").upper():
-                continue
-            if t.created_at and not self._date_ok(t.created_at):
-                continue
-            if status_f != "Todos" and (t.status or "Open") != status_f:
-                continue
-            rows.append(t)
-        rows.sort(key=lambda x: (x.created_at or ""))
-        return rows
+            return None
+        return dict(
+            query=self._compiled_query(),
+            wallet_id=w.id,
+            date_from=self.dt_from.date().toString("yyyy-MM-dd"),
+            date_to=self.dt_to.date().toString("yyyy-MM-dd"),
+            symbol=self.ed_f_symbol.text(), status=self.cmb_status.currentText(),
+            reason=self.ed_f_reason.text(),
+            direction=self.cmb_direction.currentText(), result=self.cmb_result.currentText(),
+            tags=self.ed_f_tags.text(),
+        )
+
+    def apply_event(self, e) -> bool:
+        """Atualiza só a linha do trade alterado; False = precisa de refresh completo."""
+        if not isinstance(e, TRADE_EVENTS):
+            return False
+        args = self._filter_args()
+        if args is None or self._filter_job.running or self._last_filter is None:
+            return False
+        new = None if isinstance(e, TradeDeleted) else (e.trade if isinstance(e, TradeAdded) else e.new)
+        tid = (new or e.trade).id
+        keep = bool(new) and bool(reports.filter_trades([new], **args))
+
+        rows = [t for t in self._rows_cache if t.id != tid]
+        if keep:
+            rows.append(new)
+            rows.sort(key=lambda x: (x.created_at or ""))
+        self._rows_cache = rows
+        self._last_filter = (self.app.ds.version, args)
+        if keep:
+            self.model.upsert_trade(new)
+        else:
+            self.model.remove_trade(tid)
+        self._update_selection_stats()
+        return True
+
+    def schedule_refresh(self):
+        """Alteração de filtro: refaz a tabela só depois de FILTER_DEBOUNCE_MS sem novas alterações."""
+        self._filter_timer.start()
 
     def refresh_table(self):
         """Repovoa a tabela com base nos filtros atuais."""
-        rows = self._filter_trades()
-        self._rows_cache = rows[:]  # guarda para o export
-
-        self.tbl.setSortingEnabled(False)
-        self.tbl.setRowCount(0)
-
-        for t in rows:
-            r = self.tbl.rowCount()
-            self.tbl.insertRow(r)
-            vals = self._row_values(t)
-            for c, val in enumerate(vals):
-                it = QTableWidgetItem(val)
-                if c in (5, 6, 7, 8, 9, 10, 11, 13, 14, 15):
-                    it.setTextAlignment(Qt.AlignVCenter | Qt.AlignRight)
-                self.tbl.setItem(r, c, it)
-
-        self.tbl.resizeColumnsToContents()
-        self.tbl.setSortingEnabled(True)
+        with perf.frame("Histórico.refresh"):
+            self._filter_timer.stop()
+            self._filter_job.cancel()
+            args = self._filter_args()
+            if args is None:
+                self._apply_filtered(None, [])
+                return
 
-    def _row_values(self, t: Trade):
-        """Converte o trade em uma linha de texto para a tabela."""
-        wallet_name = self._wallet_name_by_id(t.wallet_id)
-        def f2(x): return "" if x is None else f"{float(x):.2f}"
-        def f4(x): return "" if x is None else f"{float(x):.4f}"
-        return [
-            t.id or "",
-            (t.created_at or "").replace("T", " "),
-            wallet_name or "",
-            t.symbol or "",
-            t.direction or "",
-            f2(t.entry_price),
-            f2(t.stop_loss),
-            f2(t.take_profit),
-            f4(t.position_size),
-            f2(t.position_value),
-            f2(t.risk_amount),
-            f2(t.risk_pct_of_balance),
-            t.status or "",
-            f2(t.exit_price) if t.exit_price is not None else "",
-            f2(t.pnl_abs) if t.pnl_abs is not None else "",
-            f2(t.pnl_pct) if t.pnl_pct is not None else "",
-            t.result or "",
-            t.close_reason or "",
-            t.reason or "",
-        ]
+            # filtro mais restritivo sobre os mesmos dados: parte do resultado anterior
+            snap = self.app.ds.snapshot()
+            prev = self._last_filter
+            narrowed = bool(prev and prev[0] == snap.version and reports.narrows(prev[1], args))
+            metrics.cache_result("history_filter", narrowed)
+            # sem resultado anterior a estreitar: candidatos pela interseção dos bitmaps
+            source = self._rows_cache if narrowed else None
+            facets = None if narrowed else self.app.ds.facets
+
+            key = (snap.version, args)
+            index = self.app.ds.reason_index
+            columns = self.app.ds.columns if args["query"] is not None else None
+            # a primeira pesquisa lê/constrói os índices: fora da thread da GUI
+            size = len(source) if narrowed else len(facets) if facets.ready else ASYNC_FILTER_MIN
+            if (size >= ASYNC_FILTER_MIN or (args["reason"].strip() and not index.ready)
+                    or (columns is not None and not columns.ready)):
+                self._filter_job.submit(_filter_job, key, source, args, index, facets, columns)
+            else:
+                self._apply_filtered(key, reports.filter_trades(source, index=index, facets=facets,
+                                                                columns=columns, **args))
+
+    def _apply_filtered(self, key, rows):
+        with perf.frame("Histórico.apply"):
+            self._last_filter = key
+            self._rows_cache = list(rows)  # guarda para o export e para filtros incrementais
+
+            names = {wid: w.name for wid, w in self.app.ds.wallets.items()}
+            self.model.set_rows(self._rows_cache, names)
+            hdr = self.tbl.horizontalHeader()
+            if hdr.sortIndicatorSection() >= 0:
+                self.model.sort(hdr.sortIndicatorSection(), hdr.sortIndicatorOrder())
+            for c, w in enumerate(self.model.sample_column_widths(self.tbl.fontMetrics())):
+                hdr.resizeSection(c, w)
+            self._update_selection_stats()
+
+    def _update_selection_stats(self):
+        """Resumo (reports.compute_stats) dos trades listados."""
+        if not self._rows_cache:
+            self.lbl_selection.setText("")
+            return
+        s = reports.compute_stats(self._rows_cache, 0.0)
+        self.lbl_selection.setText(
+            f"{s['total_trades']} trades • {s['closed_trades']} fechados • "
+            f"acerto {s['winrate_pct']:.1f}% • PnL $ {pretty_money(s['pnl_total'])}"
+        )
 
     def get_selected_trade(self):
-        row = self.tbl.currentRow()
-        if row < 0:
-            return None
-        tid = self.tbl.item(row, 0).text()
-        return self.app.ds.trades.get(tid)
+        t = self.model.trade_at(self.tbl.currentIndex().row())
+        return self.app.ds.trades.get(t.id) if t else None
 
     def delete_selected_trade(self):
         t = self.get_selected_trade()
@@ -227,249 +330,90 @@ class TabHistory(QWidget):
         if QMessageBox.question(self, "Confirmar", f"Apagar trade {t.id} ({t.symbol})?",
                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No) != QMessageBox.Yes:
             return
-        self.app.ds.delete_trade(t.id)
-        self.refresh_table()
-        self.app.refresh_all()
+        self.app.ds.delete_trade(t.id)  # TradeDeleted -> apply_event / abas interessadas
 
     # ------------------------------------------------------------------
     # Exportação para Excel
     # ------------------------------------------------------------------
     def export_to_excel(self):
-        """Exporta os trades atualmente listados + estatísticas para um .xlsx."""
-        import traceback
-        try:
-            if not self._rows_cache:
-                QMessageBox.information(self, "Exportar", "Não há dados para exportar.")
-                return
+        """Exporta os trades atualmente listados + estatísticas para um .xlsx (em segundo plano)."""
+        if not self._rows_cache:
+            QMessageBox.information(self, "Exportar", "Não há dados para exportar.")
+            return
 
-            # diálogo guardar
-            path, _ = QFileDialog.getSaveFileName(self, "Guardar Excel",
-                                                  "Tradeiros_Historico.xlsx",
-                                                  "Excel (*.xlsx)")
-            if not path:
-                return
+        # diálogo guardar
+        path, _ = QFileDialog.getSaveFileName(self, "Guardar Excel",
+                                              "Tradeiros_Historico.xlsx",
+                                              "Excel (*.xlsx)")
+        if not path:
+            return
 
-            # DataFrame de Trades (carteira atual)
-            trades = self._rows_cache
-            w: Wallet = self.app.current_wallet()
-            wallet_name = w.name if w else ""
-
-            def as_dict(t: Trade):
-                def as_float(v, default=0.0):
-                    try:
-                        return float(v)
-                    except Exception:
-                        return default
-                return dict(
-                    ID=t.id,
-                    Data=(t.created_at or "").replace("T", " "),
-                    Carteira=self._wallet_name_by_id(t.wallet_id),
-                    Paridade=t.symbol,
-                    Direção=t.direction,
-                    Entrada=as_float(t.entry_price, 0.0),
-                    SL=as_float(t.stop_loss, 0.0),
-                    TP=as_float(t.take_profit, 0.0),
-                    Quantidade=as_float(t.position_size, 0.0),
-                    ValorPos=as_float(t.position_value, 0.0),
-                    RiscoUSD=as_float(t.risk_amount, 0.0),
-                    RiscoPct=as_float(t.risk_pct_of_balance, 0.0),
-                    Estado=t.status,
-                    Saída=(None if t.exit_price is None else as_float(t.exit_price, 0.0)),
-                    PnL=(None if t.pnl_abs is None else as_float(t.pnl_abs, 0.0)),
-                    PnLPct=(None if t.pnl_pct is None else as_float(t.pnl_pct, 0.0)),
-                    Resultado=t.result,
-                    FechadoComo=t.close_reason,
-                    Razão=t.reason,
-                )
-
-            df = pd.DataFrame([as_dict(t) for t in trades])
-
-            # KPIs carteira selecionada e globais
-            stats_wallet = self._compute_stats_for_wallet(w)
-            stats_global = self._compute_stats_global()
-
-            # escrever
-            with pd.ExcelWriter(path, engine="openpyxl") as writer:
-                # Trades
-                df.to_excel(writer, index=False, sheet_name="Trades")
-                if _HAS_OPENPYXL:
-                    self._style_trades_sheet(writer.book["Trades"], df)
-
-                # Estatísticas
-                ws_stats = writer.book.create_sheet("Estatísticas")
-                ws_stats["A1"] = "Carteira selecionada"
-                if _HAS_OPENPYXL:
-                    ws_stats["A1"].font = Font(bold=True, size=12)
-                self._write_stats_block(ws_stats, 2, 1, stats_wallet)
-
-                ws_stats["A10"] = "Global (todas as carteiras)"
-                if _HAS_OPENPYXL:
-                    ws_stats["A10"].font = Font(bold=True, size=12)
-                self._write_stats_block(ws_stats, 11, 1, stats_global)
-
-            QMessageBox.information(self, "Exportar Excel", f"Ficheiro guardado:\n{path}")
-
-        except Exception as e:
-            msg = "".join(traceback.format_exc())
-            QMessageBox.critical(self, "Erro ao exportar", f"Ocorreu um erro:\n{e}\n\nDetalhes:\n{msg}")
-
-    # ---- helpers de estatística para export ----
-    def _compute_stats_for_wallet(self, w: Wallet):
-        if not w:
-            return {}
-        ts = [t for t in self.app.ds.trades.values() if t.wallet_id == w.id]
-        return self._compute_stats(ts, w.initial_balance or 0.0)
-
-    def _compute_stats_global(self):
-        wallets = list(self.app.ds.wallets.values())
-        initial_total = sum((w.initial_balance or 0.0) for w in wallets) if wallets else 0.0
-        ts = list(self.app.ds.trades.values())
-        return self._compute_stats(ts, initial_total)
-
-    def _compute_stats(self, trades, initial_balance: float):
-        closed = [t for t in trades if (t.status or "Open") == "Closed"]
-        winners = [t for t in closed if (t.pnl_abs or 0) > 0]
-        losers = [t for t in closed if (t.pnl_abs or 0) < 0]
-        be = [t for t in closed if (t.pnl_abs or 0) == 0]
-        pnl_total = sum((t.pnl_abs or 0.0) for t in closed)
-        total = len(trades)
-        winrate = (len(winners) / len(closed) * 100.0) if closed else 0.0
-        current_balance = (initial_balance or 0.0) + pnl_total
-        growth_pct = ((current_balance / initial_balance - 1) * 100.0) if initial_balance and initial_balance > 0 else 0.0
-        return dict(
-            total_trades=total,
-            closed_trades=len(closed),
-            open_trades=total - len(closed),
-            winners=len(winners),
-            losers=len(losers),
-            breakeven=len(be),
-            winrate_pct=winrate,
-            pnl_total=pnl_total,
-            initial_balance=initial_balance or 0.0,
-            current_balance=current_balance,
-            growth_pct=growth_pct
+        # Trades listados + KPIs da carteira selecionada e globais
+        dlg = self._export_dlg = QProgressDialog("A exportar…", "Cancelar", 0, 100, self)
+        dlg.setWindowTitle("Exportar Excel")
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(300)
+        dlg.setValue(0)
+        # chave: filtros + versão dos dados em que a lista foi calculada
+        version, args = self._last_filter or (None, {})
+        job = run_in_pool(
+            _export_job, path, list(self._rows_cache), self.app.ds, self.app.current_wallet(),
+            (reports.filter_key(args), version),
+            on_finished=self._export_done, on_error=self._export_failed,
+            on_progress=self._export_progress, on_cancelled=self._export_cancelled,
         )
-
-    def _write_stats_block(self, ws, start_row: int, start_col: int, s: dict):
-        labels = [
-            ("Total de trades", "total_trades"),
-            ("Fechados", "closed_trades"),
-            ("Abertos", "open_trades"),
-            ("Winners", "winners"),
-            ("Losers", "losers"),
-            ("Break-even", "breakeven"),
-            ("Winrate %", "winrate_pct"),
-            ("PnL total ($)", "pnl_total"),
-            ("Saldo inicial ($)", "initial_balance"),
-            ("Saldo atual ($)", "current_balance"),
-            ("Crescimento %", "growth_pct"),
-        ]
-        r = start_row
-        money_keys = {"pnl_total", "initial_balance", "current_balance"}
-        pct_keys = {"winrate_pct", "growth_pct"}
-
-        for label, key in labels:
-            ws.cell(row=r, column=start_col, value=label)
-            # deixar negrito se openpyxl disponível
-            if _HAS_OPENPYXL:
-                ws.cell(row=r, column=start_col).font = Font(bold=True)
-
-            val = s.get(key, 0.0)
-            cell = ws.cell(row=r, column=start_col + 1, value=val)
-
-            if _HAS_OPENPYXL:
-                if key in money_keys:
-                    cell.number_format = u'"$"#,##0.00'
-                elif key in pct_keys:
-                    try:
-                        cell.value = float(val) / 100.0
-                    except Exception:
-                        pass
-                    cell.number_format = "0.00%"
-            r += 1
-
-        if _HAS_OPENPYXL:
-            try:
-                from openpyxl.utils import get_column_letter
-                for c in range(start_col, start_col + 2):
-                    ws.column_dimensions[get_column_letter(c)].width = 24
-            except Exception:
-                pass
-
-    # ---- estilo da folha de Trades (se openpyxl presente) ----
-    def _style_trades_sheet(self, ws, df):
-        if not _HAS_OPENPYXL:
+        dlg.canceled.connect(job.cancel)
+        self.btn_export.setEnabled(False)
+        self.btn_transfer.setEnabled(False)
+
+    def export_trades_file(self):
+        """Exporta os trades listados para NDJSON ou CSV (opcionalmente .gz), em segundo plano."""
+        if not self._rows_cache:
+            QMessageBox.information(self, "Exportar", "Não há dados para exportar.")
             return
-        try:
-            header_fill = PatternFill(start_color="1F2937", end_color="1F2937", fill_type="solid")  # cinza escuro
-            header_font = Font(color="FFFFFF", bold=True)
-            for c in range(1, df.shape[1] + 1):
-                cell = ws.cell(row=1, column=c)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(vertical="center")
-                # larguras
-                if c in (1, 3, 4, 5, 18):
-                    width = 14
-                elif c in (2,):
-                    width = 20
-                else:
-                    width = 13
-                from openpyxl.utils import get_column_letter
-                ws.column_dimensions[get_column_letter(c)].width = width
-
-            # filtros + freeze header
-            from openpyxl.utils import get_column_letter
-            ws.auto_filter.ref = f"A1:{get_column_letter(df.shape[1])}{df.shape[0]+1}"
-            ws.freeze_panes = "A2"
-
-            # estilos nomeados (registar só se necessário)
-            def register_style(style):
-                try:
-                    ws.parent.add_named_style(style)
-                except ValueError:
-                    pass
-
-            money = NamedStyle(name="Money_Style")
-            money.number_format = u'"$"#,##0.00'
-            pct = NamedStyle(name="Pct_Style")
-            pct.number_format = "0.00%"
-
-            register_style(money)
-            register_style(pct)
-
-            # mapear colunas
-            col_map = {name: idx+1 for idx, name in enumerate(df.columns)}
-
-            # aplicar formatos
-            for r in range(2, df.shape[0] + 2):
-                for nm in ("Entrada", "SL", "TP", "ValorPos", "RiscoUSD", "Saída", "PnL"):
-                    c = col_map.get(nm)
-                    if c:
-                        ws.cell(row=r, column=c).style = "Money_Style"
-                for nm in ("RiscoPct", "PnLPct"):
-                    c = col_map.get(nm)
-                    if c:
-                        v = ws.cell(row=r, column=c).value
-                        if isinstance(v, (int, float)) and v > 1.0:
-                            ws.cell(row=r, column=c).value = v / 100.0
-                        ws.cell(row=r, column=c).style = "Pct_Style"
-
-            # gradiente no PnL
-            if df.shape[0] > 0 and "PnL" in df.columns:
-                c = col_map["PnL"]
-                rng = f"{get_column_letter(c)}2:{get_column_letter(c)}{df.shape[0]+1}"
-                safe_min = float(pd.to_numeric(df['PnL'], errors='coerce').fillna(0).min())
-                safe_max = float(pd.to_numeric(df['PnL'], errors='coerce').fillna(0).max())
-                ws.conditional_formatting.add(
-                    rng,
-                    ColorScaleRule(
-                        start_type='num', start_value=min(safe_min, 0),
-                        mid_type='num', mid_value=0,
-                        end_type='num', end_value=max(safe_max, 0),
-                        start_color='FCA5A5', mid_color='FFFFFF', end_color='86EFAC'
-                    )
-                )
-        except Exception:
-            # qualquer erro de styling é ignorado; o ficheiro continua válido
-            pass
+        path, chosen = QFileDialog.getSaveFileName(
+            self, "Guardar trades", "Tradeiros_Trades.ndjson",
+            "NDJSON (*.ndjson);;NDJSON comprimido (*.ndjson.gz);;CSV (*.csv);;CSV comprimido (*.csv.gz)")
+        if not path:
+            return
+        ext = chosen[chosen.find("*") + 1:chosen.rfind(")")] if "*" in chosen else ""
+        if ext and transfer.format_of(path, "") == "":
+            path += ext  # nome sem extensão: a do filtro escolhido
+        dlg = self._export_dlg = QProgressDialog("A exportar…", "Cancelar", 0, 100, self)
+        dlg.setWindowTitle("Exportar trades")
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(300)
+        dlg.setValue(0)
+        job = run_in_pool(
+            _transfer_job, path, list(self._rows_cache),
+            on_finished=self._export_done, on_error=self._export_failed,
+            on_progress=self._export_progress, on_cancelled=self._export_cancelled,
+        )
+        dlg.canceled.connect(job.cancel)
+        self.btn_export.setEnabled(False)
+        self.btn_transfer.setEnabled(False)
+
+    def _export_progress(self, pct, msg):
+        if self._export_dlg:
+            self._export_dlg.setLabelText(msg or "A exportar…")
+            self._export_dlg.setValue(pct)
+
+    def _export_finish(self):
+        self.btn_export.setEnabled(True)
+        self.btn_transfer.setEnabled(True)
+        if self._export_dlg:
+            self._export_dlg.canceled.disconnect()
+            self._export_dlg.close()
+            self._export_dlg = None
+
+    def _export_done(self, path):
+        self._export_finish()
+        QMessageBox.information(self, "Exportar", f"Ficheiro guardado:\n{path}")
+
+    def _export_cancelled(self):
+        self._export_finish()
+
+    def _export_failed(self, details):
+        self._export_finish()
+        last = details.strip().splitlines()[-1] if details.strip() else ""
+        QMessageBox.critical(self, "Erro ao exportar", f"Ocorreu um erro:\n{last}\n\nDetalhes:\n{details}")
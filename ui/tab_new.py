@@ -2,11 +2,13 @@
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QWidget, QGridLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
-    QDoubleSpinBox, QTextEdit, QMessageBox, QButtonGroup
+    QDoubleSpinBox, QTextEdit, QMessageBox, QButtonGroup, QLineEdit
 )
 from PyQt5.QtCore import Qt
 
-from models import new_trade_id, pnl_value, pretty_money, wallet_current_balance, Trade
+from models import new_trade_id, pnl_value, pretty_money, normalize_tags, Trade
+from events import TRADE_EVENTS, CollectionChanged, WalletChanged
+from ui.dirty import DirtyTracker, current_wallet_only
 
 
 def _base_asset(sym: str) -> str:
@@ -27,6 +29,12 @@ class TabNew(QWidget):
         self.app = app
         self._syncing_pos = False
         self.build()
+        # o risco em % depende do saldo atual da carteira
+        self._dirty = DirtyTracker(
+            self, app.ds, self.update_risk_labels,
+            *TRADE_EVENTS, WalletChanged, CollectionChanged,
+            relevant=current_wallet_only(app),
+        )
 
     def build(self):
         self.setStyleSheet("""
@@ -103,6 +111,7 @@ class TabNew(QWidget):
 
         # Razão
         self.ed_reason = QTextEdit(); self.ed_reason.setFixedHeight(70); self.ed_reason.setPlaceholderText("Razão da entrada...")
+        self.ed_tags = QLineEdit(); self.ed_tags.setPlaceholderText("separadas por vírgulas, ex.: setup:breakout, tf:H4, sessão:NY")
 
         # Guardar
         self.btn_save_trade = QPushButton("Guardar Trade")
@@ -136,6 +145,7 @@ class TabNew(QWidget):
         g.addWidget(row_val, r, 0, 1, 2); r += 1
 
         g.addWidget(QLabel("Razão da Entrada:"), r, 0); g.addWidget(self.ed_reason, r, 1); r += 1
+        g.addWidget(QLabel("Tags:"), r, 0); g.addWidget(self.ed_tags, r, 1); r += 1
         g.addWidget(self.btn_save_trade, r, 0, 1, 2)
 
         on_units_changed()
@@ -192,7 +202,7 @@ class TabNew(QWidget):
         # 👉 inteiro: "N : 1"
         self.lbl_rr.setText(f"Risco Retorno — {int(round(rr))} : 1")
 
-        bal = wallet_current_balance(self.app.ds.trades_for_wallet(w.id), w.initial_balance) if w else 0.0
+        bal = self.app.ds.wallet_balance(w.id) if w else 0.0
         risk_amount = risk_per_unit * size
         risk_pct = (risk_amount / bal * 100.0) if bal > 0 else 0.0
 
@@ -216,10 +226,7 @@ class TabNew(QWidget):
         sym = self.cmb_symbol.currentText().strip().upper()
         if not sym:
             QMessageBox.warning(self, "Paridade", "Indica uma paridade."); return
-        if sym not in self.app.ds.symbols:
-            self.app.ds.symbols.append(sym)
-            self.app.ds.symbols = sorted(list(set(self.app.ds.symbols)))
-            self.app.ds.save_symbols()
+        if self.app.ds.add_symbol(sym):
             prio = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
             pool = [s.upper() for s in self.app.ds.symbols]
             head = [s for s in prio if s in pool]; tail = sorted([s for s in pool if s not in head])
@@ -246,7 +253,7 @@ class TabNew(QWidget):
         pos_value = round(entry * size, 2)
         created_at = datetime.now().isoformat(timespec='seconds')
 
-        balance_at_open = wallet_current_balance(self.app.ds.trades_for_wallet(w.id), w.initial_balance)
+        balance_at_open = self.app.ds.wallet_balance(w.id)
         risk_amount = abs(entry - sl) * size
         risk_pct_bal = (risk_amount / balance_at_open * 100.0) if balance_at_open > 0 else 0.0
 
@@ -262,7 +269,8 @@ class TabNew(QWidget):
             entry_price=round(entry, 2), stop_loss=round(sl, 2), take_profit=round(tp, 2),
             position_size=size, position_value=pos_value, reason=reason,
             created_at=created_at, risk_amount=risk_amount, risk_pct_of_balance=risk_pct_bal,
-            status="Open", exit_price=None, closed_at=None, pnl_abs=None, pnl_pct=None, result=None, close_reason=None
+            status="Open", exit_price=None, closed_at=None, pnl_abs=None, pnl_pct=None, result=None, close_reason=None,
+            tags=normalize_tags(self.ed_tags.text()),
         )
         self.app.ds.add_trade(t)
 
@@ -270,11 +278,8 @@ class TabNew(QWidget):
         self.cmb_symbol.setCurrentIndex(self.cmb_symbol.findText("BTCUSDT"))
         self.btn_long.setChecked(True)
         self.sp_entry.setValue(90000.00); self.sp_sl.setValue(90000.00); self.sp_tp.setValue(90000.00)
-        self.sp_pos_units.setValue(0.0); self.sp_pos_value.setValue(0.0); self.ed_reason.clear()
+        self.sp_pos_units.setValue(0.0); self.sp_pos_value.setValue(0.0); self.ed_reason.clear(); self.ed_tags.clear()
         self._update_qty_title()
         self.update_risk_labels()
 
         QMessageBox.information(self, "Sucesso", "Trade guardado.")
-        self.app.refresh_all()
-        try: self.app.tab_update.populate_update_trade_combo()
-        except Exception: pass
@@ -4,13 +4,25 @@ from PyQt5.QtGui import QPixmap, QPainter, QFont
 from PyQt5.QtCore import Qt
 
 from models import pretty_money
+import reports
+from events import TRADE_EVENTS, CollectionChanged, WalletChanged
+from ui.dirty import DirtyTracker
+from ui.workers import LatestJob
 
 
 class TabStats(QWidget):
     def __init__(self, app):
         super().__init__()
         self.app = app
+        self._job = LatestJob(self)
+        self._job.finished.connect(self._show_stats)
         self.build()
+        self._dirty = DirtyTracker(
+            self, app.ds, self.refresh,
+            *TRADE_EVENTS, WalletChanged, CollectionChanged,
+            relevant=lambda e: not isinstance(e, CollectionChanged) or bool(e.names & {"trades", "wallets", "archive"}),
+        )
+        self._dirty.mark_dirty()  # primeiro cálculo só quando a aba é mostrada
 
     def build(self):
         self.setStyleSheet("""
@@ -63,50 +75,22 @@ class TabStats(QWidget):
             self.rows[key] = lv
             r += 1
 
-        self.refresh()
-
     # ---------- cálculo local (GLOBAL) ----------
     @staticmethod
-    def _compute_stats_global(all_trades, initial_sum: float):
-        total = len(all_trades)
-        closed = [t for t in all_trades if getattr(t, "status", "") == "Closed"]
-        open_ts = total - len(closed)
-
-        winners = sum(1 for t in closed if (t.pnl_abs or 0) > 0)
-        losers = sum(1 for t in closed if (t.pnl_abs or 0) < 0)
-        breakeven = sum(1 for t in closed if (t.pnl_abs or 0) == 0)
-
-        pnl_total = sum((t.pnl_abs or 0.0) for t in closed)
-        current_balance = initial_sum + pnl_total
-
-        winrate_pct = (winners / len(closed) * 100.0) if closed else 0.0
-        growth_pct = ((current_balance - initial_sum) / initial_sum * 100.0) if initial_sum > 0 else 0.0
-
-        return {
-            "total_trades": total,
-            "closed_trades": len(closed),
-            "open_trades": open_ts,
-            "winners": winners,
-            "losers": losers,
-            "breakeven": breakeven,
-            "winrate_pct": winrate_pct,
-            "pnl_total": pnl_total,
-            "current_balance": current_balance,
-            "growth_pct": growth_pct,
-        }
+    def _stats_job(job, ds):
+        # soma dos saldos iniciais de todas as carteiras + todos os trades (+ resumos do arquivo);
+        # igual enquanto a versão dos dados não mudar (ds.artifacts)
+        version = ds.data_version()
+        snap = ds.snapshot()
+        return ds.artifacts.get("global_stats", (), version,
+                                lambda: reports.global_stats(snap.wallets, snap.trades, snap.archived))
 
     # ---------- Lógica ----------
     def refresh(self):
-        """Resumo global: considera TODAS as carteiras e TODOS os trades."""
-        # soma dos saldos iniciais de todas as carteiras
-        wallets = list(self.app.ds.wallets.values()) if hasattr(self.app.ds, "wallets") else []
-        initial_sum = sum(getattr(w, "initial_balance", 0.0) for w in wallets)
-
-        # todos os trades
-        all_trades = list(self.app.ds.trades.values()) if hasattr(self.app.ds, "trades") else []
-
-        stats = self._compute_stats_global(all_trades, initial_sum)
+        """Resumo global: considera TODAS as carteiras e TODOS os trades (calculado em segundo plano)."""
+        self._job.submit(self._stats_job, self.app.ds)
 
+    def _show_stats(self, stats):
         self.rows["total_trades"].setText(str(stats["total_trades"]))
         self.rows["closed_trades"].setText(str(stats["closed_trades"]))
         self.rows["open_trades"].setText(str(stats["open_trades"]))
@@ -115,7 +99,7 @@ class TabStats(QWidget):
         self.rows["breakeven"].setText(str(stats["breakeven"]))
         self.rows["winrate_pct"].setText(f"{stats['winrate_pct']:.2f}%")
         self.rows["pnl_total"].setText(f"$ {pretty_money(stats['pnl_total'])}")
-        self.rows["initial_balance"].setText(f"$ {pretty_money(initial_sum)}")
+        self.rows["initial_balance"].setText(f"$ {pretty_money(stats['initial_balance'])}")
         self.rows["current_balance"].setText(f"$ {pretty_money(stats['current_balance'])}")
         self.rows["growth_pct"].setText(f"{stats['growth_pct']:.2f}%")
 
@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
 from PyQt5.QtWidgets import (
     QWidget, QGridLayout, QLabel, QComboBox, QPushButton, QDoubleSpinBox,
     QHBoxLayout, QMessageBox, QLineEdit, QVBoxLayout, QFrame
 )
 from PyQt5.QtGui import QDoubleValidator
 from PyQt5.QtCore import QSignalBlocker, Qt
-from models import pnl_value, pretty_money, wallet_current_balance
+from models import pnl_value, pretty_money
+from events import TRADE_EVENTS, CollectionChanged, TradeAdded, TradeClosed, TradeDeleted, TradeEdited
+from ui.dirty import DirtyTracker
+import perf
 
 
 def _to_float(le: QLineEdit) -> float:
@@ -46,7 +48,14 @@ class TabUpdate(QWidget):
         self.app = app
         self.current_trade = None
         self._snapshot = None  # snapshot do “trade original”
+        self._open_cache = []
         self.build()
+        self._dirty = DirtyTracker(
+            self, app.ds, self.populate_update_trade_combo,
+            *TRADE_EVENTS, CollectionChanged,
+            apply=self.apply_event, relevant=lambda e: not isinstance(e, CollectionChanged) or "trades" in e.names,
+        )
+        self._dirty.mark_dirty()  # combo povoado só quando a aba é mostrada
 
     # ==================== UI ====================
     def build(self):
@@ -120,6 +129,7 @@ class TabUpdate(QWidget):
         self.sp_pos.setKeyboardTracking(False)
         self.lbl_pos_value = QLabel("Valor posição: $ 0,00")
         self.lbl_qty_title = QLabel("Quantidade:")
+        self.ed_tags = QLineEdit(); self.ed_tags.setPlaceholderText("ex.: setup:breakout, tf:H4")
 
         r = 0
         right.addWidget(QLabel("<b>Editar trade</b>"), r, 0, 1, 2); r += 1
@@ -131,6 +141,7 @@ class TabUpdate(QWidget):
         rowpos = QWidget(); hp = QHBoxLayout(rowpos); hp.setContentsMargins(0,0,0,0)
         hp.addWidget(self.lbl_qty_title); hp.addWidget(self.sp_pos); hp.addSpacing(12); hp.addWidget(self.lbl_pos_value); hp.addStretch()
         right.addWidget(rowpos, r, 0, 1, 2); r += 1
+        right.addWidget(QLabel("Tags:"), r, 0); right.addWidget(self.ed_tags, r, 1); r += 1
 
         # ====== BLOCO INFERIOR — Fechar trade ======
         bottom = QGridLayout()
@@ -176,6 +187,7 @@ class TabUpdate(QWidget):
         for w in (self.le_entry, self.le_sl, self.le_tp):
             w.editingFinished.connect(self.on_any_finished)
         self.sp_pos.editingFinished.connect(self.on_any_finished)
+        self.ed_tags.editingFinished.connect(self.on_tags_finished)
 
         # Pré-visualização instantânea (não persiste):
         self.le_entry.textChanged.connect(self._update_preview_only)
@@ -188,26 +200,56 @@ class TabUpdate(QWidget):
         self.btn_close_manual.clicked.connect(self.close_by_manual)
         self.sp_exit_manual.valueChanged.connect(self._update_manual_pnl_preview)
 
-        # Povoar combo
-        self.populate_update_trade_combo()
-
     # ==================== Dados ====================
     def populate_update_trade_combo(self):
-        current = self.cmb_trade.currentData()
-        self.cmb_trade.blockSignals(True)
-        self.cmb_trade.clear()
-        open_trades = [t for t in self.app.ds.trades.values() if t.status == "Open"]
-        open_trades.sort(key=lambda x: x.created_at)  # mais antigo primeiro
-        self._open_cache = open_trades[:]
-        for t in open_trades:
-            self.cmb_trade.addItem(f"{t.created_at.replace('T',' ')} • {t.symbol} • {t.id}", userData=t.id)
-        self.cmb_trade.blockSignals(False)
-        if current:
-            i = self.cmb_trade.findData(current)
-            if i >= 0: self.cmb_trade.setCurrentIndex(i)
-        if self.cmb_trade.currentIndex() < 0 and self.cmb_trade.count() > 0:
-            self.cmb_trade.setCurrentIndex(0)
-        self.load_selected_trade()
+        with perf.frame("Atualizar.refresh"):
+            current = self.cmb_trade.currentData()
+            self.cmb_trade.blockSignals(True)
+            self.cmb_trade.clear()
+            open_trades = [t for t in self.app.ds.trades.values() if t.status == "Open"]
+            open_trades.sort(key=lambda x: x.created_at)  # mais antigo primeiro
+            self._open_cache = open_trades[:]
+            for t in open_trades:
+                self.cmb_trade.addItem(f"{t.created_at.replace('T',' ')} • {t.symbol} • {t.id}", userData=t.id)
+            self.cmb_trade.blockSignals(False)
+            if current:
+                i = self.cmb_trade.findData(current)
+                if i >= 0: self.cmb_trade.setCurrentIndex(i)
+            if self.cmb_trade.currentIndex() < 0 and self.cmb_trade.count() > 0:
+                self.cmb_trade.setCurrentIndex(0)
+            self.load_selected_trade()
+
+    def apply_event(self, e) -> bool:
+        """Mexe só no item do trade alterado; False = repovoar o combo."""
+        cur = self.current_trade.id if self.current_trade else None
+        if isinstance(e, TradeEdited):
+            if e.new.id == cur:
+                self.current_trade = e.new  # não recarrega o formulário a meio da edição
+            return e.new.status == e.old.status
+        if isinstance(e, TradeAdded):
+            t = e.trade
+            if t.status != "Open":
+                return True
+            i = 0
+            while i < len(self._open_cache) and self._open_cache[i].created_at <= t.created_at:
+                i += 1
+            with QSignalBlocker(self.cmb_trade):
+                self.cmb_trade.insertItem(i, f"{t.created_at.replace('T',' ')} • {t.symbol} • {t.id}", userData=t.id)
+            self._open_cache.insert(i, t)
+            if self.cmb_trade.count() == 1:
+                self.cmb_trade.setCurrentIndex(0)
+            return True
+        if isinstance(e, (TradeClosed, TradeDeleted)):
+            tid = (e.new if isinstance(e, TradeClosed) else e.trade).id
+            if tid == cur:
+                return False  # o trade selecionado saiu: escolher outro
+            i = self.cmb_trade.findData(tid)
+            if i >= 0:
+                with QSignalBlocker(self.cmb_trade):
+                    self.cmb_trade.removeItem(i)
+                self._open_cache = [t for t in self._open_cache if t.id != tid]
+            return True
+        return False
 
     def load_selected_trade(self):
         tid = self.cmb_trade.currentData()
@@ -222,7 +264,7 @@ class TabUpdate(QWidget):
             self.lbl_direction.setText("")
             for w in (self.le_entry, self.le_sl, self.le_tp): _set_lineedit(w, 0.0)
             with QSignalBlocker(self.sp_pos): self.sp_pos.setValue(0.0)
-            self.ed_symbol.setText("")
+            self.ed_symbol.setText(""); self.ed_tags.setText("")
             # lado esquerdo
             self.ed_symbol_ro.setText(""); _set_lineedit(self.le_entry_ro, 0.0); _set_lineedit(self.le_sl_ro, 0.0); _set_lineedit(self.le_tp_ro, 0.0)
             with QSignalBlocker(self.sp_qty_ro): self.sp_qty_ro.setValue(0.0)
@@ -249,6 +291,7 @@ class TabUpdate(QWidget):
 
         # lado direito (editável)
         self.ed_symbol.setText(t.symbol)
+        self.ed_tags.setText(", ".join(t.tags or ()))
         _set_lineedit(self.le_entry, t.entry_price)
         _set_lineedit(self.le_sl, t.stop_loss)
         _set_lineedit(self.le_tp, t.take_profit)
@@ -293,20 +336,17 @@ class TabUpdate(QWidget):
         if not t:
             self._update_preview_only(); return
 
-        t.entry_price = round(_to_float(self.le_entry), 2)
-        t.stop_loss   = round(_to_float(self.le_sl), 2)
-        t.take_profit = round(_to_float(self.le_tp), 2)
-        t.position_size = float(self.sp_pos.value())
-        t.position_value = round(t.entry_price * t.position_size, 2)
-        t.risk_amount = abs(t.entry_price - t.stop_loss) * t.position_size
-
-        w = self.app.current_wallet()
-        bal = wallet_current_balance(self.app.ds.trades_for_wallet(w.id), w.initial_balance) if w else 0.0
-        t.risk_pct_of_balance = (t.risk_amount / bal * 100.0) if bal > 0 else 0.0
-
-        self.app.ds.update_trade(t)
+        # nova versão do trade (os objetos publicados pelo DataStore não são alterados in place)
+        self.current_trade = self.app.ds.edit_trade(
+            t.id, _to_float(self.le_entry), _to_float(self.le_sl), _to_float(self.le_tp), float(self.sp_pos.value())
+        ) or t
         self._update_preview_only()
-        self.app.refresh_all()
+
+    def on_tags_finished(self):
+        t = self.current_trade
+        if t:
+            self.current_trade = self.app.ds.set_tags(t.id, self.ed_tags.text()) or t
+            self.ed_tags.setText(", ".join(self.current_trade.tags or ()))
 
     # ---------- preview PnL manual conforme preço digitado ----------
     def _update_manual_pnl_preview(self):
@@ -331,19 +371,8 @@ class TabUpdate(QWidget):
     def _close_with_price(self, price: float, reason: str):
         t = self.current_trade
         if not t: return
-        t.exit_price = round(price, 2)
-        t.closed_at = datetime.now().isoformat(timespec='seconds')
-        t.status = "Closed"; t.close_reason = reason
-        t.pnl_abs = pnl_value(t.direction, t.entry_price, t.exit_price, t.position_size)
-
-        w = self.app.current_wallet()
-        bal = wallet_current_balance(self.app.ds.trades_for_wallet(w.id), w.initial_balance) if w else 0.0
-        t.pnl_pct = (t.pnl_abs / bal * 100.0) if bal > 0 else None
-        t.result = "Gain" if (t.pnl_abs or 0) > 0 else ("Loss" if (t.pnl_abs or 0) < 0 else "Break-even")
-
-        self.app.ds.update_trade(t)
-        self.app.refresh_all()
-        self.populate_update_trade_combo()
+        t = self.app.ds.close_trade(t.id, price, reason)  # TradeClosed -> abas interessadas
+        if not t: return
 
         msg = f"PnL: $ {pretty_money(t.pnl_abs)}"
         if t.pnl_pct is not None:
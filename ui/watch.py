@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Ponte entre o watcher de ficheiros (thread de fundo) e a UI Qt.
+
+Criada por ui.lazy.add_lazy_tabs (fica em app.data_watch, filha do
+QTabWidget; TRADEIROS_WATCH=0 desliga, como no Streamlit):
+    app.data_watch = QtDataWatcher(app, parent=tabs)
+
+DataStore.reload emite CollectionChanged; as abas atualizam-se pelos seus
+DirtyTracker (ui/dirty.py).
+"""
+from PyQt5.QtCore import QObject, pyqtSignal, Qt
+
+from watcher import shared_watcher
+
+
+class QtDataWatcher(QObject):
+    files_changed = pyqtSignal(object)  # set de coleções
+
+    def __init__(self, app, debounce: float = 0.3, parent=None):
+        super().__init__(parent)
+        self.app = app
+        # a notificação chega numa thread do watcher: QueuedConnection passa-a para a thread da GUI
+        self.files_changed.connect(self._apply, Qt.QueuedConnection)
+        self._unsubscribe = shared_watcher(app.ds.data_dir, debounce=debounce).subscribe(self._on_files_changed)
+
+    def _on_files_changed(self, names):
+        try:
+            self.files_changed.emit(names)
+        except RuntimeError:
+            pass  # objeto Qt já destruído (a subscrição fraca cai a seguir)
+
+    def _apply(self, names):
+        ds = self.app.ds
+        names = ds.changed_on_disk(names)  # ignora as nossas próprias escritas
+        if not names:
+            return
+        ds.reload(names)
+
+    def stop(self):
+        self._unsubscribe()
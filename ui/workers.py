@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Trabalho pesado fora da thread da GUI (exportações, estatísticas, gráficos).
+
+    job = run_in_pool(fn, arg1, ..., on_finished=self._done, on_error=self._failed,
+                      on_progress=self._progress)
+    job.cancel()
+
+- fn(job, *args, **kwargs) corre numa thread do QThreadPool global; recebe o
+  próprio Worker para reportar progresso (job.progress(pct, msg)) e verificar
+  cancelamento (job.check() / job.is_cancelled).
+- Os resultados voltam à GUI por sinais (finished / error / cancelled / progress).
+  Os callbacks devem ser métodos de widgets: os sinais são entregues na thread da GUI.
+- fn não deve tocar em widgets; trabalha sobre snapshots do DataStore (imutáveis).
+"""
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+from reports import Cancelled
+import perf
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, str)   # percentagem 0-100, mensagem
+    finished = pyqtSignal(object)     # resultado de fn
+    error = pyqtSignal(str)           # traceback formatado
+    cancelled = pyqtSignal()
+
+
+class Worker(QRunnable):
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.signals = WorkerSignals()
+        self._cancel = threading.Event()
+
+    # ---------- usado por fn (thread do pool) ----------
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check(self):
+        """Levanta Cancelled se o trabalho foi cancelado."""
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, pct: int, msg: str = ""):
+        self.check()
+        if not self._emit("progress", max(0, min(100, int(pct))), msg):
+            raise Cancelled()  # a GUI já não existe (ex.: app a fechar)
+
+    def _emit(self, name: str, *args) -> bool:
+        try:
+            getattr(self.signals, name).emit(*args)
+            return True
+        except RuntimeError:
+            # sinais já destruídos (app a fechar): ninguém recebe o resultado
+            return False
+
+    # ---------- usado pela GUI ----------
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            self.check()
+            with perf.frame("worker " + getattr(self.fn, "__name__", "job")):
+                result = self.fn(self, *self.args, **self.kwargs)
+            self.check()
+        except Cancelled:
+            self._emit("cancelled")
+        except Exception:
+            self._emit("error", traceback.format_exc())
+        else:
+            self._emit("finished", result)
+        finally:
+            _ACTIVE.discard(self)
+
+
+# referência Python enquanto corre (o pool só guarda o lado C++)
+_ACTIVE = set()
+
+
+def run_in_pool(fn, *args, on_finished=None, on_error=None, on_progress=None, on_cancelled=None,
+                pool: QThreadPool = None, **kwargs) -> Worker:
+    w = Worker(fn, *args, **kwargs)
+    if on_finished:
+        w.signals.finished.connect(on_finished)
+    if on_error:
+        w.signals.error.connect(on_error)
+    if on_progress:
+        w.signals.progress.connect(on_progress)
+    if on_cancelled:
+        w.signals.cancelled.connect(on_cancelled)
+    _ACTIVE.add(w)
+    (pool or QThreadPool.globalInstance()).start(w)
+    return w
+
+
+class LatestJob(QObject):
+    """
+    Só o pedido mais recente entrega resultado: submeter cancela o anterior e
+    resultados atrasados de pedidos antigos são ignorados (ex.: refresh de uma
+    aba disparado várias vezes seguidas).
+    """
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._worker = None  # pedido corrente (mantém vivos os seus sinais até à entrega)
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None
+
+    def submit(self, fn, *args, **kwargs) -> Worker:
+        self.cancel()
+        w = Worker(fn, *args, **kwargs)
+        # ligações a métodos deste QObject: entregues na thread da GUI
+        w.signals.finished.connect(self._on_finished)
+        w.signals.error.connect(self._on_error)
+        self._worker = w
+        _ACTIVE.add(w)
+        QThreadPool.globalInstance().start(w)
+        return w
+
+    def cancel(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    @pyqtSlot(object)
+    def _on_finished(self, result):
+        if self._is_current():
+            self.finished.emit(result)
+
+    @pyqtSlot(str)
+    def _on_error(self, msg):
+        if self._is_current():
+            self.error.emit(msg)
+
+    def _is_current(self) -> bool:
+        if self._worker is None or self.sender() is not self._worker.signals:
+            return False
+        self._worker = None
+        return True
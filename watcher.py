@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Observação da pasta de dados: deteta alterações feitas por outros processos
+(scripts de importação, outra instância Streamlit/Qt) aos ficheiros JSON.
+
+- Backend: watchdog (inotify/FSEvents/ReadDirectoryChanges) se estiver instalado;
+  senão, polling barato com os.stat.
+- Debounce: uma rajada de escritas gera UMA notificação com o conjunto de
+  coleções alteradas ({"trades"}, {"wallets", "trades"}, ...).
+- As notificações incluem também as nossas próprias escritas; quem recebe filtra
+  com DataStore.changed_on_disk(names) e recarrega só essas coleções com
+  DataStore.reload(names).
+"""
+
+import os
+import inspect
+import threading
+import weakref
+from typing import Callable, Dict, Optional, Set
+
+COLLECTION_FILES = {
+    "wallets.json": "wallets",
+    "trades.json": "trades",
+    "symbols.json": "symbols",
+    "settings.json": "settings",
+    "archive.json": "archive",
+}
+
+
+class DataWatcher:
+    def __init__(self, data_dir: str, debounce: float = 0.3, poll_interval: float = 1.0):
+        self.data_dir = str(data_dir)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subs = []  # callables (ou WeakMethod para métodos ligados)
+        self._pending: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._observer = None
+        self._poll_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- subscrições ----------
+    def subscribe(self, callback: Callable[[Set[str]], None]) -> Callable[[], None]:
+        """
+        Regista callback(nomes_alterados). Métodos ligados ficam com referência fraca
+        (a sessão/janela que morre deixa de ser notificada sem ter de se desregistar).
+        Devolve uma função para cancelar a subscrição.
+        """
+        ref = weakref.WeakMethod(callback) if inspect.ismethod(callback) else (lambda: callback)
+        with self._lock:
+            self._subs.append(ref)
+
+        def unsubscribe():
+            with self._lock:
+                if ref in self._subs:
+                    self._subs.remove(ref)
+        return unsubscribe
+
+    # ---------- ciclo de vida ----------
+    def start(self) -> "DataWatcher":
+        if self._observer or self._poll_thread:
+            return self
+        self._stop.clear()
+        try:
+            self._start_watchdog()
+        except Exception:
+            self._observer = None
+            self._poll_thread = threading.Thread(target=self._poll_loop, name="tradeiros-watch", daemon=True)
+            self._poll_thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+                self._observer.join(timeout=2)
+            except Exception:
+                pass
+            self._observer = None
+        self._poll_thread = None
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    @property
+    def backend(self) -> str:
+        return "watchdog" if self._observer is not None else ("poll" if self._poll_thread else "stopped")
+
+    # ---------- backends ----------
+    def _start_watchdog(self):
+        from watchdog.observers import Observer  # type: ignore
+        from watchdog.events import FileSystemEventHandler  # type: ignore
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # escrita atómica = <f>.tmp + rename: interessa o destino
+                for p in (getattr(event, "dest_path", None), event.src_path):
+                    if p:
+                        watcher._notify_path(p)
+
+        obs = Observer()
+        obs.schedule(_Handler(), self.data_dir, recursive=False)
+        obs.daemon = True
+        obs.start()
+        self._observer = obs
+
+    def _stat_all(self) -> Dict[str, tuple]:
+        out = {}
+        for fname in COLLECTION_FILES:
+            try:
+                st = os.stat(os.path.join(self.data_dir, fname))
+                out[fname] = (st.st_mtime_ns, st.st_size, st.st_ino)
+            except OSError:
+                out[fname] = None
+        return out
+
+    def _poll_loop(self):
+        last = self._stat_all()
+        while not self._stop.wait(self.poll_interval):
+            cur = self._stat_all()
+            for fname, sig in cur.items():
+                if sig != last.get(fname):
+                    self._notify(COLLECTION_FILES[fname])
+            last = cur
+
+    # ---------- debounce ----------
+    def _notify_path(self, path: str):
+        name = COLLECTION_FILES.get(os.path.basename(str(path)))
+        if name:
+            self._notify(name)
+
+    def _notify(self, name: str):
+        with self._lock:
+            self._pending.add(name)
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            names, self._pending = self._pending, set()
+            self._timer = None
+            subs = list(self._subs)
+        if not names:
+            return
+        for ref in subs:
+            cb = ref()
+            if cb is None:
+                with self._lock:
+                    if ref in self._subs:
+                        self._subs.remove(ref)
+                continue
+            try:
+                cb(set(names))
+            except Exception:
+                pass
+
+
+# um watcher por pasta, partilhado (ex.: várias sessões Streamlit no mesmo processo)
+_SHARED: Dict[str, DataWatcher] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_watcher(data_dir: str, debounce: float = 0.3) -> DataWatcher:
+    key = os.path.abspath(str(data_dir))
+    with _SHARED_LOCK:
+        w = _SHARED.get(key)
+        if w is None:
+            w = _SHARED[key] = DataWatcher(key, debounce=debounce).start()
+        return w
+
+
+class PendingChanges:
+    """Acumulador thread-safe para quem consome as notificações noutra thread (ex.: Streamlit)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: Set[str] = set()
+
+    def add(self, names: Set[str]):
+        with self._lock:
+            self._names |= set(names)
+
+    def pop(self) -> Set[str]:
+        with self._lock:
+            names, self._names = self._names, set()
+        return names